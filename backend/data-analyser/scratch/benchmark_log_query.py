@@ -0,0 +1,72 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Set default storage path if not set
+if "STORAGE_PATH" not in os.environ:
+    os.environ["STORAGE_PATH"] = "../data/ds4"
+# Columnar copies go to a throwaway state directory
+os.environ["STATE_PATH"] = tempfile.mkdtemp(prefix="query-bench-")
+
+import pandas as pd
+
+from data_analyser.log_query import LogQuery
+
+query = {
+    "select": [{"signal": "FAPpressure", "agg": "mean"}],
+    "where": [{"signal": "Coolant", "op": ">", "value": 80}],
+    "state": "idle",
+    "group_by": "month",
+}
+
+
+def pandas_scan(file_ids):
+    """The one-off script way: read every CSV and filter it with pandas."""
+    frames = []
+    for file_id in file_ids:
+        csv = pd.read_csv(
+            f"{os.environ['STORAGE_PATH']}/{file_id}.csv",
+            sep=";",
+            usecols=["Date", "Time", "FAPpressure", "Coolant", "Revs", "Speed"],
+        )
+        csv = csv.apply(pd.to_numeric, errors="coerce").assign(Date=csv["Date"])
+        idle = (csv["Revs"] > 0) & (csv["Revs"] < 1000) & (csv["Speed"] == 0)
+        frames.append(csv[idle & (csv["Coolant"] > 80)])
+    matched = pd.concat(frames)
+    return matched.groupby(matched["Date"].str[:7])["FAPpressure"].mean()
+
+
+def benchmark(runs=5):
+    data_dir = os.environ["STORAGE_PATH"]
+    file_ids = sorted(
+        os.path.splitext(f)[0] for f in os.listdir(data_dir) if f.endswith(".csv")
+    )
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        pandas_scan(file_ids)
+    print(f"pandas over CSV:       {(time.perf_counter() - start) / runs * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    result = LogQuery(file_ids, **query).result
+    print(f"LogQuery, first run:   {(time.perf_counter() - start) * 1000:.1f} ms "
+          "(builds the columnar copies)")
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = LogQuery(file_ids, **query).result
+    print(f"LogQuery, columnar:    {(time.perf_counter() - start) / runs * 1000:.1f} ms")
+    print(f"Logs: {result['logs']}")
+    print(f"Rows: {result['rows']}")
+
+
+if __name__ == "__main__":
+    try:
+        benchmark()
+    finally:
+        shutil.rmtree(os.environ["STATE_PATH"], ignore_errors=True)
@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Set default storage path if not set
+if "STORAGE_PATH" not in os.environ:
+    os.environ["STORAGE_PATH"] = "../data/ds4"
+
+from data_analyser.data_analyser import DataAnalyser
+from data_analyser.metric_index import MetricIndex
+
+
+def benchmark(logs=100_000, seed=0):
+    data_dir = os.environ["STORAGE_PATH"]
+    analyses = [
+        DataAnalyser(os.path.splitext(f)[0]).result
+        for f in sorted(os.listdir(data_dir))
+        if f.endswith(".csv")
+    ]
+    templates = [MetricIndex.metrics_of(analysis) for analysis in analyses]
+    rng = np.random.default_rng(seed)
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        index = MetricIndex(f"{state_dir}/metric_index")
+
+        # Rows are applied directly, as replayed from updates.jsonl, with
+        # noise so every metric has a spread
+        start = time.perf_counter()
+        for i in range(logs):
+            metrics = templates[i % len(templates)]
+            noise = rng.normal(1, 0.05, len(metrics))
+            index._apply(
+                f"log-{i}",
+                {key: value * n for (key, value), n in zip(metrics.items(), noise)},
+            )
+        print(f"Indexed {len(index)} logs x {len(index.columns)} metrics "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index._compact()
+        print(f"Snapshot written in {time.perf_counter() - start:.2f}s")
+        start = time.perf_counter()
+        index = MetricIndex(f"{state_dir}/metric_index")
+        print(f"Snapshot loaded in {time.perf_counter() - start:.2f}s")
+
+        for method in ("mad", "iqr"):
+            start = time.perf_counter()
+            result = index.outliers(["fap.pressure.max_mbar"], method=method)
+            elapsed = (time.perf_counter() - start) * 1000
+            flagged = len(result["fap.pressure.max_mbar"]["outliers"])
+            print(f"{method}: one metric in {elapsed:.1f} ms ({flagged} listed)")
+
+        start = time.perf_counter()
+        result = index.outliers(limit=10)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"mad: all {len(result)} metrics in {elapsed:.0f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
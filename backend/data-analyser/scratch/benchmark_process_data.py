@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import tracemalloc
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Set default storage path if not set
+if "STORAGE_PATH" not in os.environ:
+    os.environ["STORAGE_PATH"] = "../data/ds4"
+
+import pandas as pd
+from data_analyser.data_analyser import DataAnalyser  # noqa: F401, registers the sections
+from data_analyser.log_loader import LogLoader
+from data_analyser.parameters.registry import plan_columns, sections
+
+
+def process_data_before(self):
+    """_process_data before the single-mask rewrite, kept for comparison."""
+    for col in self.csv.columns:
+        if col not in {"Date", "Time"} and self.csv[col].dtype == object:
+            self.csv[col] = pd.to_numeric(self.csv[col], errors="coerce")
+
+    self.csv = self.csv[self.plan.sentinel_mask(self.csv)]
+    self.csv["Datetime"] = self.plan.parse_datetime(self.csv["Date"], self.csv["Time"])
+    self.csv = self.csv.dropna(subset=["Datetime"])
+    self.csv = self.csv.sort_values("Datetime")
+    self.csv["Time_Diff"] = self.csv["Datetime"].diff().dt.total_seconds().fillna(0)
+    typical_diff = self.csv["Time_Diff"].median()
+    gap = self.csv["Time_Diff"] >= typical_diff * 3
+    gap.iloc[:1] = False
+    self.csv.loc[gap, "Time_Diff"] = 0
+    self.csv["Segment"] = gap.cumsum()
+
+
+def measure(log, raw, process, repeat):
+    """Return the mean time [ms], peak allocation [MB] and processed frame."""
+    seconds = 0
+    for _ in range(repeat):
+        log.csv = raw.copy()
+        start = time.perf_counter()
+        process(log)
+        seconds += time.perf_counter() - start
+
+    log.csv = raw.copy()
+    tracemalloc.start()
+    process(log)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds / repeat * 1000, peak / 2**20, log.csv
+
+
+def benchmark_process_data(repeat=5):
+    data_dir = os.environ["STORAGE_PATH"]
+    csv_files = sorted(f for f in os.listdir(data_dir) if f.endswith(".csv"))
+
+    print(f"{'File':<28} {'Order':<9} {'Before ms':>10} {'After ms':>9} {'Before MB':>10} {'After MB':>9} Same")
+    for csv_file in csv_files:
+        file_name = os.path.splitext(csv_file)[0]
+        columns = plan_columns(list(sections))
+        log = LogLoader(os.path.join(data_dir, csv_file), columns, compact=False)
+        raw = log.plan.read_csv(os.path.join(data_dir, csv_file))
+
+        # The shuffled copy exercises the sort fallback
+        for order, frame in (("in order", raw), ("shuffled", raw.sample(frac=1, random_state=0))):
+            before_ms, before_mb, before = measure(log, frame, process_data_before, repeat)
+            after_ms, after_mb, after = measure(log, frame, LogLoader._process_data, repeat)
+            # Trips are now split at long pauses only, the rest must match
+            same = before.drop(columns="Segment").reset_index(drop=True).equals(
+                after.drop(columns="Segment").reset_index(drop=True)
+            )
+            print(
+                f"{file_name:<28} {order:<9} {before_ms:>10.1f} {after_ms:>9.1f} "
+                f"{before_mb:>10.2f} {after_mb:>9.2f} {same}"
+            )
+
+
+if __name__ == "__main__":
+    benchmark_process_data()
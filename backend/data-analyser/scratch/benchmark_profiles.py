@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Set default storage path if not set
+if "STORAGE_PATH" not in os.environ:
+    os.environ["STORAGE_PATH"] = "../data/ds4"
+
+from data_analyser.ecu_profile import (
+    GENERIC_PROFILE,
+    detect_profile,
+    parsing_plan,
+)
+from data_analyser.preflight import preflight_check
+from data_analyser.parameters.registry import plan_columns
+
+# Importing the analyser registers every section
+from data_analyser.data_analyser import DataAnalyser  # noqa: F401
+from data_analyser.parameters.registry import sections
+
+
+def time_read(plan, file_path, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        csv = plan.read_csv(file_path)
+        csv = csv[plan.sentinel_mask(csv)]
+        plan.parse_datetime(csv["Date"], csv["Time"])
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark_profiles(repeat=3):
+    data_dir = os.environ["STORAGE_PATH"]
+    columns = tuple(sorted(plan_columns(list(sections))))
+    timings = {}
+
+    for file_name in sorted(os.listdir(data_dir)):
+        if not file_name.endswith(".csv"):
+            continue
+        file_path = os.path.join(data_dir, file_name)
+        header = tuple(preflight_check(file_path, columns).header)
+        profile = detect_profile(header)
+
+        generic = time_read(parsing_plan(GENERIC_PROFILE, header, columns), file_path, repeat)
+        detected = time_read(parsing_plan(profile, header, columns), file_path, repeat)
+        timings.setdefault(profile, []).append((generic, detected))
+
+    print(f"{'Profile':<12} {'Files':>6} {'Generic [ms]':>14} {'Profile [ms]':>14} {'Speedup':>8}")
+    for profile, runs in timings.items():
+        generic = sum(g for g, _ in runs) * 1000
+        detected = sum(d for _, d in runs) * 1000
+        print(
+            f"{profile:<12} {len(runs):>6} {generic:>14.1f} {detected:>14.1f} "
+            f"{generic / detected:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_profiles()
@@ -0,0 +1,85 @@
+import copy
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Set default storage path if not set
+if "STORAGE_PATH" not in os.environ:
+    os.environ["STORAGE_PATH"] = "../data/ds4"
+
+from data_analyser.data_analyser import DataAnalyser
+from data_analyser.data_average import DataAverage
+from data_analyser.rolling_average import RollingAverage
+
+
+def synthetic_history(analyses, logs=1000, days=730, seed=0):
+    """Copies of the sample analyses spread over `days` days."""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    history = []
+    for _ in range(logs):
+        analysis = copy.deepcopy(rng.choice(analyses))
+        day = start + timedelta(days=rng.randrange(days))
+        analysis["overall"]["date"]["date"] = day.isoformat()
+        history.append(analysis)
+    return history
+
+
+def benchmark(days=30):
+    data_dir = os.environ["STORAGE_PATH"]
+    analyses = [
+        DataAnalyser(os.path.splitext(f)[0]).result
+        for f in sorted(os.listdir(data_dir))
+        if f.endswith(".csv")
+    ]
+    history = synthetic_history(analyses)
+    by_day = {}
+    for analysis in history:
+        by_day.setdefault(analysis["overall"]["date"]["date"], []).append(analysis)
+
+    # One request only aggregates the analyses of its window
+    start = time.perf_counter()
+    rolling = RollingAverage(history, days=days)
+    request_time = time.perf_counter() - start
+
+    # A rolling average for every logged day, by sliding the window
+    start = time.perf_counter()
+    sliding = {
+        last: DataAverage(aggregate=aggregate).result
+        for _, last, aggregate in rolling.windows()
+    }
+    sliding_time = time.perf_counter() - start
+
+    # The same averages re-aggregating every window's analyses
+    start = time.perf_counter()
+    recomputed = {}
+    for last in sliding:
+        first = last - timedelta(days=days - 1)
+        window = [
+            analysis
+            for day, logs in by_day.items()
+            if first <= date.fromisoformat(day) <= last
+            for analysis in logs
+        ]
+        recomputed[last] = DataAverage(window).result
+    recompute_time = time.perf_counter() - start
+
+    # Sums are added in a different order, which may flip a rounding tie
+    differing = sum(
+        json.dumps(sliding[day]) != json.dumps(recomputed[day]) for day in sliding
+    )
+    print(f"{len(history)} logs over {len(sliding)} days, {days} day window")
+    print(f"Request:    {request_time:.2f}s")
+    print(f"Sliding:    {sliding_time:.2f}s")
+    print(f"Recomputed: {recompute_time:.2f}s")
+    print(f"Windows differing by a rounding tie: {differing}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Set default storage path if not set
+if "STORAGE_PATH" not in os.environ:
+    os.environ["STORAGE_PATH"] = "../data/ds4"
+
+from data_analyser.compact import frame_memory_mb
+from data_analyser.data_analyser import DataAnalyser
+
+
+def analyse(file_name, compact):
+    start = time.perf_counter()
+    analyser = DataAnalyser(file_name, compact=compact)
+    return analyser, time.perf_counter() - start
+
+
+def compare_memory():
+    data_dir = os.environ["STORAGE_PATH"]
+    csv_files = sorted(f for f in os.listdir(data_dir) if f.endswith(".csv"))
+
+    total_csv_mb = total_full_mb = total_compact_mb = 0
+    mismatches = []
+
+    print(f"{'File':<28} {'CSV MB':>8} {'float64 MB':>11} {'compact MB':>11} {'Time x':>7}")
+    for csv_file in csv_files:
+        file_name = os.path.splitext(csv_file)[0]
+        csv_mb = os.path.getsize(os.path.join(data_dir, csv_file)) / 2**20
+
+        full, full_sec = analyse(file_name, compact=False)
+        compact, compact_sec = analyse(file_name, compact=True)
+        full_mb = frame_memory_mb(full.csv)
+        compact_mb = frame_memory_mb(compact.csv)
+        if full.result != compact.result:
+            mismatches.append(file_name)
+
+        total_csv_mb += csv_mb
+        total_full_mb += full_mb
+        total_compact_mb += compact_mb
+        print(
+            f"{file_name:<28} {csv_mb:>8.2f} {full_mb:>11.2f} {compact_mb:>11.2f} "
+            f"{compact_sec / full_sec:>7.2f}"
+        )
+
+    print(
+        f"\nPer MB of CSV: float64 {total_full_mb / total_csv_mb:.2f} MB, "
+        f"compact {total_compact_mb / total_csv_mb:.2f} MB "
+        f"({1 - total_compact_mb / total_full_mb:.0%} less)"
+    )
+    print(f"Results differing from the float64 path: {mismatches or 'none'}")
+
+
+if __name__ == "__main__":
+    compare_memory()
@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from data_analyser.data_analyser import analysis_sections
+from data_analyser.ecu_profile import header_columns, text_columns
+from data_analyser.parameters.registry import plan_columns
+
+# Read by the email receiver to skip CSVs of a ZIP that are no logs
+OUTPUT_PATH = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__),
+        "../../email-receiver/src/process_mail/analysed_columns.json",
+    )
+)
+
+
+def analysed_columns():
+    """The header columns of the registered sections, as the email receiver
+    checks them."""
+    return {
+        "textColumns": sorted(text_columns),
+        "analysedColumns": sorted(
+            header_columns(plan_columns(list(analysis_sections)))
+        ),
+    }
+
+
+def export_analysed_columns(check=False):
+    columns = json.dumps(analysed_columns(), indent=2) + "\n"
+    if check:
+        with open(OUTPUT_PATH, encoding="utf-8") as columns_file:
+            if columns_file.read() != columns:
+                sys.exit(f"{OUTPUT_PATH} is out of date, run without --check")
+        print(f"{OUTPUT_PATH} is up to date")
+        return
+
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as columns_file:
+        columns_file.write(columns)
+    print(f"Wrote {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    # Usage: python3 ../scratch/export_analysed_columns.py [--check]
+    export_analysed_columns(check="--check" in sys.argv[1:])
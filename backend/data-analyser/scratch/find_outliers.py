@@ -8,62 +8,52 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'
 if "STORAGE_PATH" not in os.environ:
     os.environ["STORAGE_PATH"] = "../data/ds4"
 
+from config import STATE_PATH, STORAGE_PATH
 from data_analyser.data_analyser import DataAnalyser
-from logger_setup import setup_logger
+from data_analyser.metric_index import MetricIndex
 
-logger = setup_logger(__name__)
+metrics = [
+    "engine.injector.injector2",
+    "engine.injector.injector4",
+    "fap.pressure.max_mbar",
+    "fap.temp.max_c",
+]
 
 
-def find_outliers():
-    # Ensure STORAGE_PATH is set in environment or handled by DataAnalyser
-    data_dir = "../data/ds4/"
-    if not os.path.exists(data_dir):
-        print(
-            f"Directory {data_dir} not found. Make sure you are in backend/data-analyser/src"
-        )
-        return
-
+def find_outliers(method="mad"):
+    # Logs are analysed once, later runs only scan the index
+    index = MetricIndex(f"{STATE_PATH}/metric_index")
     csv_files = [
-        os.path.splitext(f)[0] for f in os.listdir(data_dir) if f.endswith(".csv")
+        os.path.splitext(f)[0] for f in os.listdir(STORAGE_PATH) if f.endswith(".csv")
     ]
-
-    outliers = []
-
-    print(f"Scanning {len(csv_files)} files for outliers...")
-    for file_name in csv_files:
+    missing = [file_name for file_name in csv_files if file_name not in index.rows]
+    print(f"Indexing {len(missing)} of {len(csv_files)} files...")
+    for file_name in missing:
         try:
-            analysis = DataAnalyser(file_name).result
-
-            file_outliers = []
-
-            # Check injector4
-            inj2 = analysis.get("engine", {}).get("injector", {}).get("injector2")
-            if inj2 is not None and inj2 < 0.79:
-                file_outliers.append(f"injector2: {inj2}")
-
-            # Check fap max pressure
-            max_p = analysis.get("fap", {}).get("pressure", {}).get("max_mbar")
-            if max_p is not None and max_p > 1000:
-                file_outliers.append(f"max_mbar: {max_p}")
-
-            # Check fap max temp
-            max_t = analysis.get("fap", {}).get("temp", {}).get("max_c")
-            if max_t is not None and max_t > 3000:
-                file_outliers.append(f"max_c: {max_t}")
+            index.upsert(file_name, DataAnalyser(file_name).result)
+        except Exception as e:
+            print(f"Skipping {file_name}: {e}")
 
-            if file_outliers:
-                print(f"FILE: {file_name} -> {', '.join(file_outliers)}")
-                outliers.append(file_name)
+    known = [metric for metric in metrics if metric in index.columns]
+    if not known:
+        print("None of the metrics are indexed.")
+        return
 
-        except Exception as e:
-            # Silent error for files that might be corrupted or missing columns
-            pass
+    outliers = set()
+    for metric, result in index.outliers(known, method=method).items():
+        print(f"{metric}: center {result['center']}, spread {result['spread']}")
+        for outlier in result["outliers"]:
+            print(
+                f"  FILE: {outlier['analysisId']} -> {outlier['value']} "
+                f"(score {outlier['score']})"
+            )
+            outliers.add(outlier["analysisId"])
 
     if not outliers:
-        print("No outliers found with current thresholds.")
+        print("No outliers found.")
     else:
-        print(f"\nFound {len(set(outliers))} unique files with outliers.")
+        print(f"\nFound {len(outliers)} unique files with outliers.")
 
 
 if __name__ == "__main__":
-    find_outliers()
+    find_outliers(*sys.argv[1:])
@@ -0,0 +1,39 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from data_analyser.constants.sketches import sketch_alpha, sketch_quantiles
+from data_analyser.quantile_sketch import QuantileSketch
+
+
+def check_accuracy(logs=200, rows=5000, seed=0):
+    """Merge per-log sketches and compare their percentiles with exact ones."""
+    rng = np.random.default_rng(seed)
+    chunks = [
+        rng.lognormal(mean=9 + i / logs, sigma=0.5, size=rows) for i in range(logs)
+    ]
+
+    merged = QuantileSketch()
+    stored_bytes = 0
+    for chunk in chunks:
+        stored = json.dumps(QuantileSketch.from_values(chunk).to_json())
+        stored_bytes += len(stored)
+        merged.merge(QuantileSketch.from_json(json.loads(stored)))
+
+    values = np.concatenate(chunks)
+    print(f"{logs} logs, {len(values)} values, alpha {sketch_alpha}")
+    print(f"Average stored sketch: {stored_bytes / logs:.0f} bytes")
+    for name, q in sketch_quantiles.items():
+        exact = np.quantile(values, q, method="lower")
+        estimate = merged.quantile(q)
+        error = abs(estimate - exact) / exact
+        print(f"{name}: exact {exact:.1f}, sketch {estimate:.1f}, error {error:.4f}")
+
+
+if __name__ == "__main__":
+    check_accuracy()
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import BACKFILL_CPU_BUDGET, DATA_ANALYSER_VERSION, STORAGE_PATH
+from logger_setup import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def log_file_mtime(file_id):
+    """Return the modification time of a stored log, or None if it is missing."""
+    try:
+        return os.stat(f"{STORAGE_PATH}/{file_id}.csv").st_mtime_ns
+    except OSError:
+        return None
+
+
+class BackfillJob:
+    """Re-analyse stored logs whose result was produced by an older analyser.
+
+    Progress is kept in a BackfillManifest, so an interrupted run resumes where
+    it stopped and a finished run is a no-op until the analyser version bumps.
+    The job runs on its own single worker, pauses while live requests are in
+    flight and sleeps between files to stay within the configured CPU budget.
+    """
+
+    def __init__(
+        self, nats_handler, manifest, cpu_budget=BACKFILL_CPU_BUDGET, poll_sec=1.0
+    ):
+        self.nats_handler = nats_handler
+        self.manifest = manifest
+        self.cpu_budget = min(max(cpu_budget, 0.01), 1.0)
+        self.poll_sec = poll_sec
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def record(self, file_id, status):
+        """Remember that file_id was analysed with the current analyser version."""
+        mtime = log_file_mtime(file_id)
+        if mtime is None:
+            return
+        try:
+            self.manifest.mark(file_id, mtime, DATA_ANALYSER_VERSION, status)
+        except OSError as e:
+            logger.warning(f"Failed to record backfill state for {file_id}: {e}")
+
+    def find_stale_files(self, force=False):
+        """List stored logs without a result from the current analyser version."""
+        stale = []
+        with os.scandir(STORAGE_PATH) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.endswith(".csv"):
+                    continue
+                file_id = entry.name[: -len(".csv")]
+                mtime = entry.stat().st_mtime_ns
+                if force or self.manifest.is_stale(
+                    file_id, mtime, DATA_ANALYSER_VERSION
+                ):
+                    stale.append(file_id)
+        return sorted(stale)
+
+    def start(self, force=False):
+        if self.running:
+            logger.info("Backfill already running, ignoring request")
+            return False
+        self._task = asyncio.create_task(self.run(force))
+        return True
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def run(self, force=False):
+        loop = asyncio.get_event_loop()
+        stale = await loop.run_in_executor(self.executor, self.find_stale_files, force)
+        logger.info(
+            f"Backfill found {len(stale)} log(s) to re-analyse with version {DATA_ANALYSER_VERSION}"
+        )
+
+        done = 0
+        for file_id in stale:
+            await self._wait_for_idle()
+
+            start = time.monotonic()
+            status = await self.nats_handler.analyse_and_publish(
+                file_id, executor=self.executor
+            )
+            elapsed = time.monotonic() - start
+            if status is not None:
+                done += 1
+
+            # Sleep so the analysis time is at most cpu_budget of the wall time
+            await asyncio.sleep(elapsed * (1 - self.cpu_budget) / self.cpu_budget)
+
+        logger.info(f"Backfill finished, re-analysed {done}/{len(stale)} log(s)")
+
+    async def _wait_for_idle(self):
+        while self.nats_handler.active_requests > 0:
+            await asyncio.sleep(self.poll_sec)
@@ -0,0 +1,69 @@
+import json
+import os
+
+from logger_setup import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class BackfillManifest:
+    """Append-only record of which analyser version produced each file's result.
+
+    Every analysed file appends one JSON line. On load the lines are replayed
+    (last entry wins), so a crash mid-run loses at most the file in progress.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lines = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, encoding="utf-8") as manifest:
+            for line in manifest:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn write from a crash, the file is re-analysed
+                    logger.warning(f"Skipping corrupted manifest line in {self.path}")
+                    continue
+                self.entries[entry["fileId"]] = entry
+                self._lines += 1
+
+        if self._lines > 2 * len(self.entries):
+            self.compact()
+
+    def is_stale(self, file_id, mtime, version):
+        """Return True if the file has no result for this version and mtime."""
+        entry = self.entries.get(file_id)
+        return (
+            entry is None or entry["version"] != version or entry["mtime"] != mtime
+        )
+
+    def mark(self, file_id, mtime, version, status):
+        entry = {
+            "fileId": file_id,
+            "mtime": mtime,
+            "version": version,
+            "status": status,
+        }
+        self.entries[file_id] = entry
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as manifest:
+            manifest.write(json.dumps(entry) + "\n")
+        self._lines += 1
+
+    def compact(self):
+        """Rewrite the manifest with one line per file."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as manifest:
+            for entry in self.entries.values():
+                manifest.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+        self._lines = len(self.entries)
+        logger.info(f"Compacted backfill manifest to {self._lines} entries")
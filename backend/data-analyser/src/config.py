@@ -7,3 +7,13 @@ load_dotenv()
 NATS_URL = os.getenv("NATS_URL", "nats://localhost:4222")
 STORAGE_PATH = os.getenv("STORAGE_PATH", "/tmp/uploads")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+STATE_PATH = os.getenv("STATE_PATH", "/tmp/data-analyser")
+# Same setting as the http-backend's, which re-requests analyses of other versions
+DATA_ANALYSER_VERSION = os.getenv("DATA_ANALYSER_VERSION", "")
+BACKFILL_CPU_BUDGET = float(os.getenv("BACKFILL_CPU_BUDGET", "0.25"))
+BACKFILL_ON_STARTUP = os.getenv("BACKFILL_ON_STARTUP", "false").lower() == "true"
+COMPACT_FRAMES = os.getenv("COMPACT_FRAMES", "false").lower() == "true"
+# Logs estimated longer than this are rejected before they are parsed
+MAX_LOG_ROWS = int(os.getenv("MAX_LOG_ROWS", "5000000"))
+SERIES_CACHE_SIZE = int(os.getenv("SERIES_CACHE_SIZE", "256"))
+QUERY_WORKERS = int(os.getenv("QUERY_WORKERS", "4"))
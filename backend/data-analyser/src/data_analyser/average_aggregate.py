@@ -0,0 +1,224 @@
+import numpy as np
+
+from data_analyser.constants.common import range_labels
+from data_analyser.quantile_sketch import QuantileSketch
+
+# Keys the averages are weighted by
+weight_keys = [
+    "overall.distance_km",
+    "overall.duration.engineOn_sec",
+    "overall.duration.idle_sec",
+    "overall.duration.driving_sec",
+    "fapRegen.duration_sec",
+    *(f"fuelConsumption.bySpeedRange._{label}_km" for label in range_labels),
+]
+
+sketch_fields = ("alpha", "zero", "index", "count", "negIndex", "negCount")
+
+
+def flatten_analysis(analysis, prefix="", flat=None):
+    flat = {} if flat is None else flat
+    for key, value in analysis.items():
+        if isinstance(value, dict) and value:
+            flatten_analysis(value, f"{prefix}{key}.", flat)
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def is_number(value):
+    return value is None or (
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+    )
+
+
+class AverageAggregate:
+    """Partial aggregates of a group of analyses, mergeable with other groups.
+
+    Per flattened result key it holds the sum, count, min and max, the sums of
+    value x weight and of weight against every weight key, and the merged
+    histograms and quantile sketches. The average of any union of groups is
+    computed from the merged aggregates alone.
+    """
+
+    def __init__(self):
+        self.logs = 0
+        # Flattened result key -> row of the arrays below
+        self.keys = {}
+        self.sums = np.zeros(0)
+        self.counts = np.zeros(0)
+        self.mins = np.zeros(0)
+        self.maxs = np.zeros(0)
+        # Rows are value keys, columns the weight keys
+        self.products = np.zeros((0, len(weight_keys)))
+        self.weights = np.zeros((0, len(weight_keys)))
+        self.histograms = {}
+        self.sketches = {}
+
+    @classmethod
+    def from_analyses(cls, analyses):
+        aggregate = cls()
+        # Flatten the nested structure into keys
+        # E.g. "overall.distance" becomes a seperate key
+        rows = [flatten_analysis(analysis) for analysis in analyses]
+        aggregate.logs = len(rows)
+        if not rows:
+            return aggregate
+
+        # Keys holding lists or text in any log are skipped
+        numeric = {}
+        for row in rows:
+            for key, value in row.items():
+                numeric[key] = numeric.get(key, True) and is_number(value)
+        keys = [key for key, is_numeric in numeric.items() if is_numeric]
+        aggregate.keys = {key: column for column, key in enumerate(keys)}
+
+        values = np.array(
+            [[row.get(key) for key in keys] for row in rows], dtype=np.float64
+        )
+        valid = ~np.isnan(values)
+        aggregate.sums = np.where(valid, values, 0).sum(axis=0)
+        aggregate.counts = valid.sum(axis=0).astype(np.float64)
+        aggregate.mins = np.fmin.reduce(values, axis=0)
+        aggregate.maxs = np.fmax.reduce(values, axis=0)
+
+        # Missing values and weights are zeroed, so every product and weight
+        # sum only covers the logs having both
+        weights = np.zeros((len(values), len(weight_keys)))
+        for column, key in enumerate(weight_keys):
+            if key in aggregate.keys:
+                weights[:, column] = np.nan_to_num(values[:, aggregate.keys[key]])
+        aggregate.products = np.nan_to_num(values).T @ weights
+        aggregate.weights = valid.T.astype(np.float64) @ weights
+
+        for row in rows:
+            for key in row:
+                if key.endswith(".shape"):
+                    aggregate._add_row_histogram(row, key[: -len(".shape")])
+                elif key.endswith(".negCount"):
+                    aggregate._add_row_sketch(row, key[: -len(".negCount")])
+        return aggregate
+
+    def _add_row_histogram(self, row, key):
+        index = row.get(f"{key}.index")
+        if isinstance(index, list) and index:
+            self._add_histogram(key, row[f"{key}.shape"], index, row[f"{key}.sec"])
+
+    def _add_histogram(self, key, shape, index, sec):
+        current = self.histograms.get(key)
+        if current is None:
+            current = (list(shape), np.zeros(int(np.prod(shape))))
+            self.histograms[key] = current
+        elif current[0] != list(shape):
+            return
+        np.add.at(current[1], index, sec)
+
+    def _add_row_sketch(self, row, key):
+        fields = {field: row.get(f"{key}.{field}") for field in sketch_fields}
+        if not isinstance(fields["index"], list):
+            return
+        sketch = QuantileSketch.from_json(fields)
+        if key in self.sketches:
+            self.sketches[key].merge(sketch)
+        else:
+            self.sketches[key] = sketch
+
+    def merge(self, other):
+        """Return the aggregate of both groups, neither is modified."""
+        if not other.logs:
+            return self
+        if not self.logs:
+            return other
+
+        merged = AverageAggregate()
+        merged.logs = self.logs + other.logs
+        if self.keys == other.keys:
+            # Groups of the same analyser version share their keys
+            merged.keys = self.keys
+            merged.sums = self.sums + other.sums
+            merged.counts = self.counts + other.counts
+            merged.mins = np.fmin(self.mins, other.mins)
+            merged.maxs = np.fmax(self.maxs, other.maxs)
+            merged.products = self.products + other.products
+            merged.weights = self.weights + other.weights
+        else:
+            merged._merge_rows(self, other)
+
+        for key, (shape, counts) in self.histograms.items():
+            merged.histograms[key] = (shape, counts.copy())
+        for key, (shape, counts) in other.histograms.items():
+            index = np.flatnonzero(counts)
+            merged._add_histogram(key, shape, index, counts[index])
+
+        for key in self.sketches.keys() | other.sketches.keys():
+            parts = [
+                sketches[key]
+                for sketches in (self.sketches, other.sketches)
+                if key in sketches
+            ]
+            sketch = QuantileSketch(parts[0].alpha)
+            for part in parts:
+                sketch.merge(part)
+            merged.sketches[key] = sketch
+        return merged
+
+    def _merge_rows(self, first, second):
+        self.keys = dict(first.keys)
+        for key in second.keys:
+            self.keys.setdefault(key, len(self.keys))
+        rows = np.array([self.keys[key] for key in second.keys], dtype=np.int64)
+        size, known = len(self.keys), len(first.keys)
+
+        for name, fill in (("sums", 0), ("counts", 0), ("mins", np.nan), ("maxs", np.nan)):
+            merged = np.full(size, fill, dtype=np.float64)
+            merged[:known] = getattr(first, name)
+            setattr(self, name, merged)
+        self.sums[rows] += second.sums
+        self.counts[rows] += second.counts
+        self.mins[rows] = np.fmin(self.mins[rows], second.mins)
+        self.maxs[rows] = np.fmax(self.maxs[rows], second.maxs)
+
+        for name in ("products", "weights"):
+            merged = np.zeros((size, len(weight_keys)))
+            merged[:known] = getattr(first, name)
+            merged[rows] += getattr(second, name)
+            setattr(self, name, merged)
+
+    def stat(self, key, operation):
+        """Return the sum, mean, min or max of a key, None if no log has it."""
+        row = self.keys.get(key)
+        if row is None:
+            return None
+        if operation == "mean":
+            return self.sums[row] / self.counts[row] if self.counts[row] else np.nan
+        return {
+            "sum": self.sums,
+            "min": self.mins,
+            "max": self.maxs,
+        }[operation][row]
+
+    def count(self, key):
+        row = self.keys.get(key)
+        return int(self.counts[row]) if row is not None else None
+
+    def weighted(self, values_key, weights_key):
+        """Return the sums of value x weight and of weight over the logs
+        having both, None if no log has the value key."""
+        row = self.keys.get(values_key)
+        if row is None or weights_key not in weight_keys:
+            return None
+        column = weight_keys.index(weights_key)
+        return self.products[row, column], self.weights[row, column]
+
+    def histogram(self, key):
+        if key not in self.histograms:
+            return None
+        shape, counts = self.histograms[key]
+        counts = np.round(counts, 1)
+        index = np.flatnonzero(counts)
+        if not len(index):
+            return None
+        return {"shape": shape, "index": index.tolist(), "sec": counts[index].tolist()}
+
+    def sketch(self, key):
+        return self.sketches.get(key)
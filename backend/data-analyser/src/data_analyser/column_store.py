@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from config import STATE_PATH
+from logger_setup import setup_logger
+
+from data_analyser.compact import compact_frame
+
+logger = setup_logger(__name__)
+
+# Bump when the on-disk layout changes, older copies are rebuilt
+COLUMN_FORMAT = 1
+
+
+def column_store_path(file_id):
+    return f"{STATE_PATH}/columns/{file_id}"
+
+
+def build_column_store(file_id, csv, mtime):
+    """Write a typed columnar copy of a processed log.
+
+    Every column is one .npy file in its compact dtype (int32, uint8 flags or
+    float32 with the decimals to restore it), Datetime as epoch ms int64.
+    meta.json holds the min and max of every column, so queries skip logs
+    that cannot match their predicates without reading them.
+    """
+    compact = compact_frame(csv)
+    decimals = compact.attrs["decimals"]
+
+    target = column_store_path(file_id)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{file_id}.", dir=os.path.dirname(target))
+    try:
+        times = compact["Datetime"].to_numpy().view("int64") // 1_000_000
+        np.save(f"{tmp_dir}/Datetime.npy", times)
+
+        columns = {}
+        for i, name in enumerate(compact.columns):
+            if name == "Datetime" or compact[name].dtype.kind not in "iuf":
+                continue
+            values = compact[name].to_numpy()
+            np.save(f"{tmp_dir}/c{i}.npy", values)
+            finite = values[np.isfinite(values)] if values.dtype.kind == "f" else values
+            columns[name] = {
+                "file": f"c{i}.npy",
+                "decimals": decimals.get(name),
+                "min": float(finite.min()) if len(finite) else None,
+                "max": float(finite.max()) if len(finite) else None,
+            }
+
+        with open(f"{tmp_dir}/meta.json", "w") as meta_file:
+            json.dump(
+                {
+                    "format": COLUMN_FORMAT,
+                    "mtime": mtime,
+                    "rows": len(compact),
+                    "start": int(times.min()) if len(times) else None,
+                    "end": int(times.max()) if len(times) else None,
+                    "columns": columns,
+                },
+                meta_file,
+            )
+
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        try:
+            os.rename(tmp_dir, target)
+        except OSError:
+            # Another worker built the same copy concurrently
+            if not os.path.isdir(target):
+                raise
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Stored {len(columns)} columns of {file_id}")
+    return ColumnStore(target)
+
+
+class ColumnStore:
+    """A stored columnar copy, columns are memory-mapped and read on demand."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(f"{path}/meta.json") as meta_file:
+            meta = json.load(meta_file)
+        self.format = meta["format"]
+        self.mtime = meta["mtime"]
+        self.rows = meta["rows"]
+        self.start = meta["start"]
+        self.end = meta["end"]
+        self.columns = meta["columns"]
+
+    def times(self):
+        return np.load(f"{self.path}/Datetime.npy", mmap_mode="r")
+
+    def column(self, name):
+        """Return a column as float64, float32 ones restored to their decimals."""
+        info = self.columns[name]
+        values = np.load(f"{self.path}/{info['file']}", mmap_mode="r")
+        values = values.astype(np.float64)
+        if info["decimals"] is not None:
+            values = np.round(values, info["decimals"])
+        return values
+
+
+def load_column_store(file_id, mtime):
+    """Return the stored columnar copy of a log, None if missing or stale."""
+    try:
+        store = ColumnStore(column_store_path(file_id))
+    except (OSError, ValueError, KeyError):
+        return None
+    if store.format != COLUMN_FORMAT or store.mtime != mtime:
+        return None
+    return store
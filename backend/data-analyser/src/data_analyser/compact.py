@@ -0,0 +1,85 @@
+import numpy as np
+
+# Most decimals a float32 column may hold. ECU values are logged with at most
+# 2 decimals, and float32 restores them exactly up to ~7 significant digits.
+MAX_DECIMALS = 4
+
+# 0/1 signals stored as uint8
+flag_columns = {"REGEN", "FanSlowRelay", "FanHighRelay", "BR", "CL"}
+
+# Columns derived in _process_data that are kept at full precision
+exact_columns = {"Datetime", "Time_Diff"}
+
+
+def _decimals(values):
+    """Return the number of decimals values are logged with, None if too many."""
+    for decimals in range(MAX_DECIMALS + 1):
+        if np.array_equal(np.round(values, decimals), values):
+            return decimals
+    return None
+
+
+def _compact_dtype(name, values):
+    """Return the compact dtype of a column and the decimals to restore it with."""
+    finite = values[np.isfinite(values)]
+    has_nan = len(finite) != len(values)
+
+    decimals = _decimals(finite)
+    if decimals is None:
+        return None, None
+
+    if decimals == 0 and not has_nan:
+        if name in flag_columns and np.isin(finite, (0, 1)).all():
+            return np.uint8, None
+        # int32 rather than the smallest fit, so products of signals can't overflow
+        if np.abs(finite).max(initial=0) < 2**31:
+            return np.int32, None
+
+    restored = np.round(finite.astype(np.float32).astype(np.float64), decimals)
+    if np.array_equal(restored, finite):
+        return np.float32, decimals
+    return None, None
+
+
+def compact_frame(csv):
+    """Return csv with each numeric column stored in the smallest exact dtype.
+
+    Integer signals become int32 (0/1 flags uint8), float signals float32 and
+    the Date/Time text columns are dropped.
+    The decimals needed to restore each float32 column exactly are kept in
+    csv.attrs["decimals"] for expand_frame.
+    """
+    dtypes = {}
+    decimals = {}
+    for col in csv.columns:
+        if col in exact_columns or csv[col].dtype.kind not in "iuf":
+            continue
+        values = csv[col].to_numpy(dtype=np.float64)
+        dtype, col_decimals = _compact_dtype(col, values)
+        if dtype is not None and dtype != csv[col].dtype:
+            dtypes[col] = dtype
+        if col_decimals is not None:
+            decimals[col] = col_decimals
+
+    # Date and Time are parsed into Datetime already, no metric reads the text
+    compact = csv.drop(columns=["Date", "Time"], errors="ignore")
+    compact = compact.astype(dtypes) if dtypes else compact
+    compact.attrs["decimals"] = decimals
+    return compact
+
+
+def expand_frame(csv):
+    """Return a copy of csv whose float32 columns are restored to exact float64.
+
+    Integer columns stay compact, their reductions are already exact.
+    """
+    expanded = csv.copy()
+    for col, decimals in csv.attrs.get("decimals", {}).items():
+        if col in expanded.columns:
+            expanded[col] = np.round(expanded[col].astype(np.float64), decimals)
+    return expanded
+
+
+def frame_memory_mb(csv):
+    """Return the memory used by csv in MB."""
+    return csv.memory_usage(index=True, deep=True).sum() / 2**20
@@ -21,3 +21,12 @@ range_labels = [
     "195-200",
     "200+",
 ]
+
+# A pause in the log of this many seconds or more starts a new trip segment,
+# shorter hiccups of the logger do not
+trip_min_pause_seconds = 60
+# Trip segments shorter than this are merged into the previous one
+trip_min_seconds = 60
+
+# Signals the frontend can chart with series.request
+chart_signals = ["FAPpressure", "FAPtemp", "FAPsoot", "Speed", "Revs", "Coolant"]
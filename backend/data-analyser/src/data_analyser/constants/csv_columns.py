@@ -1,64 +0,0 @@
-overall_parameters = ["Revs", "Speed", "ExternalTemp", "Datetime", "Time_Diff"]
-driving_parameters = [
-    "Revs",
-    "Speed",
-    "InjFlow",
-    "AccelPedalPos",
-    "Datetime",
-    "Time_Diff",
-]
-engine_parameters = [
-    "Battery",
-    "Coolant",
-    "Datetime",
-    "Errors",
-    "FuelPress",
-    "FuelPressInstr",
-    "Inj.1FlowCorr",
-    "Inj.2FlowCorr",
-    "Inj.3FlowCorr",
-    "Inj.4FlowCorr",
-    "OilCarbon",
-    "OilDilution",
-    "OilTemp",
-    "REGEN",
-    "Revs",
-    "Speed",
-    "TurboInstr",
-    "Turbopress",
-]
-fap_parameters = [
-    "Avg10regen",
-    "FAP life",
-    "FAPAdditiveRemain",
-    "FAPAdditiveVol",
-    "FAPcinder",
-    "FAPdeposits",
-    "FAPlifeLeft",
-    "FAPpressure",
-    "FAPsoot",
-    "FAPtemp",
-    "LastRegen",
-    "Revs",
-    "Speed",
-]
-fap_regen_parameters = [
-    "FAPpressure",
-    "FAPtemp",
-    "FAPsoot",
-    "Revs",
-    "Speed",
-    "InjFlow",
-    "REGEN",
-    "LastRegen",
-    "Datetime",
-    "Time_Diff",
-]
-fuel_parameters = [
-    "Revs",
-    "Speed",
-    "InjFlow",
-    "AccelPedalPos",
-    "Datetime",
-    "Time_Diff",
-]
@@ -0,0 +1,23 @@
+# Raw values an ECU reports when a sensor read fails, rows holding them are dropped
+generic_sentinels = {
+    "FAPpressure": [65280.0],
+    "FAPtemp": [25855.0],
+}
+
+# Known ECU families, detected from the CSV header. A profile matches when the
+# header contains all of its marker columns; profiles are tried in order.
+#   markers: columns only this family logs
+#   date_format: format of "Date Time", rows it cannot parse fall back to inference
+#   dtypes: column -> dtype pinned at read time, pandas' inference is faster for
+#           plain numeric columns so only pin columns that need it
+#   sentinels: column -> raw values to drop
+#   aliases: header column -> name used by the analyser
+ecu_profiles = {
+    "DCM62v2": {
+        "markers": ["EGRposInstr", "PowerAccuHealth", "AirMixerInstr"],
+        "date_format": "%Y.%m.%d %H:%M:%S.%f",
+        "dtypes": {},
+        "sentinels": generic_sentinels,
+        "aliases": {},
+    },
+}
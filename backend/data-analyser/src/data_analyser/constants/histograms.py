@@ -0,0 +1,7 @@
+# Fixed bin edges of the distribution histograms. Stored histograms are merged
+# bin by bin, so changing edges requires bumping DATA_ANALYSER_VERSION and a backfill.
+# Values outside the edges are counted in the first or last bin.
+revs_edges = list(range(0, 5001, 250))
+inj_flow_edges = list(range(0, 61, 5))
+speed_edges = list(range(0, 201, 10))
+fap_temp_edges = list(range(0, 701, 25))
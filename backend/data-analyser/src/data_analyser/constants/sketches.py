@@ -0,0 +1,16 @@
+# Quantile sketches of the signals summarised by per-log medians. Stored
+# sketches are merged bucket by bucket, so changing alpha requires bumping
+# DATA_ANALYSER_VERSION and a backfill.
+sketch_alpha = 0.01
+sketch_max_buckets = 1024
+
+# Result key -> log column
+sketch_signals = {
+    "oilDilution": "OilDilution",
+    "oilCarbonate": "OilCarbon",
+    "errors": "Errors",
+    "fapLife": "FAP life",
+    "fapLifeLeft": "FAPlifeLeft",
+}
+
+sketch_quantiles = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
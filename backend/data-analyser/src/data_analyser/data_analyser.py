@@ -1,56 +1,58 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from json import dumps
 
-import pandas as pd
-from config import STORAGE_PATH
+from config import COMPACT_FRAMES, STORAGE_PATH
 from logger_setup import setup_logger
 
-from data_analyser.constants.csv_columns import (
+from data_analyser.column_store import build_column_store
+from data_analyser.compact import expand_frame
+from data_analyser.constants.common import chart_signals
+from data_analyser.exceptions.exceptions import DataAnalyseException
+from data_analyser.log_loader import LogLoader
+
+# Importing the parameters modules registers their sections, the import order
+# is the order of the sections in the result
+from data_analyser.parameters import (  # noqa: F401
+    distribution_parameters,
     driving_parameters,
     engine_parameters,
     fap_parameters,
     fap_regen_parameters,
     fuel_parameters,
     overall_parameters,
+    sketch_parameters,
+    trip_parameters,
 )
-from data_analyser.exceptions.exceptions import DataAnalyseException
-from data_analyser.parameters.driving_parameters import DrivingParameters
-from data_analyser.parameters.engine_parameters import EngineParameters
-from data_analyser.parameters.fap_parameters import FapParameters
-from data_analyser.parameters.fap_regen_parameters import FapRegenParameters
-from data_analyser.parameters.fuel_parameters import FuelParameters
-from data_analyser.parameters.overall_parameters import OverallParameters
+from data_analyser.parameters.registry import plan_columns
+from data_analyser.parameters.registry import sections as analysis_sections
+from data_analyser.parameters.shared_inputs import SharedInputs
+from data_analyser.pyramid import build_pyramid
 
 # Set up logger for this module
 logger = setup_logger(__name__)
 
 
 class DataAnalyser:
-    def __init__(self, file_id):
+    def __init__(
+        self,
+        file_id,
+        selected_sections=None,
+        max_workers=1,
+        compact=COMPACT_FRAMES,
+        pyramid=False,
+        column_store=False,
+    ):
         file_path = f"{STORAGE_PATH}/{file_id}.csv"
-        self.all_columns = set(
-            driving_parameters
-            + engine_parameters
-            + fap_parameters
-            + fap_regen_parameters
-            + overall_parameters
-        )
-        try:
-            self.csv = pd.read_csv(file_path, delimiter=";", encoding="latin1")
-            logger.info(f"Successfully read log file: {file_path}")
-        except Exception as e:
-            logger.error(
-                f"Failed to read log file {file_path}: {str(e)}", exc_info=True
-            )
-            raise DataAnalyseException("Failed to read log file.")
+        self.sections = self._select_sections(selected_sections)
+        self.max_workers = max_workers
+        self.compact = compact
+        self.all_columns = plan_columns(self.sections)
 
-        try:
-            self._process_data()
-            logger.info(f"Successfully processed log file: {file_path}")
-        except Exception as e:
-            logger.error(
-                f"Failed to process log file {file_path}: {str(e)}", exc_info=True
-            )
-            raise DataAnalyseException("Failed to process log file.")
+        log = LogLoader(file_path, self.all_columns, compact)
+        self.preflight = log.preflight
+        self.profile = log.profile
+        self.csv = log.csv
 
         try:
             self.result = self._analyse_parameters()
@@ -61,7 +63,10 @@ class DataAnalyser:
             )
             raise DataAnalyseException("Failed to analyse log file.")
 
-        self.result = self._analyse_parameters()
+        if pyramid:
+            self._build_pyramid(file_id, file_path)
+        if column_store:
+            self._build_column_store(file_id, file_path)
 
     def __str__(self):
         return str(self.to_json())
@@ -69,60 +74,66 @@ class DataAnalyser:
     def to_json(self):
         return dumps(self.result)
 
-    def _process_data(self):
-        """Preprocess the data."""
-        numeric_columns = list(set(self.all_columns) - {"Datetime", "Time_Diff"})
-        for col in numeric_columns:
-            if col in self.csv.columns:
-                self.csv[col] = pd.to_numeric(self.csv[col], errors="coerce")
+    @staticmethod
+    def _select_sections(selected_sections):
+        """Validate the requested sections and return them in result order."""
+        if not selected_sections:
+            return list(analysis_sections)
 
-        # Drop rows with unrealistic values of FAPpressure or FAPtemp
-        if "FAPpressure" in self.csv.columns:
-            self.csv = self.csv[self.csv.get("FAPpressure") != 65280.0]
-        if "FAPtemp" in self.csv.columns:
-            self.csv = self.csv[self.csv.get("FAPtemp") != 25855.0]
+        unknown = set(selected_sections) - set(analysis_sections)
+        if unknown:
+            raise DataAnalyseException(
+                f"Unknown analysis section(s): {', '.join(sorted(unknown))}."
+            )
+        return [name for name in analysis_sections if name in selected_sections]
 
-        self.csv["Datetime"] = pd.to_datetime(
-            self.csv["Date"] + " " + self.csv["Time"], errors="coerce"
-        )
+    def _build_pyramid(self, file_id, file_path):
+        """Store the chart pyramid of the log, a failure only costs a rebuild later."""
+        try:
+            signals = [col for col in chart_signals if col in self.csv.columns]
+            csv = expand_frame(self.csv[["Datetime", *signals]])
+            build_pyramid(file_id, csv, os.stat(file_path).st_mtime_ns)
+        except Exception as e:
+            logger.warning(f"Failed to build pyramid for {file_id}: {e}", exc_info=True)
 
-        # Drop rows where Datetime is NaT (invalid datetime)
-        self.csv = self.csv.dropna(subset=["Datetime"])
+    def _build_column_store(self, file_id, file_path):
+        """Store the columnar copy queries read, a failure only costs a rebuild later."""
+        try:
+            csv = expand_frame(self.csv) if self.compact else self.csv
+            build_column_store(file_id, csv, os.stat(file_path).st_mtime_ns)
+        except Exception as e:
+            logger.warning(
+                f"Failed to store columns of {file_id}: {e}", exc_info=True
+            )
 
-        self.csv = self.csv.sort_values("Datetime")
-        self.csv["Time_Diff"] = self.csv["Datetime"].diff().dt.total_seconds().fillna(0)
+    def _analyse_parameters(self):
+        """Run the parameter classes of the selected sections."""
+        csv_columns = set(self.csv.columns)
+        shared = SharedInputs(self.csv)
 
-        # Calculate typical time difference (median of all time differences)
-        typical_diff = self.csv["Time_Diff"].median()
+        def analyse_section(name):
+            parameters_class = analysis_sections[name]
+            section_columns = list(csv_columns & parameters_class.columns)
+            section_csv = self.csv[section_columns]
+            if self.compact:
+                section_csv = expand_frame(section_csv)
+            else:
+                section_csv = section_csv.copy()
+            return parameters_class(section_csv, shared).result
 
-        # Filter out rows where Time_Diff exceeds the threshold
-        self.csv = self.csv[self.csv["Time_Diff"] < typical_diff * 3]
+        if self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(analyse_section, self.sections))
+        else:
+            results = [analyse_section(name) for name in self.sections]
 
-    def _analyse_parameters(self):
-        """Preprocess the data."""
-        csv_columns = self.csv.columns
-        driving_columns = list(set(csv_columns) & set(driving_parameters))
-        engine_columns = list(set(csv_columns) & set(engine_parameters))
-        fap_columns = list(set(csv_columns) & set(fap_parameters))
-        fap_regen_columns = list(set(csv_columns) & set(fap_regen_parameters))
-        fuel_columns = list(set(csv_columns) & set(fuel_parameters))
-        overall_columns = list(set(csv_columns) & set(overall_parameters))
-
-        return {
-            "driving": DrivingParameters(self.csv[driving_columns].copy()).result,
-            "engine": EngineParameters(self.csv[engine_columns].copy()).result,
-            "fap": FapParameters(self.csv[fap_columns].copy()).result,
-            "fapRegen": FapRegenParameters(self.csv[fap_regen_columns].copy()).result,
-            "fuelConsumption": FuelParameters(self.csv[fuel_columns].copy()).result,
-            "overall": OverallParameters(self.csv[overall_columns].copy()).result,
-        }
+        return dict(zip(self.sections, results))
 
 
 if __name__ == "__main__":
     # Run from "backend/data-analyser/src"
     # export STORAGE_PATH=../data/ds4
     # Usage: python -m data_analyser.data_analyser
-    import os
     from time import time
 
     data_dir = "../data/ds4/"
@@ -1,7 +1,9 @@
 import pandas as pd
 from logger_setup import setup_logger
 
+from data_analyser.average_aggregate import AverageAggregate
 from data_analyser.constants.common import range_labels
+from data_analyser.constants.sketches import sketch_quantiles, sketch_signals
 from data_analyser.exceptions.exceptions import DataAverageException
 
 # Set up logger for this module
@@ -9,19 +11,23 @@ logger = setup_logger(__name__)
 
 
 class DataAverage:
-    def __init__(self, analyses):
-        logger.info("Loading data for average calculation")
-
-        try:
-            # Normalize the nested structure into flat columns
-            # E.g. "overall.distance" becomes a seperate column
-            self.analyses = pd.json_normalize(analyses)
-        except Exception as e:
-            logger.error(
-                f"Failed to read data for average calculation: {str(e)}",
-                exc_info=True,
-            )
-            raise DataAverageException("Failed to read data for average calculation.")
+    """User average of a list of analyses, or of a precomputed aggregate."""
+
+    def __init__(self, analyses=None, aggregate=None):
+        if aggregate is None:
+            logger.info("Loading data for average calculation")
+
+            try:
+                aggregate = AverageAggregate.from_analyses(analyses)
+            except Exception as e:
+                logger.error(
+                    f"Failed to read data for average calculation: {str(e)}",
+                    exc_info=True,
+                )
+                raise DataAverageException(
+                    "Failed to read data for average calculation."
+                )
+        self.aggregate = aggregate
 
         logger.info("Calculating average")
 
@@ -35,11 +41,7 @@ class DataAverage:
 
     def _calculate(self, key, operation, round_digits=0):
         # Available operations: 'sum', 'mean', 'min', 'max'
-        column = self.analyses.get(key)
-        if column is None or column.empty:
-            return None
-
-        value = getattr(column, operation)()
+        value = self.aggregate.stat(key, operation)
         if value is None or pd.isna(value):
             return None
         if round_digits:
@@ -53,6 +55,8 @@ class DataAverage:
         fap = self._calculate_fap()
         fap_regen = self._calculate_fap_regen()
         fuel = self._calculate_fuel()
+        distributions = self._calculate_distributions()
+        percentiles = self._calculate_percentiles()
 
         return {
             "overall": overall,
@@ -61,6 +65,8 @@ class DataAverage:
             "fap": fap,
             "fapRegen": fap_regen,
             "fuelConsumption": fuel,
+            "distributions": distributions,
+            "percentiles": percentiles,
         }
 
     def _calculate_overall(self):
@@ -202,12 +208,12 @@ class DataAverage:
         }
 
     def _calculate_fap_regen(self):
-        fap_regen_duration = self.analyses.get("fapRegen.duration_sec")
-        if fap_regen_duration is None or fap_regen_duration.empty:
+        number_of_regens = self.aggregate.count("fapRegen.duration_sec")
+        if number_of_regens is None:
             return None
 
         return {
-            "numberOfRegens": fap_regen_duration.dropna().shape[0],
+            "numberOfRegens": number_of_regens,
             "previousRegen_km": self._calculate("fapRegen.previousRegen_km", "mean", 2),
             "duration_sec": self._calculate("fapRegen.duration_sec", "mean", 2),
             "distance_km": self._weighted_average(
@@ -279,23 +285,42 @@ class DataAverage:
             "bySpeedRange": by_speed_range,
         }
 
-    def _weighted_average(self, values_key, weights_key, round_digits=0):
-        values = self.analyses.get(values_key)
-        weights = self.analyses.get(weights_key)
+    def _calculate_distributions(self):
+        return {
+            "revsInjFlow": self._merge_histograms("distributions.revsInjFlow"),
+            "speedRevs": self._merge_histograms("distributions.speedRevs"),
+            "fapTempRegen": self._merge_histograms("distributions.fapTempRegen"),
+        }
+
+    def _merge_histograms(self, key):
+        # Histograms are added bin by bin, which is exact for any number of logs
+        return self.aggregate.histogram(key)
 
-        if values is None or weights is None or values.empty or weights.empty:
+    def _calculate_percentiles(self):
+        return {key: self._merge_sketches(f"sketches.{key}") for key in sketch_signals}
+
+    def _merge_sketches(self, key):
+        # Sketches are added bucket by bucket, the percentiles of the merged
+        # sketch are within the sketch's relative error of the exact ones
+        sketch = self.aggregate.sketch(key)
+        if sketch is None or not sketch.count:
             return None
 
-        # Filter out rows where either value or weight is missing
-        mask = values.notna() & weights.notna()
-        v = values[mask]
-        w = weights[mask]
+        return {
+            name: round(sketch.quantile(q), 2) for name, q in sketch_quantiles.items()
+        }
+
+    def _weighted_average(self, values_key, weights_key, round_digits=0):
+        # Only logs having both the value and the weight are included
+        sums = self.aggregate.weighted(values_key, weights_key)
+        if sums is None:
+            return None
 
-        total_weight = w.sum()
+        weighted_sum, total_weight = sums
         if total_weight == 0:
             return None
 
-        value = (v * w).sum() / total_weight
+        value = weighted_sum / total_weight
         if pd.isna(value):
             return None
 
@@ -0,0 +1,199 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from config import SERIES_CACHE_SIZE, STORAGE_PATH
+from logger_setup import setup_logger
+
+from data_analyser.constants.common import chart_signals
+from data_analyser.exceptions.exceptions import (
+    DataAnalyseException,
+    DataSeriesException,
+)
+from data_analyser.log_loader import LogLoader
+from data_analyser.lttb import lttb
+from data_analyser.pyramid import build_pyramid, load_pyramid, stats
+
+# Set up logger for this module
+logger = setup_logger(__name__)
+
+MAX_POINTS = 5000
+
+
+class SeriesCache:
+    """LRU cache of downsampled series keyed by file, signal and resolution.
+
+    Keys include the log's mtime, so a replaced upload is never served stale.
+    """
+
+    def __init__(self, max_size=SERIES_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+series_cache = SeriesCache()
+
+
+class DataSeries:
+    """Chart signals of a log downsampled to at most `points` points each.
+
+    start and end are optional ISO timestamps limiting the time window.
+    """
+
+    def __init__(self, file_id, signals=None, points=500, start=None, end=None):
+        self.file_path = f"{STORAGE_PATH}/{file_id}.csv"
+        self.signals = self._select_signals(signals)
+        self.points = self._validate_points(points)
+        self.start = self._parse_time(start, "start")
+        self.end = self._parse_time(end, "end")
+
+        try:
+            mtime = os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            raise DataSeriesException("Log file not found.")
+
+        key_prefix = (file_id, mtime, self.points, self.start, self.end)
+        self.result = {}
+        missing = []
+        for signal in self.signals:
+            cached = series_cache.get(key_prefix + (signal,))
+            if cached is None:
+                missing.append(signal)
+            else:
+                self.result[signal] = cached
+
+        if missing:
+            for signal, series in self._downsample(missing).items():
+                series_cache.put(key_prefix + (signal,), series)
+                self.result[signal] = series
+        logger.info(
+            f"Series for {file_id}: {len(self.signals) - len(missing)} cached, "
+            f"{len(missing)} computed"
+        )
+
+    @staticmethod
+    def _select_signals(signals):
+        if not signals:
+            return list(chart_signals)
+        if not isinstance(signals, list):
+            raise DataSeriesException("'signals' must be a list of signal names.")
+        unknown = set(signals) - set(chart_signals)
+        if unknown:
+            raise DataSeriesException(
+                f"Unknown signal(s): {', '.join(sorted(unknown))}."
+            )
+        return [signal for signal in chart_signals if signal in signals]
+
+    @staticmethod
+    def _validate_points(points):
+        if not isinstance(points, int) or isinstance(points, bool) or points < 3:
+            raise DataSeriesException("'points' must be an integer of at least 3.")
+        return min(points, MAX_POINTS)
+
+    @staticmethod
+    def _parse_time(value, name):
+        if value is None:
+            return None
+        try:
+            timestamp = pd.Timestamp(value)
+        except ValueError:
+            raise DataSeriesException(f"Invalid '{name}' time: {value}.")
+        # Log timestamps are naive local times
+        return timestamp.tz_localize(None) if timestamp.tzinfo else timestamp
+
+    def _downsample(self, signals):
+        try:
+            csv = LogLoader(self.file_path, set(signals), compact=False).csv
+        except DataAnalyseException as e:
+            raise DataSeriesException(str(e))
+
+        if self.start is not None:
+            csv = csv[csv["Datetime"] >= self.start]
+        if self.end is not None:
+            csv = csv[csv["Datetime"] <= self.end]
+
+        times = csv["Datetime"].to_numpy().view("int64")
+        series = {}
+        for signal in signals:
+            if signal not in csv.columns:
+                series[signal] = {"time": [], "value": []}
+                continue
+            values = csv[signal].to_numpy(dtype=np.float64)
+            valid = np.isfinite(values)
+            signal_times, values = times[valid], values[valid]
+            kept = lttb(signal_times, values, self.points)
+            series[signal] = {
+                # Epoch milliseconds of the naive log time
+                "time": (signal_times[kept] // 1_000_000).tolist(),
+                "value": values[kept].tolist(),
+            }
+        return series
+
+
+class DataPyramid:
+    """Min/max/mean buckets of one chart signal, served from the log's pyramid.
+
+    The pyramid is normally built at analysis time; a missing or stale one
+    is built here from the log first.
+    """
+
+    def __init__(self, file_id, signal, points=500, start=None, end=None):
+        if signal not in chart_signals:
+            raise DataSeriesException(f"Unknown signal: {signal}.")
+        points = DataSeries._validate_points(points)
+        start = DataSeries._parse_time(start, "start")
+        end = DataSeries._parse_time(end, "end")
+        file_path = f"{STORAGE_PATH}/{file_id}.csv"
+
+        try:
+            mtime = os.stat(file_path).st_mtime_ns
+        except OSError:
+            raise DataSeriesException("Log file not found.")
+
+        pyramid = load_pyramid(file_id, mtime)
+        if pyramid is None:
+            try:
+                csv = LogLoader(file_path, set(chart_signals), compact=False).csv
+            except DataAnalyseException as e:
+                raise DataSeriesException(str(e))
+            pyramid = build_pyramid(file_id, csv, mtime)
+
+        if signal not in pyramid.signals:
+            self.result = {
+                "bucketSize": 1,
+                "time": [],
+                **{stat: [] for stat in stats},
+            }
+            return
+        self.result = pyramid.query(
+            signal,
+            points,
+            start.value // 1_000_000 if start is not None else None,
+            end.value // 1_000_000 if end is not None else None,
+        )
+
+
+if __name__ == "__main__":
+    # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
+    # Usage: python -m data_analyser.data_series
+    series = DataSeries("DCM62v2_20250326", ["FAPpressure", "Speed"], points=20)
+    print(series.result)
+    print(DataPyramid("DCM62v2_20250326", "FAPtemp", points=20).result)
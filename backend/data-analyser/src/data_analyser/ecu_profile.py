@@ -0,0 +1,117 @@
+from functools import lru_cache
+
+import pandas as pd
+from logger_setup import setup_logger
+
+from data_analyser.constants.ecu_profiles import ecu_profiles, generic_sentinels
+
+logger = setup_logger(__name__)
+
+GENERIC_PROFILE = "generic"
+
+# Columns that are parsed as text, every other loaded column is numeric
+text_columns = {"Date", "Time"}
+# Columns the LogLoader adds, they are not in the log
+derived_columns = {"Datetime", "Time_Diff", "Segment"}
+
+
+def detect_profile(header):
+    """Return the name of the first ECU profile whose markers are all in header."""
+    columns = set(header)
+    for name, profile in ecu_profiles.items():
+        if set(profile["markers"]).issubset(columns):
+            return name
+    return GENERIC_PROFILE
+
+
+def header_columns(columns):
+    """Return the header names a log may hold the given columns under, in any
+    ECU profile: the columns themselves and their aliases."""
+    names = set(columns) - derived_columns
+    for profile in ecu_profiles.values():
+        names |= {
+            raw for raw, name in profile.get("aliases", {}).items() if name in names
+        }
+    return names
+
+
+class ParsingPlan:
+    """How to read and clean a log of one ECU profile.
+
+    Plans are built once per (profile, header, columns) combination and cached,
+    so reading a log only applies the precomputed usecols, dtypes and renames.
+    """
+
+    def __init__(self, profile_name, header, columns):
+        profile = ecu_profiles.get(profile_name, {})
+        self.profile_name = profile_name
+        self.date_format = profile.get("date_format")
+        self.sentinels = profile.get("sentinels", generic_sentinels)
+
+        aliases = profile.get("aliases", {})
+        self.renames = {
+            raw: name for raw, name in aliases.items() if name in columns
+        }
+        wanted = set(columns) | text_columns | set(self.sentinels)
+        self.usecols = {raw for raw in self.renames} | wanted
+
+        # Pinned dtypes, a column that fails to parse falls back to inference
+        self.dtype = {
+            col: dtype
+            for col, dtype in profile.get("dtypes", {}).items()
+            if col in header and col in self.usecols
+        }
+        # Logs of several sessions repeat the header line mid-file
+        self.na_values = {col: [col] for col in self.dtype}
+
+    def read_csv(self, file_path):
+        if not self.dtype:
+            csv = self._read_csv(file_path, None, None)
+        else:
+            try:
+                csv = self._read_csv(file_path, self.dtype, self.na_values)
+            except ValueError:
+                # A column holding text where a number is expected, coerce later
+                logger.info(
+                    f"Typed read failed for {self.profile_name} profile, inferring dtypes"
+                )
+                csv = self._read_csv(file_path, None, None)
+
+        if self.renames:
+            csv = csv.rename(columns=self.renames)
+        return csv
+
+    def _read_csv(self, file_path, dtype, na_values):
+        return pd.read_csv(
+            file_path,
+            delimiter=";",
+            encoding="latin1",
+            usecols=lambda col: col in self.usecols,
+            dtype=dtype,
+            na_values=na_values,
+        )
+
+    def parse_datetime(self, date, time):
+        combined = date + " " + time
+        if self.date_format is None:
+            return pd.to_datetime(combined, errors="coerce")
+
+        parsed = pd.to_datetime(combined, format=self.date_format, errors="coerce")
+        missed = parsed.isna() & combined.notna()
+        if missed.any():
+            parsed[missed] = pd.to_datetime(combined[missed], errors="coerce")
+        return parsed
+
+    def sentinel_mask(self, csv):
+        """Return a mask of the rows holding no sentinel value."""
+        mask = pd.Series(True, index=csv.index)
+        for col, values in self.sentinels.items():
+            if col in csv.columns:
+                mask &= ~csv[col].isin(values)
+        return mask
+
+
+@lru_cache(maxsize=64)
+def parsing_plan(profile_name, header, columns):
+    """Return the cached ParsingPlan, header and columns must be tuples."""
+    return ParsingPlan(profile_name, header, columns)
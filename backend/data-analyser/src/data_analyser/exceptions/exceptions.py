@@ -2,4 +2,13 @@ class DataAnalyseException(Exception):
     pass
 
 class DataAverageException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class DataSeriesException(Exception):
+    pass
+
+class OutlierException(Exception):
+    pass
+
+class DataQueryException(Exception):
+    pass
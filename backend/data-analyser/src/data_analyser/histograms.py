@@ -0,0 +1,33 @@
+import numpy as np
+
+
+def _bin_index(values, edges):
+    """Return the bin of each value, out of range values go to the edge bins."""
+    index = np.searchsorted(edges, values, side="right") - 1
+    return np.clip(index, 0, len(edges) - 2)
+
+
+def histogram(columns, edges, weights):
+    """Return the time-weighted histogram of one or more columns.
+
+    columns and edges are lists of equal length, a 2D heatmap has two. The
+    result is sparse: the flat (row-major) index and seconds of every
+    non-empty cell, plus the shape needed to merge it with other logs.
+    """
+    shape = [len(col_edges) - 1 for col_edges in edges]
+    weights = np.asarray(weights, dtype=np.float64)
+    valid = np.isfinite(weights)
+    values = [np.asarray(col, dtype=np.float64) for col in columns]
+    for col in values:
+        valid &= np.isfinite(col)
+
+    flat = np.zeros(int(valid.sum()), dtype=np.int64)
+    for col, col_edges, size in zip(values, edges, shape):
+        flat = flat * size + _bin_index(col[valid], col_edges)
+
+    seconds = np.round(
+        np.bincount(flat, weights=weights[valid], minlength=int(np.prod(shape))), 1
+    )
+    index = np.flatnonzero(seconds)
+    return {"shape": shape, "index": index.tolist(), "sec": seconds[index].tolist()}
+
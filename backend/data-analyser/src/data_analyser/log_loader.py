@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from config import COMPACT_FRAMES
+from logger_setup import setup_logger
+
+from data_analyser.compact import compact_frame, frame_memory_mb
+from data_analyser.constants.common import trip_min_pause_seconds, trip_min_seconds
+from data_analyser.ecu_profile import parsing_plan
+from data_analyser.exceptions.exceptions import DataAnalyseException
+from data_analyser.preflight import preflight_check
+
+logger = setup_logger(__name__)
+
+
+class LogLoader:
+    """Read a log and preprocess it into the frame the analyses work on.
+
+    Only the given columns are loaded (plus Date/Time and the sentinel
+    columns of the ECU profile). The frame gains Datetime, Time_Diff and
+    Segment columns and is sorted by time.
+    """
+
+    def __init__(self, file_path, columns, compact=COMPACT_FRAMES):
+        self.compact = compact
+        # Fails fast with a specific message for files that are no log at all
+        self.preflight = preflight_check(file_path, columns)
+        self.profile = self.preflight.profile
+        logger.info(
+            f"Pre-flight passed for {file_path}: {self.profile} profile, "
+            f"~{self.preflight.estimated_rows} rows"
+        )
+        try:
+            self.plan = parsing_plan(
+                self.profile, tuple(self.preflight.header), tuple(sorted(columns))
+            )
+            self.csv = self.plan.read_csv(file_path)
+            logger.info(f"Successfully read log file: {file_path}")
+        except Exception as e:
+            logger.error(
+                f"Failed to read log file {file_path}: {str(e)}", exc_info=True
+            )
+            raise DataAnalyseException("Failed to read log file.")
+
+        try:
+            self._process_data()
+            logger.info(f"Successfully processed log file: {file_path}")
+        except Exception as e:
+            logger.error(
+                f"Failed to process log file {file_path}: {str(e)}", exc_info=True
+            )
+            raise DataAnalyseException("Failed to process log file.")
+
+    def _process_data(self):
+        """Preprocess the data."""
+        for col in self.csv.columns:
+            if col not in {"Date", "Time"} and self.csv[col].dtype == object:
+                self.csv[col] = pd.to_numeric(self.csv[col], errors="coerce")
+
+        self.csv["Datetime"] = self.plan.parse_datetime(
+            self.csv["Date"], self.csv["Time"]
+        )
+
+        # Keep rows without ECU sentinel values (e.g. FAPpressure 65280) and
+        # with a valid Datetime, the frame is only materialised once at the end
+        mask = self.plan.sentinel_mask(self.csv) & self.csv["Datetime"].notna()
+        rows = np.flatnonzero(mask.to_numpy())
+        times = self.csv["Datetime"].to_numpy()[rows].view("int64")
+
+        # Logs are almost always in time order already, only sort when not
+        if len(times) and not (np.diff(times) >= 0).all():
+            order = np.argsort(times, kind="quicksort")
+            rows, times = rows[order], times[order]
+
+        time_diff = np.zeros(len(times))
+        time_diff[1:] = np.diff(times) / 1e9
+
+        # A gap of 3x the typical (median) gap or more is a pause: the first
+        # sample after it is kept, but the pause itself is not counted as time
+        gap = np.zeros(len(times), dtype=bool)
+        if len(times):
+            gap[1:] = time_diff[1:] >= np.median(time_diff) * 3
+        segment_starts = np.zeros(len(times), dtype=int)
+        segment_starts[self._trip_starts(times, time_diff)] = 1
+        time_diff[gap] = 0
+
+        self.csv = self.csv.take(rows)
+        self.csv["Time_Diff"] = time_diff
+        self.csv["Segment"] = np.cumsum(segment_starts)
+
+        if self.compact:
+            full_mb = frame_memory_mb(self.csv)
+            self.csv = compact_frame(self.csv)
+            logger.debug(
+                f"Compacted frame from {full_mb:.2f} MB to "
+                f"{frame_memory_mb(self.csv):.2f} MB"
+            )
+
+    @staticmethod
+    def _trip_starts(times, time_diff):
+        """Return the rows starting a trip segment, after a long pause.
+
+        A segment shorter than trip_min_seconds is merged into the previous
+        one, or into the next one when it is the first.
+        """
+        # times are in nanoseconds
+        min_span = trip_min_seconds * 1e9
+        starts = []
+        for row in np.flatnonzero(time_diff >= trip_min_pause_seconds):
+            start = starts[-1] if starts else 0
+            if times[row - 1] - times[start] < min_span:
+                if not starts:
+                    continue
+                starts.pop()
+            starts.append(row)
+        if starts and times[-1] - times[starts[-1]] < min_span:
+            starts.pop()
+        return starts
@@ -0,0 +1,344 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+from config import QUERY_WORKERS, STORAGE_PATH
+from logger_setup import setup_logger
+
+from data_analyser.column_store import build_column_store, load_column_store
+from data_analyser.data_analyser import analysis_sections
+from data_analyser.exceptions.exceptions import (
+    DataAnalyseException,
+    DataQueryException,
+)
+from data_analyser.log_loader import LogLoader
+from data_analyser.parameters.registry import plan_columns
+from data_analyser.parameters.shared_inputs import shared_inputs
+
+logger = setup_logger(__name__)
+
+MAX_LIMIT = 10000
+MAX_TIMEOUT = 120
+
+aggregations = ("count", "sum", "mean", "min", "max")
+
+operators = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+# Group name -> numpy datetime unit of the group key
+time_groups = {"day": "D", "month": "M", "year": "Y"}
+
+
+class LogQuery:
+    """Filter and aggregate the raw signals of many logs.
+
+    Logs are read from their columnar copies, built on first use. A log is
+    skipped without reading when its time range or the min/max of a filtered
+    column rule out every row, and only the columns the query names are read.
+    Logs are scanned in parallel into per-group partial aggregates, which are
+    merged into one row per group.
+    """
+
+    def __init__(
+        self,
+        file_ids,
+        select,
+        where=None,
+        state=None,
+        group_by=None,
+        start=None,
+        end=None,
+        limit=1000,
+        timeout=30,
+    ):
+        self.file_ids = self._validate_files(file_ids)
+        self.select = self._validate_select(select)
+        self.where = self._validate_where(where)
+        if state is not None and state not in shared_inputs:
+            raise DataQueryException(f"Unknown state: {state}.")
+        self.state = state
+        if group_by is not None and group_by != "file" and group_by not in time_groups:
+            raise DataQueryException(f"Unknown group: {group_by}.")
+        self.group_by = group_by
+        self.start = self._parse_time(start, "start")
+        self.end = self._parse_time(end, "end")
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+            raise DataQueryException("'limit' must be a positive integer.")
+        self.limit = min(limit, MAX_LIMIT)
+        if (
+            not isinstance(timeout, (int, float))
+            or isinstance(timeout, bool)
+            or not 0 < timeout <= MAX_TIMEOUT
+        ):
+            raise DataQueryException(
+                f"'timeout' must be a number of seconds up to {MAX_TIMEOUT}."
+            )
+        self.timeout = timeout
+        self.signals = list(dict.fromkeys(item["signal"] for item in self.select))
+
+        self.result = self._run()
+
+    @staticmethod
+    def _validate_files(file_ids):
+        if (
+            not isinstance(file_ids, list)
+            or not file_ids
+            or not all(isinstance(file_id, str) for file_id in file_ids)
+        ):
+            raise DataQueryException("'fileNames' must be a non-empty list.")
+        return list(dict.fromkeys(file_ids))
+
+    @staticmethod
+    def _validate_select(select):
+        if not isinstance(select, list) or not select:
+            raise DataQueryException("'select' must be a non-empty list.")
+        for item in select:
+            if (
+                not isinstance(item, dict)
+                or not isinstance(item.get("signal"), str)
+                or item.get("agg") not in aggregations
+            ):
+                raise DataQueryException(
+                    "Every 'select' item needs a 'signal' and an 'agg' of "
+                    f"{', '.join(aggregations)}."
+                )
+        return select
+
+    @staticmethod
+    def _validate_where(where):
+        if where is None:
+            return []
+        if not isinstance(where, list):
+            raise DataQueryException("'where' must be a list of predicates.")
+        for predicate in where:
+            value = predicate.get("value") if isinstance(predicate, dict) else None
+            if (
+                not isinstance(predicate, dict)
+                or not isinstance(predicate.get("signal"), str)
+                or predicate.get("op") not in operators
+                or not isinstance(value, (int, float))
+                or isinstance(value, bool)
+            ):
+                raise DataQueryException(
+                    "Every 'where' predicate needs a 'signal', an 'op' of "
+                    f"{', '.join(operators)} and a numeric 'value'."
+                )
+        return where
+
+    @staticmethod
+    def _parse_time(value, name):
+        """Return an ISO timestamp as epoch ms of the naive log time."""
+        if value is None:
+            return None
+        try:
+            timestamp = pd.Timestamp(value)
+        except ValueError:
+            raise DataQueryException(f"Invalid '{name}' time: {value}.")
+        if timestamp.tzinfo:
+            timestamp = timestamp.tz_localize(None)
+        return timestamp.value // 1_000_000
+
+    def _run(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS)
+        try:
+            futures = [
+                executor.submit(self._scan, file_id, deadline)
+                for file_id in self.file_ids
+            ]
+            _, pending = wait(futures, timeout=self.timeout)
+            if pending:
+                raise DataQueryException(f"Query timed out after {self.timeout}s.")
+        finally:
+            # Scans still running stop at their next deadline check
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        counts = {"scanned": 0, "skipped": 0, "missing": 0, "failed": 0}
+        partials = []
+        for future in futures:
+            status, partial = future.result()
+            if status == "timeout":
+                raise DataQueryException(f"Query timed out after {self.timeout}s.")
+            counts[status] += 1
+            if partial is not None:
+                partials.append(partial)
+
+        rows = self._rows(partials)
+        logger.info(
+            f"Query over {len(self.file_ids)} logs: {counts['scanned']} scanned, "
+            f"{counts['skipped']} skipped, {len(rows)} groups"
+        )
+        return {
+            "rows": rows[: self.limit],
+            "truncated": len(rows) > self.limit,
+            "logs": counts,
+            "elapsed_ms": int((time.monotonic() - started) * 1000),
+        }
+
+    def _scan(self, file_id, deadline):
+        """Return the status of a log and its partial aggregates, if any."""
+        if time.monotonic() > deadline:
+            return "timeout", None
+
+        file_path = f"{STORAGE_PATH}/{file_id}.csv"
+        try:
+            mtime = os.stat(file_path).st_mtime_ns
+        except OSError:
+            return "missing", None
+
+        store = load_column_store(file_id, mtime)
+        if store is None:
+            try:
+                columns = plan_columns(list(analysis_sections))
+                csv = LogLoader(file_path, columns, compact=False).csv
+            except DataAnalyseException as e:
+                logger.warning(f"Query skipped {file_id}: {e}")
+                return "failed", None
+            store = build_column_store(file_id, csv, mtime)
+
+        if not self._may_match(store):
+            return "skipped", None
+        if time.monotonic() > deadline:
+            return "timeout", None
+
+        times = np.asarray(store.times())
+        mask = np.ones(store.rows, dtype=bool)
+        if self.start is not None:
+            mask &= times >= self.start
+        if self.end is not None:
+            mask &= times <= self.end
+        for predicate in self.where:
+            values = store.column(predicate["signal"])
+            with np.errstate(invalid="ignore"):
+                mask &= operators[predicate["op"]](values, predicate["value"])
+            # Missing values never match, not even "!="
+            mask &= ~np.isnan(values)
+        if self.state is not None:
+            state = shared_inputs[self.state]
+            frame = pd.DataFrame({col: store.column(col) for col in state.columns})
+            mask &= state.func(frame).to_numpy(dtype=bool)
+
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return "scanned", None
+        return "scanned", self._aggregate(file_id, store, times, rows)
+
+    def _may_match(self, store):
+        """Return False when the zone maps of a log rule out every row."""
+        if store.start is None:
+            return False
+        if self.start is not None and store.end < self.start:
+            return False
+        if self.end is not None and store.start > self.end:
+            return False
+
+        for predicate in self.where:
+            info = store.columns.get(predicate["signal"])
+            if info is None or info["min"] is None:
+                return False
+            low, high, value = info["min"], info["max"], predicate["value"]
+            may_match = {
+                ">": high > value,
+                ">=": high >= value,
+                "<": low < value,
+                "<=": low <= value,
+                "==": low <= value <= high,
+                "!=": not low == high == value,
+            }[predicate["op"]]
+            if not may_match:
+                return False
+
+        if self.state is not None:
+            return all(col in store.columns for col in shared_inputs[self.state].columns)
+        return True
+
+    def _aggregate(self, file_id, store, times, rows):
+        if self.group_by is None:
+            groups = np.full(len(rows), "all")
+        elif self.group_by == "file":
+            groups = np.full(len(rows), file_id)
+        else:
+            unit = time_groups[self.group_by]
+            groups = times[rows].astype("datetime64[ms]").astype(f"datetime64[{unit}]")
+            groups = groups.astype(str)
+
+        frame = {"group": groups}
+        if "Time_Diff" in store.columns:
+            frame["sec"] = store.column("Time_Diff")[rows]
+        else:
+            frame["sec"] = np.zeros(len(rows))
+        for signal in self.signals:
+            if signal in store.columns:
+                frame[signal] = store.column(signal)[rows]
+            else:
+                frame[signal] = np.full(len(rows), np.nan)
+
+        grouped = pd.DataFrame(frame).groupby("group")
+        partial = pd.DataFrame({"rows": grouped.size(), "sec": grouped["sec"].sum()})
+        for signal in self.signals:
+            partial[f"{signal}|count"] = grouped[signal].count()
+            partial[f"{signal}|sum"] = grouped[signal].sum()
+            partial[f"{signal}|min"] = grouped[signal].min()
+            partial[f"{signal}|max"] = grouped[signal].max()
+        return partial
+
+    def _rows(self, partials):
+        if not partials:
+            return []
+
+        merge = {"rows": "sum", "sec": "sum"}
+        for signal in self.signals:
+            merge.update(
+                {
+                    f"{signal}|count": "sum",
+                    f"{signal}|sum": "sum",
+                    f"{signal}|min": "min",
+                    f"{signal}|max": "max",
+                }
+            )
+        merged = pd.concat(partials).groupby(level=0).agg(merge).sort_index()
+
+        rows = []
+        for group, totals in merged.iterrows():
+            row = {
+                "group": group,
+                "rows": int(totals["rows"]),
+                "sec": round(float(totals["sec"]), 1),
+            }
+            for item in self.select:
+                signal, agg = item["signal"], item["agg"]
+                count = int(totals[f"{signal}|count"])
+                if agg == "count":
+                    value = count
+                elif not count:
+                    value = None
+                elif agg == "mean":
+                    value = round(float(totals[f"{signal}|sum"]) / count, 4)
+                else:
+                    value = round(float(totals[f"{signal}|{agg}"]), 4)
+                row[f"{signal}.{agg}"] = value
+            rows.append(row)
+        return rows
+
+
+if __name__ == "__main__":
+    # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
+    # Usage: python -m data_analyser.log_query
+    query = LogQuery(
+        [os.path.splitext(f)[0] for f in os.listdir(STORAGE_PATH) if f.endswith(".csv")],
+        select=[{"signal": "FAPpressure", "agg": "mean"}],
+        where=[{"signal": "Coolant", "op": ">", "value": 80}],
+        state="idle",
+        group_by="month",
+    )
+    print(query.result)
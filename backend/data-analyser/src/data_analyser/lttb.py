@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def lttb(x, y, points):
+    """Return the indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    x must be increasing. The first and last point are always kept; every
+    bucket in between keeps the point forming the largest triangle with the
+    previously kept point and the average of the next bucket, which preserves
+    peaks and dips that plain decimation would miss.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n) if points >= n else np.array([0, n - 1][:points])
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # points - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    edges = np.append(edges, n)
+    bucket_sums = np.add.reduceat(np.column_stack((x, y)), edges[:-1])
+    bucket_sizes = np.diff(edges)
+    next_avg = bucket_sums[1:] / bucket_sizes[1:, None]
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    # Each bucket depends on the point kept in the previous one, so buckets are
+    # walked in order; the area of all candidates in a bucket is vectorised
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        avg_x, avg_y = next_avg[i]
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+
+import numpy as np
+from logger_setup import setup_logger
+
+from data_analyser.average_aggregate import flatten_analysis, is_number
+from data_analyser.exceptions.exceptions import OutlierException
+
+logger = setup_logger(__name__)
+
+# Sections holding histograms and sketches rather than per-log metrics
+skipped_prefixes = ("distributions.", "sketches.")
+
+# Updates appended before they are folded into the snapshot
+COMPACT_EVERY = 1000
+MAX_LIMIT = 1000
+
+# Consistency constant of the MAD and of the mean absolute deviation with the
+# standard deviation of a normal distribution
+MAD_SCALE = 0.6745
+MEAN_AD_SCALE = 1.2533
+
+outlier_methods = {"mad": 3.5, "iqr": 1.5}
+
+
+class MetricIndex:
+    """Columnar index of per-log metrics: one row per analysis, one float64
+    column per flattened numeric result key, NaN where a log has no value.
+
+    Upserts are appended to updates.jsonl and folded into snapshot.npz every
+    COMPACT_EVERY updates, so a restart reloads the index without the
+    analyses.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = []
+        self.rows = {}
+        self.columns = {}
+        self._capacity = 0
+        self._updates = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def metrics_of(analysis):
+        return {
+            key: value
+            for key, value in flatten_analysis(analysis).items()
+            if value is not None
+            and is_number(value)
+            and not key.startswith(skipped_prefixes)
+        }
+
+    def upsert(self, analysis_id, analysis):
+        """Add or replace the metrics of an analysis."""
+        metrics = self.metrics_of(analysis)
+        with self._lock:
+            self._apply(analysis_id, metrics)
+            os.makedirs(self.path, exist_ok=True)
+            with open(f"{self.path}/updates.jsonl", "a", encoding="utf-8") as updates:
+                updates.write(
+                    json.dumps({"analysisId": analysis_id, "metrics": metrics}) + "\n"
+                )
+            self._updates += 1
+            if self._updates >= COMPACT_EVERY:
+                self._compact()
+
+    def _apply(self, analysis_id, metrics):
+        row = self.rows.get(analysis_id)
+        if row is None:
+            row = len(self.ids)
+            self.ids.append(analysis_id)
+            self.rows[analysis_id] = row
+            self._grow(row + 1)
+        else:
+            for column in self.columns.values():
+                column[row] = np.nan
+
+        for key, value in metrics.items():
+            column = self.columns.get(key)
+            if column is None:
+                column = np.full(self._capacity, np.nan)
+                self.columns[key] = column
+            column[row] = value
+
+    def _grow(self, rows):
+        if rows <= self._capacity:
+            return
+        # Columns double in size, so appending a row is amortised O(1)
+        self._capacity = max(rows, 2 * self._capacity, 1024)
+        for key, column in self.columns.items():
+            grown = np.full(self._capacity, np.nan)
+            grown[: len(column)] = column
+            self.columns[key] = grown
+
+    def column(self, key):
+        return self.columns[key][: len(self.ids)]
+
+    def _load(self):
+        snapshot = f"{self.path}/snapshot.npz"
+        if os.path.exists(snapshot):
+            with np.load(snapshot) as data:
+                ids, keys, values = data["ids"], data["keys"], data["values"]
+            self.ids = ids.tolist()
+            self.rows = {analysis_id: row for row, analysis_id in enumerate(self.ids)}
+            self._grow(len(self.ids))
+            for column, key in enumerate(keys.tolist()):
+                self.columns[key] = np.full(self._capacity, np.nan)
+                self.columns[key][: len(self.ids)] = values[:, column]
+
+        updates = f"{self.path}/updates.jsonl"
+        if os.path.exists(updates):
+            with open(updates, encoding="utf-8") as lines:
+                for line in lines:
+                    try:
+                        update = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn write from a crash, the analysis is indexed
+                        # again with its next result
+                        logger.warning(f"Skipping corrupted line in {updates}")
+                        continue
+                    self._apply(update["analysisId"], update["metrics"])
+                    self._updates += 1
+        logger.info(f"Loaded metric index of {len(self.ids)} analyses")
+
+    def _compact(self):
+        keys = list(self.columns)
+        values = np.empty((len(self.ids), len(keys)))
+        for column, key in enumerate(keys):
+            values[:, column] = self.column(key)
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f"{self.path}/snapshot.tmp.npz"
+        np.savez(
+            tmp_path,
+            ids=np.array(self.ids, dtype=str),
+            keys=np.array(keys, dtype=str),
+            values=values,
+        )
+        os.replace(tmp_path, f"{self.path}/snapshot.npz")
+        # The snapshot holds every update, a crash before the truncation only
+        # replays updates already in it
+        open(f"{self.path}/updates.jsonl", "w").close()
+        self._updates = 0
+        logger.info(f"Compacted metric index of {len(self.ids)} analyses")
+
+    def outliers(self, metrics=None, method="mad", threshold=None, limit=50):
+        """Return the outlying analyses of every metric, most extreme first.
+
+        "mad" flags robust z-scores 0.6745 * (x - median) / MAD above the
+        threshold (3.5 by default). "iqr" flags values more than threshold x
+        IQR (1.5 by default) outside the quartiles, scored in IQRs beyond the
+        fence. Metrics without spread have no outliers.
+        """
+        if not isinstance(method, str) or method not in outlier_methods:
+            raise OutlierException(
+                f"Unknown method: {method}, use one of {', '.join(outlier_methods)}."
+            )
+        if threshold is None:
+            threshold = outlier_methods[method]
+        if (
+            not isinstance(threshold, (int, float))
+            or isinstance(threshold, bool)
+            or threshold <= 0
+        ):
+            raise OutlierException("'threshold' must be a positive number.")
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+            raise OutlierException("'limit' must be a positive integer.")
+        limit = min(limit, MAX_LIMIT)
+
+        with self._lock:
+            if metrics is None:
+                metrics = sorted(self.columns)
+            elif not isinstance(metrics, list):
+                raise OutlierException("'metrics' must be a list of metric keys.")
+            unknown = set(metrics) - set(self.columns)
+            if unknown:
+                raise OutlierException(
+                    f"Unknown metric(s): {', '.join(sorted(unknown))}."
+                )
+            columns = {key: self.column(key).copy() for key in metrics}
+            # Rows are only ever appended, so the list can be read unlocked
+            ids = self.ids
+
+        return {
+            key: self._scan(values, ids, method, threshold, limit)
+            for key, values in columns.items()
+        }
+
+    @staticmethod
+    def _scan(values, ids, method, threshold, limit):
+        valid = ~np.isnan(values)
+        count = int(valid.sum())
+        result = {"count": count, "center": None, "spread": None, "outliers": []}
+        if not count:
+            return result
+
+        present = values[valid]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if method == "mad":
+                center = float(np.median(present))
+                spread = float(np.median(np.abs(present - center)))
+                if spread:
+                    scores = MAD_SCALE * (values - center) / spread
+                else:
+                    # Over half the logs share the median, fall back to the
+                    # mean absolute deviation
+                    spread = float(np.mean(np.abs(present - center)))
+                    scores = (values - center) / (MEAN_AD_SCALE * spread)
+                flagged = np.abs(scores) > threshold
+            else:
+                q1, center, q3 = np.percentile(present, [25, 50, 75])
+                center, spread = float(center), float(q3 - q1)
+                low, high = q1 - threshold * spread, q3 + threshold * spread
+                scores = np.where(
+                    values < low, (values - low) / spread, (values - high) / spread
+                )
+                flagged = (values < low) | (values > high)
+
+        result["center"], result["spread"] = center, spread
+        if not spread:
+            return result
+
+        flagged &= valid
+        rows = np.flatnonzero(flagged)
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-np.abs(scores[rows]), limit - 1)[:limit]]
+        rows = rows[np.argsort(-np.abs(scores[rows]), kind="stable")]
+        result["outliers"] = [
+            {
+                "analysisId": ids[row],
+                "value": float(values[row]),
+                "score": round(float(scores[row]), 2),
+            }
+            for row in rows
+        ]
+        return result
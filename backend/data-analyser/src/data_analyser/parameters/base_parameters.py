@@ -0,0 +1,42 @@
+from json import dumps
+
+from .shared_inputs import SharedInputs
+
+
+class BaseParameters:
+    """Compute a result section from the metrics declared with @metric.
+
+    Subclasses are registered with @register_section, which collects their
+    metrics in definition order; that order is the order of the result keys.
+    """
+
+    section = None
+    metrics = []
+    columns = set()
+
+    def __init__(self, csv, shared=None):
+        self.csv = csv
+        self.shared = shared if shared is not None else SharedInputs(csv)
+        self.result = self._calculate_metrics()
+
+    def __str__(self):
+        return str(self.to_json())
+
+    def to_json(self):
+        return dumps(self.result)
+
+    def _calculate_metrics(self):
+        result = {}
+        for metric in self.metrics:
+            self._metric = metric
+            result[metric.key] = metric.func(self)
+        return result
+
+    @property
+    def inputs(self):
+        """Required columns of the metric being calculated."""
+        return list(self._metric.columns)
+
+    def has_inputs(self):
+        """Return True if the log has every required column of the metric."""
+        return set(self._metric.columns).issubset(self.csv.columns)
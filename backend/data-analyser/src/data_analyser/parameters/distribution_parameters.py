@@ -0,0 +1,57 @@
+from data_analyser.constants.histograms import (
+    fap_temp_edges,
+    inj_flow_edges,
+    revs_edges,
+    speed_edges,
+)
+from data_analyser.histograms import histogram
+
+from .base_parameters import BaseParameters
+from .registry import metric, register_section
+
+
+@register_section("distributions")
+class DistributionParameters(BaseParameters):
+    """Seconds spent in each bin, mergeable across logs by adding bins."""
+
+    @metric("revsInjFlow", columns=["Revs", "InjFlow", "Time_Diff"], uses=["engine_on"])
+    def _calculate_revs_inj_flow(self):
+        """Engine load map: RPM x injected fuel while the engine runs."""
+        if not self.has_inputs():
+            return None
+
+        csv = self.csv[self.shared.get("engine_on")]
+        return histogram(
+            [csv["Revs"], csv["InjFlow"]],
+            [revs_edges, inj_flow_edges],
+            csv["Time_Diff"],
+        )
+
+    @metric("speedRevs", columns=["Speed", "Revs", "Time_Diff"], uses=["driving"])
+    def _calculate_speed_revs(self):
+        if not self.has_inputs():
+            return None
+
+        csv = self.csv[self.shared.get("driving")]
+        return histogram(
+            [csv["Speed"], csv["Revs"]], [speed_edges, revs_edges], csv["Time_Diff"]
+        )
+
+    @metric("fapTempRegen", columns=["FAPtemp", "REGEN", "Time_Diff"], uses=["regen"])
+    def _calculate_fap_temp_regen(self):
+        if not self.has_inputs():
+            return None
+
+        csv = self.csv[self.shared.get("regen")]
+        if csv.empty:
+            return None
+        return histogram([csv["FAPtemp"]], [fap_temp_edges], csv["Time_Diff"])
+
+
+if __name__ == "__main__":
+    # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
+    # Usage: python -m data_analyser.parameters.distribution_parameters
+    from data_analyser.data_analyser import DataAnalyser
+
+    print(DataAnalyser("DCM62v2_20250326", ["distributions"]))
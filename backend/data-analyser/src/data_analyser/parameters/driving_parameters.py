@@ -1,25 +1,13 @@
-from json import dumps
-
 import pandas as pd
 
+from .base_parameters import BaseParameters
+from .registry import metric, register_section
 from .utils import calculate_fuel_consumption, calculate_total_distance
 
 
-class DrivingParameters:
-    def __init__(self, csv):
-        self.csv = csv
-        self.result = {
-            "acceleration": self._calculate_acceleration(),
-            "revs": self._calculate_revs(),
-            "speed": self._calculate_speed(),
-        }
-
-    def __str__(self):
-        return str(self.to_json())
-
-    def to_json(self):
-        return dumps(self.result)
-
+@register_section("driving")
+class DrivingParameters(BaseParameters):
+    @metric("acceleration", optional=["AccelPedalPos"])
     def _calculate_acceleration(self):
         """Calculate acceleration pedal position statistics."""
         if (
@@ -57,6 +45,7 @@ class DrivingParameters:
             else None,
         }
 
+    @metric("revs", optional=["Revs", "Speed"], uses=["driving"])
     def _calculate_revs(self):
         """Calculate engine revolution statistics."""
         if "Revs" not in self.csv.columns or self.csv["Revs"].dropna().empty:
@@ -64,7 +53,7 @@ class DrivingParameters:
 
         revs = self.csv["Revs"].dropna()
         driving_revs = (
-            self.csv["Revs"][self.csv["Speed"] > 0].dropna()
+            self.csv["Revs"][self.shared.get("driving")].dropna()
             if "Speed" in self.csv.columns
             else pd.Series()
         )
@@ -78,6 +67,7 @@ class DrivingParameters:
             else None,
         }
 
+    @metric("speed", optional=["Speed"])
     def _calculate_speed(self):
         """Calculate average, max and min speed."""
         if "Speed" not in self.csv.columns or self.csv["Speed"].dropna().empty:
@@ -93,25 +83,8 @@ class DrivingParameters:
 
 if __name__ == "__main__":
     # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
     # Usage: python -m data_analyser.parameters.driving_parameters
-    file_path = "../data/ds4/DCM62v2_20250626.csv"
-    csv = pd.read_csv(file_path, delimiter=";", encoding="latin1")
-
-    numeric_columns = ["Revs", "Speed", "AccelPedalPos"]
-    for col in numeric_columns:
-        if col in csv.columns:
-            csv[col] = pd.to_numeric(csv[col], errors="coerce")
-
-    csv["Datetime"] = pd.to_datetime(csv["Date"] + " " + csv["Time"], errors="coerce")
-    csv = csv.sort_values("Datetime")
-
-    driving_parameters = [
-        "Revs",
-        "Speed",
-        "AccelPedalPos",
-        "Datetime",
-    ]
-    filtered_csv = csv[driving_parameters].copy()
-
-    drivingParameters = DrivingParameters(filtered_csv)
-    print(drivingParameters)
+    from data_analyser.data_analyser import DataAnalyser
+
+    print(DataAnalyser("DCM62v2_20250626", ["driving"]))
@@ -1,30 +1,12 @@
-from json import dumps
-
 import pandas as pd
 
+from .base_parameters import BaseParameters
+from .registry import metric, register_section
 
-class EngineParameters:
-    def __init__(self, csv):
-        self.csv = csv
-        self.result = {
-            "battery": self._calculate_battery(),
-            "coolantTemp": self._calculate_coolant_temp(),
-            "engineWarmup": self._calculate_warmup_time(),
-            "errors": self._calculate_errors(),
-            "oilCarbonate_perc": self._calculate_oil_carbonate(),
-            "oilDilution_perc": self._calculate_oil_dilution(),
-            "oilTemp": self._calculate_oil_temp(),
-            "injector": self._calculate_injector(),
-            "fuelPressure": self._calculate_fuel_pressure(),
-            "boost": self._calculate_boost(),
-        }
-
-    def __str__(self):
-        return str(self.to_json())
-
-    def to_json(self):
-        return dumps(self.result)
 
+@register_section("engine")
+class EngineParameters(BaseParameters):
+    @metric("coolantTemp", optional=["Coolant"])
     def _calculate_coolant_temp(self):
         if "Coolant" not in self.csv.columns or self.csv["Coolant"].dropna().empty:
             return {"min_c": None, "max_c": None, "avg_c": None}
@@ -36,6 +18,7 @@ class EngineParameters:
             "avg_c": round(values.mean()),
         }
 
+    @metric("oilTemp", optional=["OilTemp"])
     def _calculate_oil_temp(self):
         if "OilTemp" not in self.csv.columns or self.csv["OilTemp"].dropna().empty:
             return {"min_c": None, "max_c": None, "avg_c": None}
@@ -47,6 +30,7 @@ class EngineParameters:
             "avg_c": round(values.mean()),
         }
 
+    @metric("oilDilution_perc", optional=["OilDilution"])
     def _calculate_oil_dilution(self):
         if (
             "OilDilution" not in self.csv.columns
@@ -55,18 +39,20 @@ class EngineParameters:
             return None
         return round(self.csv["OilDilution"].median())
 
+    @metric("oilCarbonate_perc", optional=["OilCarbon"])
     def _calculate_oil_carbonate(self):
         if "OilCarbon" not in self.csv.columns or self.csv["OilCarbon"].dropna().empty:
             return None
         return round(self.csv["OilCarbon"].median())
 
+    @metric("battery", columns=["Revs", "Battery"], uses=["engine_on"])
     def _calculate_battery(self):
         result = {
             "beforeDrive_v": None,
             "engineRunning_v": None,
         }
 
-        if "Revs" not in self.csv.columns or "Battery" not in self.csv.columns:
+        if not self.has_inputs():
             return result
 
         revs = self.csv["Revs"]
@@ -92,7 +78,7 @@ class EngineParameters:
         else:
             before_drive = pd.Series(dtype="float64")
 
-        engine_running = self.csv[self.csv["Revs"] > 0]["Battery"].dropna()
+        engine_running = self.csv[self.shared.get("engine_on")]["Battery"].dropna()
 
         result["beforeDrive_v"] = (
             float(round(before_drive.mean(), 2)) if not before_drive.empty else None
@@ -104,17 +90,17 @@ class EngineParameters:
 
         return result
 
+    @metric("engineWarmup", columns=["Datetime", "Coolant", "OilTemp"])
     def _calculate_warmup_time(self):
         result = {
             "coolant_sec": None,
             "oil_sec": None,
         }
 
-        required_cols = {"Datetime", "Coolant", "OilTemp"}
-        if not required_cols.issubset(self.csv.columns):
+        if not self.has_inputs():
             return result
 
-        csv_valid = self.csv.dropna(subset=list(required_cols))
+        csv_valid = self.csv.dropna(subset=self.inputs)
         if csv_valid.empty:
             return result
 
@@ -145,11 +131,25 @@ class EngineParameters:
 
         return result
 
+    @metric("errors", optional=["Errors"])
     def _calculate_errors(self):
         if "Errors" not in self.csv.columns or self.csv["Errors"].dropna().empty:
             return None
         return int(self.csv["Errors"].median())
 
+    @metric(
+        "injector",
+        columns=[
+            "Revs",
+            "Speed",
+            "Inj.1FlowCorr",
+            "Inj.2FlowCorr",
+            "Inj.3FlowCorr",
+            "Inj.4FlowCorr",
+        ],
+        optional=["OilTemp", "Coolant"],
+        uses=["idle"],
+    )
     def _calculate_injector(self):
         result = {
             "injector1": None,
@@ -159,26 +159,15 @@ class EngineParameters:
             "average": None,
         }
 
-        required_cols = {
-            "Revs",
-            "Speed",
-            "Inj.1FlowCorr",
-            "Inj.2FlowCorr",
-            "Inj.3FlowCorr",
-            "Inj.4FlowCorr",
-        }
-        if not required_cols.issubset(self.csv.columns):
+        if not self.has_inputs():
             return result
 
-        mask = (
-            (self.csv["Revs"] > 0)
-            & (self.csv["Revs"] < 1000)
-            & (self.csv["Speed"] == 0)
-        )
+        # The shared mask must not be modified in place
+        mask = self.shared.get("idle")
         if "OilTemp" in self.csv.columns:
-            mask &= self.csv["OilTemp"] >= 80
+            mask = mask & (self.csv["OilTemp"] >= 80)
         elif "Coolant" in self.csv.columns:
-            mask &= self.csv["Coolant"] >= 80
+            mask = mask & (self.csv["Coolant"] >= 80)
 
         idle_csv = self.csv[mask]
         if idle_csv.empty:
@@ -206,14 +195,18 @@ class EngineParameters:
 
         return result
 
+    @metric(
+        "fuelPressure",
+        columns=["Revs", "Speed", "FuelPressInstr", "FuelPress"],
+        uses=["standstill_low_revs"],
+    )
     def _calculate_fuel_pressure(self):
         result = {"avg_diff_idle_mbar": None}
 
-        required_cols = {"Revs", "Speed", "FuelPressInstr", "FuelPress"}
-        if not required_cols.issubset(self.csv.columns):
+        if not self.has_inputs():
             return result
 
-        idle_csv = self.csv[(self.csv["Revs"] < 1000) & (self.csv["Speed"] == 0)].copy()
+        idle_csv = self.csv[self.shared.get("standstill_low_revs")].copy()
         if idle_csv.empty:
             return result
 
@@ -224,11 +217,11 @@ class EngineParameters:
 
         return result
 
+    @metric("boost", columns=["TurboInstr", "Turbopress", "REGEN"])
     def _calculate_boost(self):
         result = {"avg_diff_mbar": None}
 
-        required_cols = {"TurboInstr", "Turbopress", "REGEN"}
-        if not required_cols.issubset(self.csv.columns):
+        if not self.has_inputs():
             return result
 
         boost_csv = self.csv[
@@ -250,40 +243,8 @@ if __name__ == "__main__":
     # Run from "backend/data-analyser/src"
     # Source venv first:
     # source ~/venv/fap/bin/activate
+    # export STORAGE_PATH=../data/ds4
     # Usage: python -m data_analyser.parameters.engine_parameters
-    file_path = "../data/ds4/DCM62v2_20250326.csv"
-    csv = pd.read_csv(file_path, delimiter=";", encoding="latin1")
-
-    numeric_columns = [
-        "Battery",
-        "Coolant",
-        "Errors",
-        "FuelPress",
-        "FuelPressInstr",
-        "Inj.1FlowCorr",
-        "Inj.2FlowCorr",
-        "Inj.3FlowCorr",
-        "Inj.4FlowCorr",
-        "OilCarbon",
-        "OilDilution",
-        "OilTemp",
-        "REGEN",
-        "Revs",
-        "Speed",
-        "TurboInstr",
-        "Turbopress",
-    ]
-    for col in numeric_columns:
-        if col in csv.columns:
-            csv[col] = pd.to_numeric(csv[col], errors="coerce")
-
-    csv["Datetime"] = pd.to_datetime(csv["Date"] + " " + csv["Time"], errors="coerce")
-    csv = csv.sort_values("Datetime")
-
-    engine_parameters = [col for col in numeric_columns if col in csv.columns] + [
-        "Datetime"
-    ]
-    filtered_csv = csv[engine_parameters].copy()
-
-    engineParameters = EngineParameters(filtered_csv)
-    print(engineParameters)
+    from data_analyser.data_analyser import DataAnalyser
+
+    print(DataAnalyser("DCM62v2_20250326", ["engine"]))
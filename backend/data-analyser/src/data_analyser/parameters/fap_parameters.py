@@ -1,29 +1,10 @@
-from json import dumps
-
-import pandas as pd
-
-
-class FapParameters:
-    def __init__(self, csv):
-        self.csv = csv
-        self.result = {
-            "additive": self._calculate_additive(),
-            "deposits": self._calculate_deposits(),
-            "lastRegen_km": self._calculate_last_regen(),
-            "last10Regen_km": self._calculate_last_regen_10(),
-            "life": self._calculate_life(),
-            "pressure_idle": self._calculate_pressure_idle(),
-            "pressure": self._calculate_pressure(),
-            "soot": self._calculate_soot(),
-            "temp": self._calculate_temp(),
-        }
-
-    def __str__(self):
-        return str(self.to_json())
+from .base_parameters import BaseParameters
+from .registry import metric, register_section
 
-    def to_json(self):
-        return dumps(self.result)
 
+@register_section("fap")
+class FapParameters(BaseParameters):
+    @metric("additive", optional=["FAPAdditiveVol", "FAPAdditiveRemain"])
     def _calculate_additive(self):
         vol = None
         remain = None
@@ -43,6 +24,7 @@ class FapParameters:
             "remain_ml": remain,
         }
 
+    @metric("deposits", optional=["FAPcinder", "FAPdeposits"])
     def _calculate_deposits(self):
         percentage = None
         weight_gram = None
@@ -59,6 +41,7 @@ class FapParameters:
             "weight_gram": weight_gram,
         }
 
+    @metric("lastRegen_km", optional=["LastRegen"])
     def _calculate_last_regen(self):
         if "LastRegen" not in self.csv.columns:
             return None
@@ -70,6 +53,7 @@ class FapParameters:
         last_regen = last_regen_values.iloc[-1]
         return int(last_regen)
 
+    @metric("last10Regen_km", optional=["Avg10regen"])
     def _calculate_last_regen_10(self):
         if "Avg10regen" not in self.csv.columns:
             return None
@@ -81,6 +65,7 @@ class FapParameters:
         last_10_regen = last_10_regen_values.iloc[-1]
         return int(last_10_regen)
 
+    @metric("life", optional=["FAP life", "FAPlifeLeft"])
     def _calculate_life(self):
         life_avg = None
         left_avg = None
@@ -97,16 +82,13 @@ class FapParameters:
             "left_km": left_avg,
         }
 
+    @metric("pressure_idle", optional=["FAPpressure"], uses=["idle"])
     def _calculate_pressure_idle(self):
         min_pressure = None
         max_pressure = None
         avg_pressure = None
 
-        idle_csv = self.csv[
-            (self.csv["Revs"] > 0)
-            & (self.csv["Revs"] < 1000)
-            & (self.csv["Speed"] == 0)
-        ]
+        idle_csv = self.csv[self.shared.get("idle")]
         if (
             "FAPpressure" in idle_csv.columns
             and not idle_csv["FAPpressure"].dropna().empty
@@ -124,6 +106,7 @@ class FapParameters:
             "min_mbar": min_pressure,
         }
 
+    @metric("pressure", optional=["FAPpressure"])
     def _calculate_pressure(self):
         min_pressure = None
         max_pressure = None
@@ -146,6 +129,7 @@ class FapParameters:
             "avg_mbar": avg_pressure,
         }
 
+    @metric("soot", optional=["FAPsoot"])
     def _calculate_soot(self):
         if "FAPsoot" not in self.csv.columns:
             return {"start_gl": None, "end_gl": None, "diff_gl": None}
@@ -164,6 +148,7 @@ class FapParameters:
             "diff_gl": diff,
         }
 
+    @metric("temp", optional=["FAPtemp"])
     def _calculate_temp(self):
         if "FAPtemp" not in self.csv.columns or self.csv["FAPtemp"].dropna().empty:
             return {
@@ -182,31 +167,8 @@ class FapParameters:
 
 if __name__ == "__main__":
     # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
     # Usage: python -m data_analyser.parameters.fap_parameters
-    file_path = "../data/ds4/DCM62v2_20250205.csv"
-    csv = pd.read_csv(file_path, delimiter=";", encoding="latin1")
-
-    numeric_columns = [
-        "Avg10regen",
-        "FAP life",
-        "FAPAdditiveRemain",
-        "FAPAdditiveVol",
-        "FAPcinder",
-        "FAPdeposits",
-        "FAPlifeLeft",
-        "FAPpressure",
-        "FAPsoot",
-        "FAPtemp",
-        "LastRegen",
-        "Revs",
-        "Speed",
-    ]
-    for col in numeric_columns:
-        if col in csv.columns:
-            csv[col] = pd.to_numeric(csv[col], errors="coerce")
-
-    fap_parameters = numeric_columns
-    filtered_csv = csv[fap_parameters].copy()
-
-    fapParameters = FapParameters(filtered_csv)
-    print(fapParameters)
+    from data_analyser.data_analyser import DataAnalyser
+
+    print(DataAnalyser("DCM62v2_20250205", ["fap"]))
@@ -1,36 +1,20 @@
-from json import dumps
-
 import pandas as pd
 
+from .base_parameters import BaseParameters
+from .registry import metric, register_section
 from .utils import calculate_fuel_consumption, calculate_total_distance
 
 
-class FapRegenParameters:
-    def __init__(self, csv):
-        self.csv = csv
-        if "REGEN" not in self.csv.columns or self.csv[self.csv["REGEN"] == 1].empty:
-            self.result = None
-            return
-
-        self.csv_regen = self.csv[self.csv["REGEN"] == 1]
-        self.result = {
-            "previousRegen_km": self._calculate_previous_regen(),
-            "duration_sec": self._calculate_duration_sec(),
-            "distance_km": self._calculate_distance(),
-            "speed": self._calculate_speed(),
-            "fapTemp": self._calculate_fap_temp(),
-            "fapPressure": self._calculate_fap_pressure(),
-            "revs": self._calculate_revs(),
-            "fapSoot": self._calculate_fap_soot(),
-            "fuelConsumption": self._calculate_fuel(),
-        }
-
-    def __str__(self):
-        return str(self.to_json())
+@register_section("fapRegen", columns=["REGEN"])
+class FapRegenParameters(BaseParameters):
+    def _calculate_metrics(self):
+        if "REGEN" not in self.csv.columns or not self.shared.get("regen").any():
+            return None
 
-    def to_json(self):
-        return dumps(self.result)
+        self.csv_regen = self.csv[self.shared.get("regen")]
+        return super()._calculate_metrics()
 
+    @metric("previousRegen_km", optional=["LastRegen"], uses=["regen"])
     def _calculate_previous_regen(self):
         # Get the last row where REGEN == 1 and return the 'LastRegen' value from that row
         if (
@@ -41,7 +25,7 @@ class FapRegenParameters:
         ):
             return None
 
-        regen_rows = self.csv[self.csv["REGEN"] == 1]
+        regen_rows = self.csv[self.shared.get("regen")]
         if regen_rows.empty:
             return None
 
@@ -51,6 +35,7 @@ class FapRegenParameters:
             return int(value)
         return None
 
+    @metric("duration_sec", optional=["Datetime"], uses=["regen"])
     def _calculate_duration_sec(self):
         if (
             self.csv is None
@@ -60,7 +45,7 @@ class FapRegenParameters:
             return None
 
         # Create a mask for REGEN==1
-        regen_mask = self.csv["REGEN"] == 1
+        regen_mask = self.shared.get("regen")
         # Block id increases when REGEN changes (from 0 to 1 or 1 to 0)
         block_ids = (regen_mask != regen_mask.shift()).cumsum()
         self.csv["_regen_block"] = block_ids
@@ -78,6 +63,7 @@ class FapRegenParameters:
         self.csv.drop(columns=["_regen_block"], inplace=True)
         return int(total_duration) if total_duration > 0 else None
 
+    @metric("distance_km", optional=["Speed", "Time_Diff"])
     def _calculate_distance(self):
         if (
             self.csv_regen is None
@@ -93,6 +79,7 @@ class FapRegenParameters:
         regen_distance = (speed * time_diff) / 3600.0
         return float(round(regen_distance.sum(), 1))
 
+    @metric("speed", optional=["Speed"])
     def _calculate_speed(self):
         if (
             self.csv_regen is None
@@ -108,6 +95,7 @@ class FapRegenParameters:
             "avg_kmh": int(round(speed.mean())),
         }
 
+    @metric("fapTemp", optional=["FAPtemp"])
     def _calculate_fap_temp(self):
         if (
             self.csv_regen is None
@@ -123,6 +111,7 @@ class FapRegenParameters:
             "avg_c": int(round(temp.mean())),
         }
 
+    @metric("fapPressure", optional=["FAPpressure"])
     def _calculate_fap_pressure(self):
         if (
             self.csv_regen is None
@@ -143,6 +132,7 @@ class FapRegenParameters:
             "avg_mbar": int(round(pressure.mean())),
         }
 
+    @metric("revs", optional=["Revs"])
     def _calculate_revs(self):
         if (
             self.csv_regen is None
@@ -158,6 +148,7 @@ class FapRegenParameters:
             "avg": int(round(revs.mean())),
         }
 
+    @metric("fapSoot", optional=["FAPsoot"])
     def _calculate_fap_soot(self):
         if self.csv_regen is None or "FAPsoot" not in self.csv_regen.columns:
             return None
@@ -174,8 +165,13 @@ class FapRegenParameters:
             "diff_gl": float(round(end - start, 2)),
         }
 
+    @metric(
+        "fuelConsumption",
+        columns=["InjFlow", "Revs", "Speed", "Time_Diff"],
+        uses=["regen"],
+    )
     def _calculate_fuel(self):
-        regen_on_df = self.csv[self.csv["REGEN"] == 1]
+        regen_on_df = self.csv[self.shared.get("regen")]
         regen_off_df = self.csv[self.csv["REGEN"] == 0]
 
         regen_on_fuel = calculate_fuel_consumption(regen_on_df)
@@ -202,30 +198,8 @@ class FapRegenParameters:
 
 if __name__ == "__main__":
     # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
     # Usage: python -m data_analyser.parameters.fap_regen_parameters
-    file_path = "../data/ds4/DCM62v2_20250328.csv"
-    csv = pd.read_csv(file_path, delimiter=";", encoding="latin1")
-
-    numeric_columns = [
-        "FAPpressure",
-        "FAPtemp",
-        "FAPsoot",
-        "Revs",
-        "Speed",
-        "InjFlow",
-        "REGEN",
-        "LastRegen",
-    ]
-    for col in numeric_columns:
-        if col in csv.columns:
-            csv[col] = pd.to_numeric(csv[col], errors="coerce")
-
-    csv["Datetime"] = pd.to_datetime(csv["Date"] + " " + csv["Time"], errors="coerce")
-    csv = csv.sort_values("Datetime")
-    csv["Time_Diff"] = csv["Datetime"].diff().dt.total_seconds().fillna(0)
-
-    fap_regen_parameters = numeric_columns + ["Datetime", "Time_Diff"]
-    filtered_csv = csv[fap_regen_parameters].copy()
-
-    fapRegenParameters = FapRegenParameters(filtered_csv)
-    print(fapRegenParameters)
+    from data_analyser.data_analyser import DataAnalyser
+
+    print(DataAnalyser("DCM62v2_20250328", ["fapRegen"]))
@@ -1,25 +1,13 @@
-from json import dumps
-
-import pandas as pd
 from data_analyser.constants.common import range_labels
 
+from .base_parameters import BaseParameters
+from .registry import metric, register_section
 from .utils import calculate_fuel_consumption, calculate_total_distance
 
 
-class FuelParameters:
-    def __init__(self, csv):
-        self.csv = csv
-        self.result = {
-            "overall": self._calculate_overall(),
-            "bySpeedRange": self._calculate_by_speed_range(),
-        }
-
-    def __str__(self):
-        return str(self.to_json())
-
-    def to_json(self):
-        return dumps(self.result)
-
+@register_section("fuelConsumption")
+class FuelParameters(BaseParameters):
+    @metric("overall", optional=["InjFlow", "Revs", "Speed", "Time_Diff"])
     def _calculate_overall(self):
         """Calculate total fuel consumption in liters and average fuel consumption in L/100 km."""
         total_fuel = calculate_fuel_consumption(self.csv)
@@ -36,6 +24,11 @@ class FuelParameters:
             else None,
         }
 
+    @metric(
+        "bySpeedRange",
+        columns=["Speed"],
+        optional=["InjFlow", "Revs", "Time_Diff"],
+    )
     def _calculate_by_speed_range(self):
         """Advanced fuel consumption analysis by speed range, filtering out REGEN == 1."""
         # Define speed range
@@ -109,28 +102,8 @@ class FuelParameters:
 
 if __name__ == "__main__":
     # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
     # Usage: python -m data_analyser.parameters.fuel_parameters
-    file_path = "../data/ds4/DCM62v2_20250328.csv"
-    csv = pd.read_csv(file_path, delimiter=";", encoding="latin1")
-
-    numeric_columns = ["Revs", "Speed", "InjFlow", "AccelPedalPos"]
-    for col in numeric_columns:
-        if col in csv.columns:
-            csv[col] = pd.to_numeric(csv[col], errors="coerce")
-
-    csv["Datetime"] = pd.to_datetime(csv["Date"] + " " + csv["Time"], errors="coerce")
-    csv = csv.sort_values("Datetime")
-    csv["Time_Diff"] = csv["Datetime"].diff().dt.total_seconds().fillna(0)
-
-    fuel_parameters = [
-        "Revs",
-        "Speed",
-        "InjFlow",
-        "AccelPedalPos",
-        "Datetime",
-        "Time_Diff",
-    ]
-    filtered_csv = csv[fuel_parameters].copy()
+    from data_analyser.data_analyser import DataAnalyser
 
-    fuelParameters = FuelParameters(filtered_csv)
-    print(fuelParameters)
+    print(DataAnalyser("DCM62v2_20250328", ["fuelConsumption"]))
@@ -1,31 +1,19 @@
-from json import dumps
-
 import pandas as pd
 
+from .base_parameters import BaseParameters
+from .registry import metric, register_section
 from .utils import calculate_total_distance
 
 
-class OverallParameters:
-    def __init__(self, csv):
-        self.csv = csv
-        self.result = {
-            "distance_km": self._calculate_distance(),
-            "duration": self._calculate_duration(),
-            "externalTemp": self._calculate_temp(),
-            "date": self._calculate_date(),
-        }
-
-    def __str__(self):
-        return str(self.to_json())
-
-    def to_json(self):
-        return dumps(self.result)
-
+@register_section("overall")
+class OverallParameters(BaseParameters):
+    @metric("distance_km", columns=["Speed", "Time_Diff"])
     def _calculate_distance(self):
         """Calculate total distance in km."""
         total_distance = calculate_total_distance(self.csv)
         return float(round(total_distance, 2))
 
+    @metric("externalTemp", optional=["ExternalTemp"])
     def _calculate_temp(self):
         """Return min, max, and average of ExternalTemp column."""
         if (
@@ -41,13 +29,14 @@ class OverallParameters:
             "min_c": int(round(temp.min())),
         }
 
+    @metric(
+        "duration",
+        columns=["Speed", "Revs", "Time_Diff", "Datetime"],
+        uses=["engine_off", "engine_on", "driving"],
+    )
     def _calculate_duration(self):
         """Calculate overall, engine off, engine on, idle, and driving time."""
-        required_cols = {"Speed", "Revs", "Time_Diff", "Datetime"}
-        if (
-            not required_cols.issubset(self.csv.columns)
-            or self.csv[list(required_cols)].dropna().empty
-        ):
+        if not self.has_inputs() or self.csv[self.inputs].dropna().empty:
             return {
                 "overall_sec": None,
                 "engineOff_sec": None,
@@ -56,18 +45,15 @@ class OverallParameters:
                 "driving_sec": None,
             }
 
-        self.csv["EngineOff_Time"] = (self.csv["Revs"] == 0) * self.csv["Time_Diff"]
-        self.csv["EngineOn_Time"] = (self.csv["Revs"] > 0) * self.csv["Time_Diff"]
-        self.csv["Idle_Time"] = (
-            (self.csv["Speed"] == 0) & (self.csv["Revs"] > 0)
-        ) * self.csv["Time_Diff"]
-        self.csv["Driving_Time"] = (self.csv["Speed"] > 0) * self.csv["Time_Diff"]
+        time_diff = self.csv["Time_Diff"]
+        engine_on = self.shared.get("engine_on")
+        idle = (self.csv["Speed"] == 0) & engine_on
 
-        engine_off_sec = self.csv["EngineOff_Time"].sum(skipna=True)
-        engine_on_sec = self.csv["EngineOn_Time"].sum(skipna=True)
-        idle_time_sec = self.csv["Idle_Time"].sum(skipna=True)
-        driving_time_sec = self.csv["Driving_Time"].sum(skipna=True)
-        overall_duration_sec = self.csv["Time_Diff"].sum(skipna=True)
+        engine_off_sec = (self.shared.get("engine_off") * time_diff).sum(skipna=True)
+        engine_on_sec = (engine_on * time_diff).sum(skipna=True)
+        idle_time_sec = (idle * time_diff).sum(skipna=True)
+        driving_time_sec = (self.shared.get("driving") * time_diff).sum(skipna=True)
+        overall_duration_sec = time_diff.sum(skipna=True)
 
         return {
             "overall_sec": int(overall_duration_sec),
@@ -77,6 +63,7 @@ class OverallParameters:
             "driving_sec": int(driving_time_sec),
         }
 
+    @metric("date", optional=["Datetime"])
     def _calculate_date(self):
         """Calculate average and max speed."""
         if "Datetime" not in self.csv.columns or self.csv["Datetime"].dropna().empty:
@@ -94,21 +81,8 @@ class OverallParameters:
 
 if __name__ == "__main__":
     # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
     # Usage: python -m data_analyser.parameters.overall_parameters
-    file_path = "../data/ds4/DCM62v2_20250222.csv"
-    csv = pd.read_csv(file_path, delimiter=";", encoding="latin1")
-
-    numeric_columns = ["Revs", "Speed", "ExternalTemp"]
-    for col in numeric_columns:
-        if col in csv.columns:
-            csv[col] = pd.to_numeric(csv[col], errors="coerce")
-
-    csv["Datetime"] = pd.to_datetime(csv["Date"] + " " + csv["Time"], errors="coerce")
-    csv = csv.sort_values("Datetime")
-    csv["Time_Diff"] = csv["Datetime"].diff().dt.total_seconds().fillna(0)
-
-    overall_parameters = ["Revs", "Speed", "ExternalTemp", "Datetime", "Time_Diff"]
-    filtered_csv = csv[overall_parameters].copy()
+    from data_analyser.data_analyser import DataAnalyser
 
-    overallParameters = OverallParameters(filtered_csv)
-    print(overallParameters)
+    print(DataAnalyser("DCM62v2_20250222", ["overall"]))
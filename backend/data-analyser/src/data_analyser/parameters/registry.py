@@ -0,0 +1,61 @@
+from .shared_inputs import shared_inputs
+
+# Section name -> parameters class, in registration (= result) order
+sections = {}
+
+
+class Metric:
+    """A single value of a section result and the inputs it is computed from."""
+
+    def __init__(self, func, key, columns, optional, uses):
+        self.func = func
+        self.key = key
+        self.columns = tuple(columns)
+        self.optional = tuple(optional)
+        self.uses = tuple(uses)
+
+    @property
+    def all_columns(self):
+        """Every CSV column the metric reads, including its shared inputs."""
+        columns = set(self.columns) | set(self.optional)
+        for name in self.uses:
+            columns |= set(shared_inputs[name].columns)
+        return columns
+
+
+def metric(key, columns=(), optional=(), uses=()):
+    """Declare a parameters method as the metric producing result[key].
+
+    columns are required for the metric to be computed, optional columns are
+    read when the log has them and uses lists the shared inputs it reads.
+    """
+
+    def decorator(func):
+        func.metric = Metric(func, key, columns, optional, uses)
+        return func
+
+    return decorator
+
+
+def register_section(name, columns=()):
+    """Register a parameters class as the producer of the result[name] section.
+
+    The section reads the union of its metrics' columns plus the extra columns
+    given here, so adding a metric never requires touching the loader.
+    """
+
+    def decorator(cls):
+        cls.section = name
+        cls.metrics = [
+            attr.metric for attr in vars(cls).values() if hasattr(attr, "metric")
+        ]
+        cls.columns = set(columns).union(*(m.all_columns for m in cls.metrics))
+        sections[name] = cls
+        return cls
+
+    return decorator
+
+
+def plan_columns(names):
+    """Return the CSV columns needed to compute the given sections."""
+    return set().union(*(sections[name].columns for name in names))
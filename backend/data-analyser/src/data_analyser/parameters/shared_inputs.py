@@ -0,0 +1,74 @@
+import threading
+
+# Shared input name -> SharedInput, filled by the @shared_input decorator
+shared_inputs = {}
+
+
+class SharedInput:
+    """A mask or derived series several metrics read from the same log."""
+
+    def __init__(self, func, name, columns):
+        self.func = func
+        self.name = name
+        self.columns = tuple(columns)
+
+
+def shared_input(name, columns):
+    """Register a function computing a shared input from the log columns."""
+
+    def decorator(func):
+        shared_inputs[name] = SharedInput(func, name, columns)
+        return func
+
+    return decorator
+
+
+class SharedInputs:
+    """Shared inputs of one log, each computed once on first use.
+
+    The values are indexed like the full log, so they can be applied to any
+    column subset of it. Access is locked because sections may run in threads.
+    """
+
+    def __init__(self, csv):
+        self.csv = csv
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            if name not in self._cache:
+                self._cache[name] = shared_inputs[name].func(self.csv)
+            return self._cache[name]
+
+
+@shared_input("engine_on", columns=["Revs"])
+def _engine_on(csv):
+    return csv["Revs"] > 0
+
+
+@shared_input("engine_off", columns=["Revs"])
+def _engine_off(csv):
+    return csv["Revs"] == 0
+
+
+@shared_input("driving", columns=["Speed"])
+def _driving(csv):
+    return csv["Speed"] > 0
+
+
+@shared_input("idle", columns=["Revs", "Speed"])
+def _idle(csv):
+    """Engine running below 1000 rpm while the car stands still."""
+    return (csv["Revs"] > 0) & (csv["Revs"] < 1000) & (csv["Speed"] == 0)
+
+
+@shared_input("standstill_low_revs", columns=["Revs", "Speed"])
+def _standstill_low_revs(csv):
+    """Below 1000 rpm while the car stands still, engine off included."""
+    return (csv["Revs"] < 1000) & (csv["Speed"] == 0)
+
+
+@shared_input("regen", columns=["REGEN"])
+def _regen(csv):
+    return csv["REGEN"] == 1
@@ -0,0 +1,46 @@
+from data_analyser.quantile_sketch import QuantileSketch
+
+from .base_parameters import BaseParameters
+from .registry import metric, register_section
+
+
+@register_section("sketches")
+class SketchParameters(BaseParameters):
+    """Quantile sketches of the logged values, mergeable across logs."""
+
+    def _sketch(self, column):
+        if column not in self.csv.columns:
+            return None
+        values = self.csv[column].dropna()
+        if values.empty:
+            return None
+        return QuantileSketch.from_values(values.to_numpy()).to_json()
+
+    @metric("oilDilution", optional=["OilDilution"])
+    def _calculate_oil_dilution(self):
+        return self._sketch("OilDilution")
+
+    @metric("oilCarbonate", optional=["OilCarbon"])
+    def _calculate_oil_carbonate(self):
+        return self._sketch("OilCarbon")
+
+    @metric("errors", optional=["Errors"])
+    def _calculate_errors(self):
+        return self._sketch("Errors")
+
+    @metric("fapLife", optional=["FAP life"])
+    def _calculate_fap_life(self):
+        return self._sketch("FAP life")
+
+    @metric("fapLifeLeft", optional=["FAPlifeLeft"])
+    def _calculate_fap_life_left(self):
+        return self._sketch("FAPlifeLeft")
+
+
+if __name__ == "__main__":
+    # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
+    # Usage: python -m data_analyser.parameters.sketch_parameters
+    from data_analyser.data_analyser import DataAnalyser
+
+    print(DataAnalyser("DCM62v2_20250326", ["sketches"]))
@@ -0,0 +1,103 @@
+import pandas as pd
+
+from .base_parameters import BaseParameters
+from .registry import metric, register_section
+
+
+@register_section("trips")
+class TripParameters(BaseParameters):
+    @metric("count", optional=["Segment"])
+    def _calculate_count(self):
+        """Number of trip segments, split at pauses in the log."""
+        if "Segment" not in self.csv.columns or self.csv.empty:
+            return 0
+        return int(self.csv["Segment"].iloc[-1]) + 1
+
+    @metric(
+        "segments",
+        columns=["Segment", "Datetime", "Time_Diff", "Speed", "Revs"],
+        uses=["engine_on", "driving"],
+    )
+    def _calculate_segments(self):
+        """Boundaries and overall/driving summary of each trip segment."""
+        if not self.has_inputs() or self.csv.empty:
+            return []
+
+        time_diff = self.csv["Time_Diff"]
+        engine_on = self.shared.get("engine_on")
+        driving = self.shared.get("driving")
+        speed = self.csv["Speed"]
+        revs = self.csv["Revs"]
+
+        # One column per summary value, aggregated in a single grouped pass
+        stats = (
+            pd.DataFrame(
+                {
+                    "start": self.csv["Datetime"],
+                    "end": self.csv["Datetime"],
+                    "overall_sec": time_diff,
+                    "engineOn_sec": engine_on * time_diff,
+                    "idle_sec": ((speed == 0) & engine_on) * time_diff,
+                    "driving_sec": driving * time_diff,
+                    "distance_km": speed * time_diff / 3600.0,
+                    "speed_avg": speed,
+                    "speed_max": speed,
+                    "revs_avg": revs,
+                    "revs_max": revs,
+                    "revs_avgDriving": revs.where(driving),
+                }
+            )
+            .groupby(self.csv["Segment"], sort=False)
+            .agg(
+                {
+                    "start": "min",
+                    "end": "max",
+                    "overall_sec": "sum",
+                    "engineOn_sec": "sum",
+                    "idle_sec": "sum",
+                    "driving_sec": "sum",
+                    "distance_km": "sum",
+                    "speed_avg": "mean",
+                    "speed_max": "max",
+                    "revs_avg": "mean",
+                    "revs_max": "max",
+                    "revs_avgDriving": "mean",
+                }
+            )
+        )
+
+        def to_int(value):
+            return int(round(value)) if pd.notna(value) else None
+
+        return [
+            {
+                "start": row.start.strftime("%Y-%m-%d %H:%M:%S"),
+                "end": row.end.strftime("%Y-%m-%d %H:%M:%S"),
+                "distance_km": float(round(row.distance_km, 2)),
+                "duration": {
+                    "overall_sec": int(row.overall_sec),
+                    "engineOn_sec": int(row.engineOn_sec),
+                    "idle_sec": int(row.idle_sec),
+                    "driving_sec": int(row.driving_sec),
+                },
+                "speed": {
+                    "avg_kmh": to_int(row.speed_avg),
+                    "max_kmh": to_int(row.speed_max),
+                },
+                "revs": {
+                    "avg": to_int(row.revs_avg),
+                    "max": to_int(row.revs_max),
+                    "avgDriving": to_int(row.revs_avgDriving),
+                },
+            }
+            for row in stats.itertuples()
+        ]
+
+
+if __name__ == "__main__":
+    # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
+    # Usage: python -m data_analyser.parameters.trip_parameters
+    from data_analyser.data_analyser import DataAnalyser
+
+    print(DataAnalyser("DCM62v2_20250222", ["trips"]))
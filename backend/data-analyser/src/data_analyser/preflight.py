@@ -0,0 +1,105 @@
+import os
+
+import pandas as pd
+from config import MAX_LOG_ROWS
+from logger_setup import setup_logger
+
+from data_analyser.ecu_profile import detect_profile, parsing_plan, text_columns
+from data_analyser.exceptions.exceptions import DataAnalyseException
+
+logger = setup_logger(__name__)
+
+# Bytes read from the start of the log, enough for the header and ~30 rows
+SAMPLE_SIZE = 16 * 1024
+
+# Leading bytes of formats that are regularly uploaded instead of a log
+binary_signatures = {
+    b"PK\x03\x04": "a zip archive",
+    b"\x1f\x8b": "a gzip archive",
+    b"%PDF": "a PDF document",
+    b"\xd0\xcf\x11\xe0": "an Office document",
+}
+
+
+class PreflightReport:
+    """What the first bytes of a log tell about it."""
+
+    def __init__(self, header, profile, sample_rows, estimated_rows):
+        self.header = header
+        self.profile = profile
+        self.sample_rows = sample_rows
+        self.estimated_rows = estimated_rows
+
+
+def preflight_check(file_path, columns, max_rows=MAX_LOG_ROWS):
+    """Check the header and a sample of rows before the whole log is parsed.
+
+    columns are the CSV columns the analysis reads; at least one of them must
+    be in the header. The row count is estimated from the sample, a log of
+    more than max_rows rows is rejected before it takes the memory to parse.
+    Raises DataAnalyseException naming the first problem.
+    """
+    try:
+        file_size = os.path.getsize(file_path)
+        with open(file_path, "rb") as log_file:
+            sample = log_file.read(SAMPLE_SIZE)
+    except OSError as e:
+        logger.error(f"Failed to open log file {file_path}: {e}")
+        raise DataAnalyseException("Failed to read log file.")
+
+    if not sample.strip():
+        raise DataAnalyseException("Log file is empty.")
+    for signature, kind in binary_signatures.items():
+        if sample.startswith(signature):
+            raise DataAnalyseException(f"Log file is {kind}, not a CSV log.")
+    if b"\x00" in sample:
+        raise DataAnalyseException("Log file is binary, not a CSV log.")
+
+    lines = sample.decode("latin1").splitlines()
+    # The last line is usually cut off by the sample size
+    if len(sample) == SAMPLE_SIZE and len(lines) > 1:
+        lines = lines[:-1]
+
+    header = lines[0].split(";")
+    if len(header) < 2:
+        raise DataAnalyseException("Log file is not a ';' separated CSV log.")
+    missing = text_columns - set(header)
+    if missing:
+        raise DataAnalyseException(
+            f"Log file has no {'/'.join(sorted(missing))} column(s)."
+        )
+    if columns and not set(columns) & set(header):
+        raise DataAnalyseException("Log file has none of the analysed columns.")
+
+    rows = [line.split(";") for line in lines[1:] if line]
+    if not rows:
+        raise DataAnalyseException("Log file has no data rows.")
+
+    profile = detect_profile(header)
+    plan = parsing_plan(profile, tuple(header), tuple(sorted(columns)))
+    date_idx, time_idx = header.index("Date"), header.index("Time")
+    stamps = [
+        (row[date_idx], row[time_idx])
+        for row in rows
+        if len(row) > max(date_idx, time_idx)
+    ]
+    if not stamps:
+        raise DataAnalyseException("Log file rows do not match its header.")
+
+    dates, times = zip(*stamps)
+    parsed = plan.parse_datetime(pd.Series(dates), pd.Series(times))
+    if parsed.isna().all():
+        raise DataAnalyseException("Log file has no valid Date/Time values.")
+
+    header_end = sample.find(b"\n") + 1
+    sample_end = len(sample)
+    if sample_end == SAMPLE_SIZE:
+        sample_end = sample.rfind(b"\n") + 1
+    row_bytes = (sample_end - header_end) / (len(lines) - 1)
+    estimated_rows = round((file_size - header_end) / row_bytes)
+    if estimated_rows > max_rows:
+        raise DataAnalyseException(
+            f"Log file has about {estimated_rows} rows, more than the "
+            f"{max_rows} analysed."
+        )
+    return PreflightReport(header, profile, len(rows), estimated_rows)
@@ -0,0 +1,163 @@
+import json
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from config import STATE_PATH
+from logger_setup import setup_logger
+
+from data_analyser.constants.common import chart_signals
+
+logger = setup_logger(__name__)
+
+# Bump when the on-disk layout changes, older pyramids are rebuilt
+PYRAMID_FORMAT = 1
+
+# Per signal columns of a level, after the bucket start time column
+stats = ("min", "max", "mean")
+
+
+def pyramid_path(file_id):
+    return f"{STATE_PATH}/pyramids/{file_id}"
+
+
+def _merge_pairs(values, func):
+    """Combine neighbouring buckets (last axis), an odd last one is kept as is."""
+    end = values.shape[-1] // 2 * 2
+    merged = func(values[..., :end:2], values[..., 1:end:2])
+    if values.shape[-1] % 2:
+        merged = np.concatenate((merged, values[..., -1:]), axis=-1)
+    return merged
+
+
+def build_pyramid(file_id, csv, mtime):
+    """Write the min/max/mean pyramid of the chart signals of a processed log.
+
+    Level k holds buckets of 2**k samples. Each level is a (buckets, columns)
+    float64 array with the bucket start time in epoch ms first, followed by
+    min, max and mean of every signal.
+    """
+    signals = [signal for signal in chart_signals if signal in csv.columns]
+    times = csv["Datetime"].to_numpy().view("int64") // 1_000_000
+
+    values = np.array(
+        [csv[signal].to_numpy(dtype=np.float64) for signal in signals]
+    ).reshape(len(signals), len(csv))
+    valid = np.isfinite(values)
+    mins = maxs = values
+    sums = np.where(valid, values, 0.0)
+    counts = valid.astype(np.int64)
+
+    target = pyramid_path(file_id)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{file_id}.", dir=os.path.dirname(target))
+    try:
+        level = 0
+        while True:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = np.where(counts > 0, sums / counts, np.nan)
+            columns = [times.astype(np.float64)]
+            for i in range(len(signals)):
+                columns += [mins[i], maxs[i], means[i]]
+            np.save(f"{tmp_dir}/L{level}.npy", np.column_stack(columns))
+
+            # Levels are halved down to a single bucket
+            if len(times) <= 1:
+                break
+            times = times[::2]
+            mins = _merge_pairs(mins, np.fmin)
+            maxs = _merge_pairs(maxs, np.fmax)
+            sums = _merge_pairs(sums, np.add)
+            counts = _merge_pairs(counts, np.add)
+            level += 1
+
+        with open(f"{tmp_dir}/meta.json", "w") as meta_file:
+            json.dump(
+                {
+                    "format": PYRAMID_FORMAT,
+                    "mtime": mtime,
+                    "signals": signals,
+                    "levels": level + 1,
+                },
+                meta_file,
+            )
+
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        try:
+            os.rename(tmp_dir, target)
+        except OSError:
+            # Another worker built the same pyramid concurrently
+            if not os.path.isdir(target):
+                raise
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Built {level + 1} level pyramid for {file_id}")
+    return Pyramid(target)
+
+
+class Pyramid:
+    """A stored pyramid, levels are memory-mapped and read on demand."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(f"{path}/meta.json") as meta_file:
+            meta = json.load(meta_file)
+        self.format = meta["format"]
+        self.mtime = meta["mtime"]
+        self.signals = meta["signals"]
+        self.levels = meta["levels"]
+
+    def level(self, k):
+        return np.load(f"{self.path}/L{k}.npy", mmap_mode="r")
+
+    def query(self, signal, points, start_ms=None, end_ms=None):
+        """Return the finest level buckets of a signal within the window.
+
+        The level is picked so that about `points` buckets fall between
+        start_ms and end_ms; only the returned rows are read from disk.
+        """
+        column = 1 + self.signals.index(signal) * len(stats)
+
+        raw = self.level(0)
+        lo, hi = self._window(raw, start_ms, end_ms)
+        k = 0
+        if hi - lo > points:
+            k = min(math.ceil(math.log2((hi - lo) / points)), self.levels - 1)
+
+        level = self.level(k)
+        lo, hi = self._window(level, start_ms, end_ms)
+        rows = np.asarray(level[lo:hi])
+        return {
+            "bucketSize": 2**k,
+            "time": rows[:, 0].astype(np.int64).tolist(),
+            **{
+                stat: [None if math.isnan(v) else v for v in rows[:, column + i]]
+                for i, stat in enumerate(stats)
+            },
+        }
+
+    @staticmethod
+    def _window(level, start_ms, end_ms):
+        times = level[:, 0]
+        lo = 0 if start_ms is None else int(np.searchsorted(times, start_ms, "left"))
+        hi = len(times)
+        if end_ms is not None:
+            hi = int(np.searchsorted(times, end_ms, "right"))
+        return lo, hi
+
+
+def load_pyramid(file_id, mtime):
+    """Return the stored pyramid of a log, None if missing or stale."""
+    try:
+        pyramid = Pyramid(pyramid_path(file_id))
+    except (OSError, ValueError, KeyError):
+        return None
+    if pyramid.format != PYRAMID_FORMAT or pyramid.mtime != mtime:
+        return None
+    return pyramid
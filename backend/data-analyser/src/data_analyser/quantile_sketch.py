@@ -0,0 +1,119 @@
+import math
+
+import numpy as np
+
+from data_analyser.constants.sketches import sketch_alpha, sketch_max_buckets
+
+# Values closer to zero than this are counted as zero
+MIN_VALUE = 1e-9
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative error alpha (DDSketch).
+
+    Values are counted in logarithmic buckets: bucket i holds the magnitudes
+    in (gamma**(i-1), gamma**i], gamma = (1 + alpha) / (1 - alpha), so any
+    quantile is returned within alpha relative error. Merging adds bucket
+    counts, which is exact, and the bucket count is capped by collapsing the
+    buckets closest to zero.
+    """
+
+    def __init__(self, alpha=sketch_alpha):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.zero = 0
+        self.positive = {}
+        self.negative = {}
+
+    @property
+    def count(self):
+        return self.zero + sum(self.positive.values()) + sum(self.negative.values())
+
+    @classmethod
+    def from_values(cls, values, alpha=sketch_alpha):
+        sketch = cls(alpha)
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        magnitude = np.abs(values)
+        nonzero = magnitude > MIN_VALUE
+        sketch.zero = int((~nonzero).sum())
+
+        index = np.ceil(np.log(magnitude[nonzero]) / math.log(sketch.gamma))
+        index = index.astype(np.int64)
+        positive = values[nonzero] > 0
+        for store, selected in (
+            (sketch.positive, index[positive]),
+            (sketch.negative, index[~positive]),
+        ):
+            buckets, counts = np.unique(selected, return_counts=True)
+            store.update(zip(buckets.tolist(), counts.tolist()))
+        sketch._collapse()
+        return sketch
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different alpha")
+        self.zero += other.zero
+        for store, other_store in (
+            (self.positive, other.positive),
+            (self.negative, other.negative),
+        ):
+            for bucket, count in other_store.items():
+                store[bucket] = store.get(bucket, 0) + count
+        self._collapse()
+        return self
+
+    def quantile(self, q):
+        """Return the q quantile (0 <= q <= 1), None for an empty sketch."""
+        total = self.count
+        if total == 0:
+            return None
+
+        rank = q * (total - 1)
+        seen = 0
+        # From the most negative value up to the largest positive one
+        for bucket in sorted(self.negative, reverse=True):
+            seen += self.negative[bucket]
+            if seen > rank:
+                return -self._bucket_value(bucket)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.positive):
+            seen += self.positive[bucket]
+            if seen > rank:
+                return self._bucket_value(bucket)
+        return self._bucket_value(max(self.positive))
+
+    def _bucket_value(self, bucket):
+        return 2 * self.gamma**bucket / (self.gamma + 1)
+
+    def _collapse(self):
+        """Fold the buckets closest to zero together to cap the sketch size."""
+        for store in (self.positive, self.negative):
+            excess = len(self.positive) + len(self.negative) - sketch_max_buckets
+            if excess <= 0:
+                return
+            lowest = sorted(store)[: excess + 1]
+            if len(lowest) < 2:
+                continue
+            store[lowest[-1]] += sum(store.pop(bucket) for bucket in lowest[:-1])
+
+    def to_json(self):
+        positive, negative = sorted(self.positive), sorted(self.negative)
+        return {
+            "alpha": self.alpha,
+            "zero": self.zero,
+            "index": positive,
+            "count": [self.positive[bucket] for bucket in positive],
+            "negIndex": negative,
+            "negCount": [self.negative[bucket] for bucket in negative],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        sketch = cls(data["alpha"])
+        sketch.zero = int(data["zero"])
+        sketch.positive = dict(zip(data["index"], data["count"]))
+        sketch.negative = dict(zip(data["negIndex"], data["negCount"]))
+        return sketch
@@ -0,0 +1,198 @@
+from datetime import date, timedelta
+
+from logger_setup import setup_logger
+
+from data_analyser.average_aggregate import AverageAggregate, is_number
+from data_analyser.data_average import DataAverage
+from data_analyser.exceptions.exceptions import DataAverageException
+
+# Set up logger for this module
+logger = setup_logger(__name__)
+
+
+class SlidingAggregate:
+    """FIFO window of aggregates with amortised O(1) push, evict and total.
+
+    Pushed aggregates are folded into a running back total. Evicting pops the
+    front stack, which holds suffix totals and is refilled from the back when
+    empty. Aggregates are only ever merged, never subtracted, so min, max and
+    sketches slide as well as sums.
+    """
+
+    def __init__(self):
+        self._front = []
+        self._back = []
+        self._back_total = AverageAggregate()
+
+    def __len__(self):
+        return len(self._front) + len(self._back)
+
+    def push(self, item, aggregate):
+        self._back.append((item, aggregate))
+        self._back_total = self._back_total.merge(aggregate)
+
+    def oldest(self):
+        self._refill()
+        return self._front[-1][0] if self._front else None
+
+    def evict(self):
+        self._refill()
+        return self._front.pop()[0]
+
+    def total(self):
+        front_total = self._front[-1][2] if self._front else AverageAggregate()
+        return front_total.merge(self._back_total)
+
+    def _refill(self):
+        if self._front:
+            return
+        total = AverageAggregate()
+        # The newest item ends up at the bottom, each entry holds the total of
+        # itself and every newer item of the front stack
+        while self._back:
+            item, aggregate = self._back.pop()
+            total = aggregate.merge(total)
+            self._front.append((item, aggregate, total))
+        self._back_total = AverageAggregate()
+
+
+class RollingAverage:
+    """User averages over the last `days` days or the last `regens` regenerations.
+
+    Analyses are grouped by log day. The average of a request only aggregates
+    the analyses of the days in its window. windows() slides the window over
+    every logged day with day buckets of partial aggregates, pushing new days
+    and evicting old ones instead of re-aggregating the analyses in it.
+    """
+
+    def __init__(self, analyses, days=None, regens=None, end=None):
+        self.days = self._validate_size(days, "days")
+        self.regens = self._validate_size(regens, "regens")
+        if (self.days is None) == (self.regens is None):
+            raise DataAverageException("Window must set either 'days' or 'regens'.")
+        self.end = self._parse_date(end) if end is not None else None
+
+        try:
+            self.logs_by_day = self._group_by_day(analyses)
+        except Exception as e:
+            logger.error(f"Failed to group analyses: {str(e)}", exc_info=True)
+            raise DataAverageException("Failed to read data for average calculation.")
+        if not self.logs_by_day:
+            raise DataAverageException("No analysis has a log date.")
+
+        window = self._final_window()
+        if not window:
+            raise DataAverageException("No analysis before the window end.")
+
+        self.start, self.last = window[0][0], window[-1][0]
+        aggregate = AverageAggregate.from_analyses(
+            [analysis for _, logs in window for analysis in logs]
+        )
+        self.result = DataAverage(aggregate=aggregate).result
+
+    @staticmethod
+    def _validate_size(value, name):
+        if value is None:
+            return None
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise DataAverageException(f"'{name}' must be a positive integer.")
+        return value
+
+    @staticmethod
+    def _parse_date(value):
+        try:
+            return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise DataAverageException(f"Invalid window end date: {value}.")
+
+    @staticmethod
+    def _group_by_day(analyses):
+        """Return (day, analyses) of every logged day, oldest first."""
+        days = {}
+        for analysis in analyses:
+            log_date = (analysis.get("overall") or {}).get("date") or {}
+            if log_date.get("date"):
+                days.setdefault(log_date["date"], []).append(analysis)
+        return [(date.fromisoformat(day), days[day]) for day in sorted(days)]
+
+    @staticmethod
+    def _regens(logs):
+        return sum(
+            is_number(duration) and duration is not None
+            for duration in (
+                (analysis.get("fapRegen") or {}).get("duration_sec")
+                for analysis in logs
+            )
+        )
+
+    def _final_window(self):
+        """Return the (day, analyses) of the window ending at the last logged
+        day before the end, the same window windows() reaches there."""
+        logged = [
+            (day, logs)
+            for day, logs in self.logs_by_day
+            if self.end is None or day <= self.end
+        ]
+        if not logged:
+            return []
+
+        last = logged[-1][0]
+        if self.days is not None:
+            first = last - timedelta(days=self.days)
+            return [(day, logs) for day, logs in logged if day > first]
+
+        # The shortest run of days with `regens` regenerations, or every day
+        start, regens = len(logged), 0
+        while start > 0 and regens < self.regens:
+            start -= 1
+            regens += self._regens(logged[start][1])
+        return logged[start:]
+
+    def _day_buckets(self):
+        buckets = []
+        for day, logs in self.logs_by_day:
+            aggregate = AverageAggregate.from_analyses(logs)
+            regens = aggregate.count("fapRegen.duration_sec") or 0
+            buckets.append((day, regens, aggregate))
+        return buckets
+
+    def windows(self):
+        """Yield (first day, last day, aggregate) of the window ending at every
+        logged day."""
+        window = SlidingAggregate()
+        regens = 0
+        for day, day_regens, aggregate in self._day_buckets():
+            window.push((day, day_regens), aggregate)
+            regens += day_regens
+
+            while len(window) > 1:
+                oldest_day, oldest_regens = window.oldest()
+                if self.days is not None:
+                    expired = oldest_day <= day - timedelta(days=self.days)
+                else:
+                    # Keep the shortest run of days with `regens` regenerations
+                    expired = regens - oldest_regens >= self.regens
+                if not expired:
+                    break
+                window.evict()
+                regens -= oldest_regens
+
+            yield window.oldest()[0], day, window.total()
+
+
+if __name__ == "__main__":
+    # Run from "backend/data-analyser/src"
+    # export STORAGE_PATH=../data/ds4
+    # Usage: python -m data_analyser.rolling_average
+    import os
+
+    from data_analyser.data_analyser import DataAnalyser
+
+    data_dir = "../data/ds4/"
+    analyses = [
+        DataAnalyser(os.path.splitext(f)[0]).result
+        for f in os.listdir(data_dir)
+        if f.endswith(".csv")
+    ]
+    rolling = RollingAverage(analyses, days=30)
+    logger.info(f"{rolling.start} - {rolling.last}: {rolling.result}")
@@ -1,6 +1,7 @@
 import asyncio
 import signal
 
+from config import BACKFILL_ON_STARTUP
 from logger_setup import setup_logger
 from nats_client.nats_client import NatsClient
 from nats_client.nats_handler import NatsHandler
@@ -17,8 +18,17 @@ async def main():
     nats_handler = NatsHandler(nats_client)
     await nats_client.subscribe("analysis.request", nats_handler.handle_message)
     await nats_client.subscribe("average.request", nats_handler.handle_message)
+    await nats_client.subscribe("analysis.backfill", nats_handler.handle_message)
+    await nats_client.subscribe("series.request", nats_handler.handle_message)
+    await nats_client.subscribe("pyramid.request", nats_handler.handle_message)
+    await nats_client.subscribe("analysis.result", nats_handler.handle_message)
+    await nats_client.subscribe("outliers.request", nats_handler.handle_message)
+    await nats_client.subscribe("query.request", nats_handler.handle_message)
     logger.debug("Subscribed to NATS topics")
 
+    if BACKFILL_ON_STARTUP:
+        nats_handler.backfill_job.start()
+
     # Create an event for shutdown
     shutdown_event = asyncio.Event()
 
@@ -31,6 +41,7 @@ async def main():
         # Wait for shutdown signal
         await shutdown_event.wait()
         logger.info("Shutdown signal received, shutting down...")
+        await nats_handler.backfill_job.stop()
         await nats_client.close()
         logger.info("NATS client closed")
     except Exception as e:
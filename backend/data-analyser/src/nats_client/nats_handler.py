@@ -1,13 +1,24 @@
 import asyncio
 import json
 from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-from data_analyser.data_analyser import DataAnalyser
+from backfill.backfill_job import BackfillJob
+from backfill.backfill_manifest import BackfillManifest
+from config import DATA_ANALYSER_VERSION, STATE_PATH
+from data_analyser.data_analyser import DataAnalyser, analysis_sections
 from data_analyser.data_average import DataAverage
+from data_analyser.data_series import DataPyramid, DataSeries
 from data_analyser.exceptions.exceptions import (
     DataAnalyseException,
     DataAverageException,
+    DataQueryException,
+    DataSeriesException,
+    OutlierException,
 )
+from data_analyser.log_query import LogQuery
+from data_analyser.metric_index import MetricIndex
+from data_analyser.rolling_average import RollingAverage
 from logger_setup import setup_logger
 
 logger = setup_logger(__name__)
@@ -17,9 +28,20 @@ class NatsHandler:
     def __init__(self, nats_client, max_workers=5):
         self.nats_client = nats_client
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.active_requests = 0
+        self.backfill_job = BackfillJob(
+            self, BackfillManifest(f"{STATE_PATH}/backfill_manifest.jsonl")
+        )
+        self.metric_index = MetricIndex(f"{STATE_PATH}/metric_index")
         self.topic_handlers = {
             "analysis.request": self.handle_analysis_request,
+            "analysis.result": self.handle_analysis_result,
+            "analysis.backfill": self.handle_backfill_request,
             "average.request": self.handle_average_request,
+            "series.request": self.handle_series_request,
+            "pyramid.request": self.handle_pyramid_request,
+            "outliers.request": self.handle_outliers_request,
+            "query.request": self.handle_query_request,
         }
 
     async def handle_message(self, msg):
@@ -37,14 +59,64 @@ class NatsHandler:
         except Exception as e:
             logger.error(f"Failed to handle message: {e}", exc_info=True)
 
-    async def handle_analysis_request(self, _, payload):
+    async def handle_analysis_request(self, msg, payload):
         logger.debug(f"Received analysis request: {payload}")
+        file_id = payload.get("data", {}).get("fileName")
+        sections = payload.get("data", {}).get("sections")
+        # A partial result must not overwrite the stored full analysis, so it
+        # only goes back to the requester's reply inbox
+        subject = "analysis.result"
+        if sections:
+            if not msg.reply:
+                logger.warning(
+                    f"Ignoring analysis request for sections of {file_id} "
+                    "without a reply inbox"
+                )
+                return
+            subject = msg.reply
+        self.active_requests += 1
+        try:
+            await self.analyse_and_publish(file_id, sections, subject=subject)
+        finally:
+            self.active_requests -= 1
+
+    async def handle_analysis_result(self, _, payload):
+        # Published by any analyser instance, only full analyses are indexed
+        analysis_id = payload.get("analysisId")
+        analysis = payload.get("analysis")
+        if payload.get("status") != "Success" or not analysis_id or not analysis:
+            return
+        missing = set(analysis_sections) - set(analysis)
+        if missing:
+            logger.warning(
+                f"Not indexing analysis {analysis_id} without section(s) "
+                f"{', '.join(sorted(missing))}"
+            )
+            return
+        try:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(
+                self.executor, self.metric_index.upsert, analysis_id, analysis
+            )
+        except Exception as e:
+            logger.error(f"Failed to index analysis {analysis_id}: {e}", exc_info=True)
+
+    async def handle_backfill_request(self, _, payload):
+        logger.debug(f"Received backfill request: {payload}")
+        force = bool(payload.get("data", {}).get("force", False))
+        self.backfill_job.start(force=force)
+
+    async def analyse_and_publish(
+        self, file_id, sections=None, executor=None, subject="analysis.result"
+    ):
+        """Analyse a log and publish the outcome, return the published status."""
         try:
-            file_id = payload.get("data", {}).get("fileName")
             if not file_id:
                 raise ValueError("Missing 'fileName' in message")
+            if sections is not None and not isinstance(sections, list):
+                raise ValueError("'sections' must be a list of section names")
 
-            analysis = await self.data_analyser_async(file_id)
+            analysis = await self.data_analyser_async(file_id, sections, executor)
 
             fap_regen = bool(analysis.get("fapRegen"))
             date = analysis.get("overall", {}).get("date", {}).get("date")
@@ -59,23 +131,34 @@ class NatsHandler:
                     "fapRegen": fap_regen,
                     "logDate": date,
                     "distance": distance,
+                    "sections": list(analysis),
+                    "version": DATA_ANALYSER_VERSION,
                 }
             )
 
-            await self.nats_client.publish("analysis.result", response)
+            await self.nats_client.publish(subject, response)
             logger.info(f"Replied with result for {file_id}")
+            status = "Success"
 
         except DataAnalyseException as e:
-            await self._publish_analysis_failure(file_id, str(e))
+            await self._publish_analysis_failure(file_id, str(e), subject)
             logger.warning(
                 f"Replied with failed status for analysis of {file_id}: {str(e)}"
             )
+            status = "Failed"
         except Exception as e:
             logger.error(f"Analysis error: {e}", exc_info=True)
-            await self._publish_analysis_failure(file_id, str(e))
+            await self._publish_analysis_failure(file_id, str(e), subject)
+            # Unexpected errors may be transient, leave the file for the backfill
+            return None
+
+        if not sections:
+            self.backfill_job.record(file_id, status)
+        return status
 
     async def handle_average_request(self, _, payload):
         logger.debug(f"Received average request: {payload}")
+        self.active_requests += 1
         try:
             payload = payload["data"]
             user_id = payload["userId"]
@@ -83,22 +166,27 @@ class NatsHandler:
             avg_year = payload.get("year")
             avg_month = payload.get("month")
             sha = payload["analysisSha"]
+            window = payload.get("window")
             analysis = self._ensure_analysis_list(payload["analysis"])
 
-            average = await self.data_average_async(analysis)
+            if window is None:
+                average = await self.data_average_async(analysis)
+            else:
+                average, window = await self.rolling_average_async(analysis, window)
 
-            response = json.dumps(
-                {
-                    "userId": user_id,
-                    "type": avg_type,
-                    "year": avg_year,
-                    "month": avg_month,
-                    "analysisSha": sha,
-                    "status": "SUCCESS",
-                    "message": "Average calculated successfully.",
-                    "average": average,
-                }
-            )
+            response = {
+                "userId": user_id,
+                "type": avg_type,
+                "year": avg_year,
+                "month": avg_month,
+                "analysisSha": sha,
+                "status": "SUCCESS",
+                "message": "Average calculated successfully.",
+                "average": average,
+            }
+            if window is not None:
+                response["window"] = window
+            response = json.dumps(response)
 
             await self.nats_client.publish("average.result", response)
             logger.info(f"Replied with average result for user {user_id}")
@@ -109,10 +197,179 @@ class NatsHandler:
         except Exception as e:
             logger.error(f"Average error: {e}", exc_info=True)
             await self._publish_average_failure(user_id, avg_type, avg_year, avg_month, sha, str(e))
+        finally:
+            self.active_requests -= 1
+
+    async def handle_series_request(self, msg, payload):
+        logger.debug(f"Received series request: {payload}")
+        data = payload.get("data", {})
+        file_id = data.get("fileName")
+        subject = msg.reply or "series.result"
+        self.active_requests += 1
+        try:
+            if not file_id:
+                raise DataSeriesException("Missing 'fileName' in message")
+
+            series = await self.data_series_async(
+                file_id,
+                data.get("signals"),
+                data.get("points", 500),
+                data.get("start"),
+                data.get("end"),
+            )
+
+            response = json.dumps(
+                {
+                    "fileName": file_id,
+                    "status": "Success",
+                    "message": "Series downsampled successfully.",
+                    "series": series,
+                }
+            )
+            await self.nats_client.publish(subject, response)
+            logger.info(f"Replied with series for {file_id}")
+
+        except DataSeriesException as e:
+            await self._publish_series_failure(file_id, str(e), subject)
+            logger.warning(f"Replied with failed status for series of {file_id}: {e}")
+        except Exception as e:
+            logger.error(f"Series error: {e}", exc_info=True)
+            await self._publish_series_failure(file_id, str(e), subject)
+        finally:
+            self.active_requests -= 1
+
+    async def handle_pyramid_request(self, msg, payload):
+        logger.debug(f"Received pyramid request: {payload}")
+        data = payload.get("data", {})
+        file_id = data.get("fileName")
+        subject = msg.reply or "pyramid.result"
+        self.active_requests += 1
+        try:
+            if not file_id:
+                raise DataSeriesException("Missing 'fileName' in message")
+
+            pyramid = await self.data_pyramid_async(
+                file_id,
+                data.get("signal"),
+                data.get("points", 500),
+                data.get("start"),
+                data.get("end"),
+            )
+
+            response = json.dumps(
+                {
+                    "fileName": file_id,
+                    "status": "Success",
+                    "message": "Pyramid queried successfully.",
+                    "signal": data.get("signal"),
+                    "pyramid": pyramid,
+                }
+            )
+            await self.nats_client.publish(subject, response)
+            logger.info(f"Replied with pyramid for {file_id}")
+
+        except DataSeriesException as e:
+            await self._publish_pyramid_failure(file_id, str(e), subject)
+            logger.warning(f"Replied with failed status for pyramid of {file_id}: {e}")
+        except Exception as e:
+            logger.error(f"Pyramid error: {e}", exc_info=True)
+            await self._publish_pyramid_failure(file_id, str(e), subject)
+        finally:
+            self.active_requests -= 1
+
+    async def handle_outliers_request(self, msg, payload):
+        logger.debug(f"Received outliers request: {payload}")
+        data = payload.get("data", {})
+        subject = msg.reply or "outliers.result"
+        self.active_requests += 1
+        try:
+            loop = asyncio.get_event_loop()
+            outliers = await loop.run_in_executor(
+                self.executor,
+                partial(
+                    self.metric_index.outliers,
+                    data.get("metrics"),
+                    data.get("method", "mad"),
+                    data.get("threshold"),
+                    data.get("limit", 50),
+                ),
+            )
+
+            response = json.dumps(
+                {
+                    "status": "Success",
+                    "message": "Outliers scanned successfully.",
+                    "analyses": len(self.metric_index),
+                    "outliers": outliers,
+                }
+            )
+            await self.nats_client.publish(subject, response)
+            logger.info("Replied with outliers")
 
-    async def data_analyser_async(self, file_id):
+        except OutlierException as e:
+            await self._publish_outliers_failure(str(e), subject)
+            logger.warning(f"Replied with failed status for outliers: {e}")
+        except Exception as e:
+            logger.error(f"Outliers error: {e}", exc_info=True)
+            await self._publish_outliers_failure(str(e), subject)
+        finally:
+            self.active_requests -= 1
+
+    async def handle_query_request(self, msg, payload):
+        logger.debug(f"Received query request: {payload}")
+        data = payload.get("data", {})
+        subject = msg.reply or "query.result"
+        self.active_requests += 1
+        try:
+            loop = asyncio.get_event_loop()
+            query = await loop.run_in_executor(
+                self.executor,
+                partial(
+                    LogQuery,
+                    data.get("fileNames"),
+                    data.get("select"),
+                    where=data.get("where"),
+                    state=data.get("state"),
+                    group_by=data.get("groupBy"),
+                    start=data.get("start"),
+                    end=data.get("end"),
+                    limit=data.get("limit", 1000),
+                    timeout=data.get("timeout", 30),
+                ),
+            )
+
+            response = json.dumps(
+                {
+                    "status": "Success",
+                    "message": "Query completed successfully.",
+                    **query.result,
+                }
+            )
+            await self.nats_client.publish(subject, response)
+            logger.info("Replied with query result")
+
+        except DataQueryException as e:
+            await self._publish_query_failure(str(e), subject)
+            logger.warning(f"Replied with failed status for query: {e}")
+        except Exception as e:
+            logger.error(f"Query error: {e}", exc_info=True)
+            await self._publish_query_failure(str(e), subject)
+        finally:
+            self.active_requests -= 1
+
+    async def data_analyser_async(self, file_id, sections=None, executor=None):
         loop = asyncio.get_event_loop()
-        dataAnalyser = await loop.run_in_executor(self.executor, DataAnalyser, file_id)
+        # Full analyses also store the chart pyramid and columnar copy of the log
+        dataAnalyser = await loop.run_in_executor(
+            executor or self.executor,
+            partial(
+                DataAnalyser,
+                file_id,
+                sections,
+                pyramid=not sections,
+                column_store=not sections,
+            ),
+        )
         return dataAnalyser.result
 
     async def data_average_async(self, analysis):
@@ -120,7 +377,43 @@ class NatsHandler:
         dataAverage = await loop.run_in_executor(self.executor, DataAverage, analysis)
         return dataAverage.result
 
-    async def _publish_analysis_failure(self, analysis_id, message):
+    async def rolling_average_async(self, analysis, window):
+        if not isinstance(window, dict):
+            raise DataAverageException("'window' must be an object.")
+        loop = asyncio.get_event_loop()
+        rollingAverage = await loop.run_in_executor(
+            self.executor,
+            partial(
+                RollingAverage,
+                analysis,
+                days=window.get("days"),
+                regens=window.get("regens"),
+                end=window.get("end"),
+            ),
+        )
+        return rollingAverage.result, {
+            **window,
+            "start": rollingAverage.start.isoformat(),
+            "end": rollingAverage.last.isoformat(),
+        }
+
+    async def data_series_async(self, file_id, signals, points, start, end):
+        loop = asyncio.get_event_loop()
+        dataSeries = await loop.run_in_executor(
+            self.executor, DataSeries, file_id, signals, points, start, end
+        )
+        return dataSeries.result
+
+    async def data_pyramid_async(self, file_id, signal, points, start, end):
+        loop = asyncio.get_event_loop()
+        dataPyramid = await loop.run_in_executor(
+            self.executor, DataPyramid, file_id, signal, points, start, end
+        )
+        return dataPyramid.result
+
+    async def _publish_analysis_failure(
+        self, analysis_id, message, subject="analysis.result"
+    ):
         response = json.dumps(
             {
                 "analysisId": analysis_id,
@@ -130,10 +423,12 @@ class NatsHandler:
                 "fapRegen": False,
                 "logDate": None,
                 "distance": None,
+                "sections": [],
+                "version": DATA_ANALYSER_VERSION,
             }
         )
 
-        await self.nats_client.publish("analysis.result", response)
+        await self.nats_client.publish(subject, response)
 
     @staticmethod
     def _ensure_analysis_list(raw_analysis):
@@ -163,3 +458,51 @@ class NatsHandler:
         )
 
         await self.nats_client.publish("average.result", response)
+
+    async def _publish_series_failure(self, file_id, message, subject):
+        response = json.dumps(
+            {
+                "fileName": file_id,
+                "status": "Failed",
+                "message": message,
+                "series": {},
+            }
+        )
+
+        await self.nats_client.publish(subject, response)
+
+    async def _publish_pyramid_failure(self, file_id, message, subject):
+        response = json.dumps(
+            {
+                "fileName": file_id,
+                "status": "Failed",
+                "message": message,
+                "pyramid": {},
+            }
+        )
+
+        await self.nats_client.publish(subject, response)
+
+    async def _publish_outliers_failure(self, message, subject):
+        response = json.dumps(
+            {
+                "status": "Failed",
+                "message": message,
+                "analyses": len(self.metric_index),
+                "outliers": {},
+            }
+        )
+
+        await self.nats_client.publish(subject, response)
+
+    async def _publish_query_failure(self, message, subject):
+        response = json.dumps(
+            {
+                "status": "Failed",
+                "message": message,
+                "rows": [],
+                "truncated": False,
+            }
+        )
+
+        await self.nats_client.publish(subject, response)
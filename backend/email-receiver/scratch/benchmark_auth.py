@@ -0,0 +1,91 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from fake_services import FakeDiscovery, FakeGmail
+
+RUNS = 20
+
+# 200 ms per discovery fetch, token refreshes against the Gmail stand-in
+discovery = FakeDiscovery(latency=0.2).start()
+gmail = FakeGmail(latency=0.05).start()
+token_path = os.path.join(tempfile.mkdtemp(prefix="auth-bench-"), "token.json")
+os.environ["TOKEN_PATH"] = token_path
+os.environ["GMAIL_DISCOVERY_URL"] = f"{discovery.url}/discovery/v1/apis/gmail/v1/rest"
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+import gmail.auth as auth
+from setup.logger_setup import setup_logger
+
+setup_logger("gmail.auth").setLevel("WARNING")
+
+
+def write_token(expires_in):
+    expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=expires_in)
+    creds = Credentials(
+        token="token0",
+        refresh_token="refresh",
+        token_uri=f"{gmail.url}/token",
+        client_id="client",
+        client_secret="secret",
+        scopes=auth.SCOPES,
+        expiry=expiry,
+    )
+    with open(token_path, "w") as token:
+        token.write(creds.to_json())
+
+
+def timed(func):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        func()
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def previous_static():
+    creds = Credentials.from_authorized_user_file(token_path, auth.SCOPES)
+    build("gmail", "v1", credentials=creds)
+
+
+def previous_discovery():
+    creds = Credentials.from_authorized_user_file(token_path, auth.SCOPES)
+    build(
+        "gmail",
+        "v1",
+        credentials=creds,
+        discoveryServiceUrl=os.environ["GMAIL_DISCOVERY_URL"],
+        cache_discovery=False,
+    )
+
+
+write_token(expires_in=3600)
+print(f"previous, bundled document:  {timed(previous_static):7.2f} ms per run")
+print(f"previous, discovery fetch:   {timed(previous_discovery):7.2f} ms per run")
+
+start = time.perf_counter()
+service = auth.authenticate()
+print(f"cached, first run (startup): {(time.perf_counter() - start) * 1000:7.2f} ms")
+print(f"cached, later runs:          {timed(auth.authenticate):7.2f} ms per run")
+assert auth.authenticate() is service and discovery.requests == RUNS + 1
+
+# A token expiring within the refresh margin is refreshed once, up front.
+# from_authorized_user_file always sets Google's token endpoint, point the
+# loaded credentials at the stand-in instead.
+write_token(expires_in=240)
+creds = Credentials.from_authorized_user_file(token_path, auth.SCOPES)
+# with_token_uri() would drop the expiry
+creds._token_uri = f"{gmail.url}/token"
+auth._credentials = creds
+timed(auth.authenticate)
+assert gmail.refreshes == 1 and auth.get_credentials().token == "token1"
+print(f"proactive refresh: {gmail.refreshes} token request for {RUNS} runs")
+
+discovery.stop()
+gmail.stop()
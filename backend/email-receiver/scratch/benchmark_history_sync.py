@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+os.environ["STATE_PATH"] = tempfile.mkdtemp(prefix="sync-bench-")
+
+from fake_services import FakeGmail
+
+from gmail.history_sync import MAX_RETRY_BACKOFF_RUNS, HistorySync
+from setup.logger_setup import setup_logger
+
+for name in ("gmail.history_sync", "gmail.email_handler"):
+    setup_logger(name).setLevel("ERROR")
+
+BACKLOG = 120
+# New messages arriving before each scheduler cycle
+ARRIVALS = [0, 3, 0, 0, 5, 0, 0, 0, 1, 0]
+
+
+def previous_sync(gmail, service):
+    """The previous check_unread_emails: the first 25 unread messages."""
+    results = service.users().messages().list(userId="me", labelIds=["UNREAD"], maxResults=25).execute()
+    return [message["id"] for message in results.get("messages", [])]
+
+
+def history_sync(gmail, service, sync=None):
+    return [message["id"] for message in sync.new_messages(service)]
+
+
+def simulate(name, sync_messages, **kwargs):
+    """Run the cycles, processing and marking as read what every sync returns."""
+    gmail = FakeGmail(messages=BACKLOG, latency=0).start()
+    service = gmail.service()
+    arrived = {message_id: 0 for message_id in gmail.unread}
+    waited, listed = [], 0
+    for cycle, count in enumerate(ARRIVALS):
+        before = gmail.next_message
+        gmail.deliver(count)
+        arrived.update({f"msg{i:04d}": cycle for i in range(before, gmail.next_message)})
+
+        gmail.requests = 0
+        message_ids = sync_messages(gmail, service, **kwargs)
+        if "sync" in kwargs:
+            kwargs["sync"].commit([])
+        listed += len(message_ids)
+        waited += [cycle - arrived.pop(message_id) for message_id in message_ids if message_id in arrived]
+        gmail.unread = [i for i in gmail.unread if i not in message_ids]
+        print(f"{name:<9} cycle {cycle}: {gmail.requests} listing call(s), {len(message_ids):>3} message(s)")
+    gmail.stop()
+    print(
+        f"{name:<9} {listed} listed, {len(arrived)} still unread, "
+        f"mean wait {sum(waited) / len(waited):.1f} cycles, max {max(waited)}\n"
+    )
+
+
+simulate("polling", previous_sync)
+simulate("history", history_sync, sync=HistorySync())
+
+# An expired history falls back to a full resync, failed messages are retried
+gmail = FakeGmail(messages=3, latency=0).start()
+service = gmail.service()
+sync = HistorySync(os.path.join(os.environ["STATE_PATH"], "expiry.json"))
+assert len(sync.new_messages(service)) == 3
+sync.commit(["msg0001"])
+gmail.deliver(2)
+assert [m["id"] for m in sync.new_messages(service)] == ["msg0001", "msg0003", "msg0004"]
+sync.commit([])
+gmail.expire_history()
+gmail.deliver(1)
+assert len(sync.new_messages(service)) == 6
+sync.commit([])
+reloaded = HistorySync(sync.path)
+assert reloaded.history_id == str(gmail.history_id) and reloaded.new_messages(service) == []
+
+# A message failing every run is retried with a growing backoff, never
+# dropped, and never costs a full listing
+reloaded.commit(["msg0000"])
+retried = []
+gmail.requests = 0
+for run in range(100):
+    message_ids = [m["id"] for m in reloaded.new_messages(service)]
+    if "msg0000" in message_ids:
+        retried.append(run)
+    reloaded.commit(["msg0000"] if "msg0000" in message_ids else [])
+assert retried == [0, 2, 6, 14, 30] + [30 + i * MAX_RETRY_BACKOFF_RUNS for i in (1, 2)]
+assert gmail.requests == 100
+print(
+    "expired history resynced, state reloaded, "
+    f"failing message retried in runs {retried}"
+)
+gmail.stop()
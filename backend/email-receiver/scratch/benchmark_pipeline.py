@@ -0,0 +1,102 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from fake_services import FakeBackend, FakeGmail, wait_sent
+
+backend = FakeBackend(latency=0.1, rejected={"msg0007-1.csv"}).start()
+os.environ["BACKEND_URL"] = backend.url
+os.environ["ENV"] = "production"
+
+from gmail.email_handler import list_unread_messages, mark_as_read
+from process_mail.attachment_processor import (
+    find_attachments,
+    get_attachment_data,
+    get_sender_email,
+    send_file_to_endpoint,
+)
+from process_mail.pipeline import MailPipeline
+from process_mail.upload_outbox import UploadOutbox
+from process_mail.upload_store import UploadStore
+from setup.logger_setup import setup_logger
+
+# Keep the output to the summary
+for name in (
+    "process_mail.pipeline",
+    "process_mail.attachment_processor",
+    "process_mail.upload_outbox",
+    "gmail.email_handler",
+):
+    setup_logger(name).setLevel("CRITICAL")
+
+
+def serial_run(service):
+    """The previous process_emails loop, one blocking call after another."""
+    for message_id in list_unread_messages(service):
+        try:
+            msg_data = (
+                service.users()
+                .messages()
+                .get(userId="me", id=message_id, format="full")
+                .execute()
+            )
+            email = get_sender_email(msg_data)
+            for attachment in find_attachments(msg_data):
+                file_data = get_attachment_data(service, message_id, attachment.attachment_id)
+                if file_data:
+                    send_file_to_endpoint(attachment.filename, file_data, email)
+            mark_as_read(service, [message_id])
+        except Exception:
+            pass
+
+
+def fresh_gmail():
+    # msg0003 fails a download, msg0007 has an attachment rejected by the
+    # backend, msg0011 is rate limited once inside a batch
+    return FakeGmail(
+        messages=25, attachments=3, latency=0.05, broken={"msg0003"}, rate_limited={"msg0011"}
+    ).start()
+
+
+gmail = fresh_gmail()
+backend.received.clear()
+start = time.perf_counter()
+serial_run(gmail.service())
+serial = time.perf_counter() - start
+print(
+    f"serial:   {serial:.2f}s, {gmail.requests} Gmail round trips, "
+    f"{len(backend.received)} uploads, {len(gmail.modified)} marked read"
+)
+gmail.stop()
+
+gmail = fresh_gmail()
+backend.received.clear()
+start = time.perf_counter()
+service = gmail.service()
+messages = [{"id": message_id} for message_id in list_unread_messages(service)]
+state_path = tempfile.mkdtemp(prefix="pipeline-bench-")
+store = UploadStore(os.path.join(state_path, "uploads.sqlite3"))
+outbox = UploadOutbox(store, os.path.join(state_path, "outbox"))
+outbox.start()
+summary = MailPipeline(gmail.service_factory(), store, outbox).run(messages).summary
+processed = time.perf_counter() - start
+wait_sent(outbox)
+pipelined = time.perf_counter() - start
+print(
+    f"pipeline: {pipelined:.2f}s ({processed:.2f}s until marked read), "
+    f"{gmail.requests} Gmail round trips, "
+    f"{len(backend.received)} uploads, {len(gmail.modified)} marked read, "
+    f"{summary}, max {backend.max_active} concurrent uploads"
+)
+gmail.stop()
+
+# The rejected attachment is dropped from the outbox, its message is done
+assert "msg0003" not in gmail.modified and "msg0007" in gmail.modified
+assert len(gmail.modified) == 24 and summary["failed"] == 1
+assert len(backend.received) == 71 and "msg0007-1.csv" not in backend.received
+print(f"speedup:  {serial / pipelined:.1f}x")
+backend.stop()
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from fake_services import FakeBackend
+
+backend = FakeBackend(latency=0).start()
+os.environ["BACKEND_URL"] = backend.url
+
+import requests
+
+from process_mail.upload_client import UploadClient
+
+URL = f"{backend.url}/email"
+
+
+def previous_upload(filename, file_data, email):
+    """The previous send_file_to_endpoint: a new connection and an in-memory body."""
+    return requests.post(URL, files={"file": (filename, file_data)}, data={"email": email})
+
+
+def measure(upload, file_data, count):
+    backend.connections = 0
+    start = time.perf_counter()
+    for i in range(count):
+        response = upload(f"log{i}.csv", file_data, "driver@example.com")
+        assert response.status_code == 201, response.text
+    elapsed = time.perf_counter() - start
+
+    # Python allocations of one upload on top of the attachment itself
+    tracemalloc.start()
+    upload("log.csv", file_data, "driver@example.com")
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, backend.connections, peak
+
+
+client = UploadClient()
+for size, count in ((1024 * 1024, 50), (50 * 1024 * 1024, 5)):
+    file_data = os.urandom(size)
+    mb = size * count / 1024 / 1024
+    for name, upload in (("previous", previous_upload), ("client", client.upload)):
+        elapsed, connections, peak = measure(upload, file_data, count)
+        print(
+            f"{size // 1024 // 1024:>2} MB x {count} {name:<8}: {mb / elapsed:7.1f} MB/s, "
+            f"{connections:>2} new connection(s), peak {peak / 1024 / 1024:6.1f} MB extra"
+        )
+
+# Two 503s are retried with backoff, a rejected file is not
+backend.unavailable = 2
+backend.rejected = {"bad.csv"}
+backend.requests = 0
+assert client.upload("log.csv", b"x", "driver@example.com").status_code == 201
+assert backend.requests == 3
+backend.requests = 0
+assert client.upload("bad.csv", b"x", "driver@example.com").status_code == 400
+assert backend.requests == 1
+print("retries: 503 retried until accepted, 400 not retried")
+
+backend.stop()
@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from fake_services import FakeBackend, FakeGmail, wait_sent
+
+backend = FakeBackend(latency=0.02).start()
+os.environ["BACKEND_URL"] = backend.url
+
+from gmail.email_handler import list_unread_messages
+from process_mail.pipeline import MailPipeline
+from process_mail.upload_outbox import UploadOutbox
+from process_mail.upload_store import UPLOADED, UploadStore
+from setup.logger_setup import setup_logger
+
+for name in (
+    "process_mail.pipeline",
+    "process_mail.attachment_processor",
+    "process_mail.upload_store",
+    "process_mail.upload_outbox",
+    "gmail.email_handler",
+):
+    setup_logger(name).setLevel("CRITICAL")
+
+state_path = tempfile.mkdtemp(prefix="store-bench-")
+store = UploadStore(os.path.join(state_path, "uploads.sqlite3"))
+gmail = FakeGmail(messages=20, attachments=3, latency=0.01).start()
+outbox = UploadOutbox(store, os.path.join(state_path, "outbox"))
+outbox.start()
+pipeline = MailPipeline(gmail.service_factory(), store, outbox, mark_read=True)
+service = gmail.service()
+
+
+def run(name):
+    backend.received.clear()
+    gmail.downloads = 0
+    messages = [{"id": message_id} for message_id in list_unread_messages(service)]
+    summary = pipeline.run(messages).summary
+    wait_sent(outbox)
+    print(
+        f"{name:<28}: {len(messages)} unread, {gmail.downloads} downloads, "
+        f"{len(backend.received)} uploads, {len(gmail.unread)} left unread, {summary}"
+    )
+    return summary
+
+
+# Marking as read fails after the uploads, like a crash between the two
+gmail.modify_fails = True
+run("uploads, marking fails")
+gmail.modify_fails = False
+summary = run("next run")
+assert summary["queued"] == 0 and summary["skipped"] == 60 and not gmail.unread
+
+# The same logs mailed again by the same driver are downloaded, not uploaded
+gmail.forwards = {"msg0020": "msg0003", "msg0021": "msg0004"}
+gmail.deliver(2)
+summary = run("same logs mailed again")
+assert summary["queued"] == 0 and summary["skipped"] == 6
+
+# Compaction drops rows past the retention, at most once per interval
+with store._lock, store._db:
+    store._db.executemany(
+        "INSERT INTO uploads VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (f"old{i}", "1/log.csv", "driver@example.com", f"{i:064x}", UPLOADED, 0)
+            for i in range(100_000)
+        ),
+    )
+size = os.path.getsize(store.path)
+start = time.perf_counter()
+dropped = store.compact(force=True)
+elapsed = time.perf_counter() - start
+print(
+    f"compaction: dropped {dropped} rows in {elapsed * 1000:.0f} ms, "
+    f"{size / 1024 / 1024:.1f} MB -> {os.path.getsize(store.path) / 1024 / 1024:.2f} MB"
+)
+assert dropped == 100_000 and store.compact() == 0
+
+gmail.stop()
+backend.stop()
@@ -0,0 +1,112 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from fake_services import FakeBackend, FakeGmail
+
+backend = FakeBackend(latency=0.05).start()
+os.environ["BACKEND_URL"] = backend.url
+os.environ["ENV"] = "production"
+os.environ["STATE_PATH"] = tempfile.mkdtemp(prefix="metrics-check-")
+
+import uvicorn
+
+import main
+import process_mail.process_emails
+from process_mail.scheduler import RunScheduler
+from setup.logger_setup import setup_logger
+
+for name in (
+    "main",
+    "process_mail.scheduler",
+    "process_mail.pipeline",
+    "process_mail.process_emails",
+    "process_mail.attachment_processor",
+    "process_mail.upload_outbox",
+    "gmail.email_handler",
+    "gmail.history_sync",
+):
+    setup_logger(name).setLevel("CRITICAL")
+
+# msg0004 fails a download and stays unread
+gmail = FakeGmail(messages=30, attachments=3, latency=0.02, broken={"msg0004"}).start()
+process_mail.process_emails.authenticate = gmail.service_factory()
+
+# One run at startup, the next one is due after the check
+main.scheduler = RunScheduler(
+    process_mail.process_emails.process_emails, min_interval=60, max_interval=60
+)
+server = uvicorn.Server(uvicorn.Config(main.app, port=8766, log_level="warning"))
+threading.Thread(target=server.run, daemon=True).start()
+
+
+def metrics():
+    with urllib.request.urlopen("http://127.0.0.1:8766/metrics") as response:
+        assert response.headers["Content-Type"].startswith("text/plain")
+        text = response.read().decode()
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def sample(samples, name, **labels):
+    label = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    return samples.get(f"{name}{{{label}}}" if label else name, 0)
+
+
+deadline = time.monotonic() + 30
+while True:
+    try:
+        samples = metrics()
+        if samples.get("email_receiver_outbox_files") == 0 and sample(
+            samples, "email_receiver_stage_bytes_total", stage="upload"
+        ):
+            break
+    except OSError:
+        pass
+    assert time.monotonic() < deadline, "the first run did not finish"
+    time.sleep(0.05)
+
+print(f"{'stage':<10} {'calls':>6} {'errors':>7} {'mean ms':>8} {'bytes':>10}")
+for stage in ("run", "list", "fetch", "download", "decode", "upload", "mark_read"):
+    count = sample(samples, "email_receiver_stage_seconds_count", stage=stage)
+    total = sample(samples, "email_receiver_stage_seconds_sum", stage=stage)
+    print(
+        f"{stage:<10} {count:>6.0f} "
+        f"{sample(samples, 'email_receiver_stage_errors_total', stage=stage):>7.0f} "
+        f"{total / count * 1000 if count else 0:>8.1f} "
+        f"{sample(samples, 'email_receiver_stage_bytes_total', stage=stage):>10.0f}"
+    )
+print(
+    f"unread backlog {samples['email_receiver_unread_backlog']:.0f}, "
+    f"scheduler lag {samples['email_receiver_scheduler_lag_seconds_sum']:.3f}s, "
+    f"messages {sample(samples, 'email_receiver_messages_total', result='processed'):.0f} "
+    f"processed / {sample(samples, 'email_receiver_messages_total', result='failed'):.0f} failed"
+)
+
+attachment_bytes = 64 * 1024
+assert samples["email_receiver_unread_backlog"] == 1
+assert sample(samples, "email_receiver_stage_errors_total", stage="download") == 3
+assert sample(samples, "email_receiver_stage_bytes_total", stage="download") == 87 * attachment_bytes
+assert sample(samples, "email_receiver_stage_bytes_total", stage="upload") == 87 * attachment_bytes
+assert sample(samples, "email_receiver_stage_seconds_count", stage="mark_read") == 1
+assert sample(samples, "email_receiver_stage_seconds_bucket", stage="decode", le="+Inf") == 87
+
+# Rendering the metrics stays cheap with every series populated
+start = time.perf_counter()
+for _ in range(100):
+    metrics()
+print(f"GET /metrics: {(time.perf_counter() - start) * 10:.1f} ms")
+
+server.should_exit = True
+gmail.stop()
+backend.stop()
@@ -0,0 +1,91 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+os.environ["STATE_PATH"] = tempfile.mkdtemp(prefix="scheduler-check-")
+
+import uvicorn
+
+import main
+from process_mail.scheduler import RunScheduler
+from setup.logger_setup import setup_logger
+
+setup_logger("process_mail.scheduler").setLevel("WARNING")
+setup_logger("main").setLevel("WARNING")
+
+RUN_SECONDS = 0.5
+runs = []
+mailbox = {"unread": 0}
+
+
+def fake_run():
+    """Stand-in for process_emails: takes RUN_SECONDS and empties the mailbox,
+    but for one message that fails on every run."""
+    runs.append(time.monotonic())
+    time.sleep(RUN_SECONDS)
+    found, mailbox["unread"] = mailbox["unread"], 0
+    return {"processed": found, "failed": 1, "queued": found, "skipped": 0, "new": found}
+
+
+# Intervals scaled down from 60 s / 900 s
+main.scheduler = RunScheduler(fake_run, min_interval=0.2, max_interval=1.6)
+server = uvicorn.Server(uvicorn.Config(main.app, port=8765, log_level="warning"))
+threading.Thread(target=server.run, daemon=True).start()
+while not server.started:
+    time.sleep(0.01)
+
+
+def call(method, path):
+    request = urllib.request.Request(f"http://127.0.0.1:8765{path}", method=method)
+    with urllib.request.urlopen(request) as response:
+        return response.status, json.loads(response.read())
+
+
+# Adaptive polling: short while mail arrives, backing off when only the
+# failing message is retried
+start = time.monotonic()
+mailbox["unread"] = 3
+while time.monotonic() - start < 8:
+    if len(runs) == 3:
+        mailbox["unread"] = 2
+    time.sleep(0.05)
+gaps = [b - a - RUN_SECONDS for a, b in zip(runs, runs[1:])]
+print(f"polls: {len(runs)} in 8s, gaps {', '.join(f'{gap:.1f}' for gap in gaps)} s")
+assert gaps[0] < 0.3 and gaps[-1] > 1.5
+
+# A trigger returns at once, a burst of them joins one queued job
+while main.scheduler.current is None:
+    call("POST", "/process")
+    time.sleep(0.01)
+runs.clear()
+with ThreadPoolExecutor(max_workers=20) as executor:
+    timings = list(
+        executor.map(
+            lambda _: (time.perf_counter(), call("POST", "/process"), time.perf_counter()),
+            range(20),
+        )
+    )
+latencies = [(end - begin) * 1000 for begin, _, end in timings]
+job_ids = {body["job_id"] for _, (status, body), _ in timings}
+print(
+    f"20 concurrent triggers during a run: answered in {max(latencies):.0f} ms max "
+    f"(a run takes {RUN_SECONDS * 1000:.0f} ms), {len(job_ids)} job"
+)
+assert len(job_ids) == 1 and all(status == 202 for _, (status, _), _ in timings)
+
+job_id = job_ids.pop()
+while call("GET", f"/process/{job_id}")[1]["status"] in ("queued", "running"):
+    time.sleep(0.05)
+status, job = call("GET", f"/process/{job_id}")
+print(f"job: {job['status']} in {job['duration_seconds']}s, {job['triggers']} triggers")
+assert job["status"] == "succeeded" and job["triggers"] == 20 and len(runs) == 1
+print(f"status: {call('GET', '/status')[1]}")
+
+server.should_exit = True
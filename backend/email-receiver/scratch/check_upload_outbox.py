@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from fake_services import FakeBackend, FakeGmail, wait_sent
+
+backend = FakeBackend(latency=0.02).start()
+os.environ["BACKEND_URL"] = backend.url
+# Leave every retry to the outbox
+os.environ["UPLOAD_RETRIES"] = "0"
+
+from gmail.email_handler import list_unread_messages
+from process_mail.pipeline import MailPipeline
+from process_mail.upload_outbox import UploadOutbox
+from process_mail.upload_store import QUEUED, UploadStore
+from setup.logger_setup import setup_logger
+
+for name in (
+    "process_mail.pipeline",
+    "process_mail.attachment_processor",
+    "process_mail.upload_outbox",
+    "gmail.email_handler",
+):
+    setup_logger(name).setLevel("CRITICAL")
+
+state_path = tempfile.mkdtemp(prefix="outbox-check-")
+outbox_path = os.path.join(state_path, "outbox")
+store = UploadStore(os.path.join(state_path, "uploads.sqlite3"))
+gmail = FakeGmail(messages=20, attachments=3, latency=0.01).start()
+messages = [{"id": message_id} for message_id in list_unread_messages(gmail.service())]
+
+# The backend is down: the mailbox is processed all the same, the files wait
+backend.unavailable = 10**9
+outbox = UploadOutbox(store, outbox_path, backoff=0.05, max_backoff=0.4)
+outbox.start()
+start = time.perf_counter()
+pipeline = MailPipeline(gmail.service_factory(), store, outbox, mark_read=True)
+summary = pipeline.run(messages).summary
+print(
+    f"backend down: {summary['processed']} messages marked read in "
+    f"{time.perf_counter() - start:.2f}s, outbox {outbox.stats()}"
+)
+assert summary["processed"] == 20 and not gmail.unread
+
+time.sleep(1.5)
+print(
+    f"after 1.5s down: {backend.requests} upload attempts for 60 files "
+    f"(backoff 0.05s doubling up to 0.4s)"
+)
+assert backend.requests < 60 * 6
+
+# Restart while down: a new outbox on the same directory takes over the files
+outbox.stop()
+restarted = UploadOutbox(store, outbox_path, backoff=0.05, max_backoff=0.4)
+assert restarted.stats() == outbox.stats()
+restarted.start()
+
+backend.unavailable = 0
+backend.max_active = 0
+start = time.perf_counter()
+wait_sent(restarted)
+print(
+    f"backend back: outbox drained in {time.perf_counter() - start:.2f}s, "
+    f"{len(backend.received)} uploads, {gmail.downloads} Gmail downloads, "
+    f"max {backend.max_active} concurrent uploads"
+)
+assert len(backend.received) == 60 and gmail.downloads == 60
+assert backend.max_active <= restarted.workers
+assert all(name.startswith("outbox.sqlite3") for name in os.listdir(outbox_path))
+
+# A full outbox fails the message, it is left unread for the next run
+small = UploadOutbox(store, os.path.join(state_path, "small"), max_bytes=100 * 1024)
+gmail.deliver(1)
+summary = MailPipeline(gmail.service_factory(), store, small, mark_read=True).run(
+    [{"id": message_id} for message_id in list_unread_messages(gmail.service())]
+).summary
+print(f"outbox over its quota: {summary}, {len(gmail.unread)} left unread")
+assert summary["failed"] == 1 and gmail.unread
+
+
+class FailingInsert:
+    """The outbox database, failing the INSERT of a put."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db.__enter__()
+
+    def __exit__(self, *exc):
+        return self.db.__exit__(*exc)
+
+    def execute(self, sql, *args):
+        if sql.startswith("INSERT"):
+            raise sqlite3.OperationalError("disk I/O error")
+        return self.db.execute(sql, *args)
+
+
+# A failed put leaves nothing behind, the attachment is downloaded again
+store = UploadStore(os.path.join(state_path, "failing.sqlite3"))
+failing = UploadOutbox(store, os.path.join(state_path, "failing"))
+failing._db = FailingInsert(failing._db)
+try:
+    failing.put("m1", "1", "user@example.com", "0" * 64, "log.csv", b"x" * 1024)
+except sqlite3.OperationalError:
+    pass
+print(f"failed put: outbox {failing.stats()}, skipped {store.is_uploaded('m1', '1')}")
+assert failing.stats() == {"files": 0, "bytes": 0} and not store.is_uploaded("m1", "1")
+assert all(name.startswith("outbox.sqlite3") for name in os.listdir(failing.path))
+
+# A put cut short by a crash is forgotten by the store at the next start
+store.set_status("m2", "1", "user@example.com", "1" * 64, QUEUED)
+UploadOutbox(store, os.path.join(state_path, "failing"))
+print(f"crashed put after restart: skipped {store.is_uploaded('m2', '1')}")
+assert not store.is_uploaded("m2", "1")
+
+gmail.stop()
+backend.stop()
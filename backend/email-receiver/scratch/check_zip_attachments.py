@@ -0,0 +1,119 @@
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from fake_services import FakeBackend, FakeGmail, wait_sent
+
+backend = FakeBackend(latency=0.02).start()
+os.environ["BACKEND_URL"] = backend.url
+
+from gmail.email_handler import list_unread_messages
+from process_mail.attachment_processor import ArchiveRejectedError, unpack_logs
+from process_mail.pipeline import MailPipeline
+from process_mail.upload_outbox import UploadOutbox
+from process_mail.upload_store import UploadStore
+from setup.logger_setup import setup_logger
+
+for name in ("process_mail.pipeline", "process_mail.attachment_processor"):
+    setup_logger(name).setLevel("ERROR")
+
+HEADER = "Date;Time;Revs;Speed;FAPtemp;FAPpressure;REGEN;Coolant"
+
+
+def make_log(rows, header=HEADER, seed=0):
+    random.seed(seed)
+    lines = [header]
+    for i in range(rows):
+        lines.append(
+            f"2024.05.01;{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}.000;"
+            f"{random.randint(800, 3500)};{random.randint(0, 130)};"
+            f"{random.randint(150, 650)};{random.randint(5, 40)};0;"
+            f"{random.randint(60, 95)}"
+        )
+    return ("\n".join(lines) + "\n").encode()
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+logs = make_zip({f"trip{i}.csv": make_log(100_000, seed=i) for i in range(5)})
+mixed = make_zip(
+    {
+        "logs/morning.csv": make_log(20_000),
+        "logs/evening.csv": make_log(20_000, seed=1),
+        "notes.txt": b"Regeneration interrupted twice",
+        "settings.csv": b"Key;Value\nUnits;metric\n",
+        "obd.csv": make_log(1_000, "Date;Time;Lambda;MAF", seed=2),
+    }
+)
+bomb = make_zip({"log.csv": b"Date;Time;Revs\n" + b"\0" * (10 * 1024 * 1024)})
+oversized = make_zip({f"log{i}.csv": b"\0" * (15 * 1024 * 1024) for i in range(20)})
+
+for name, data in (("logs", logs), ("mixed", mixed)):
+    start = time.perf_counter()
+    members = list(unpack_logs(data))
+    elapsed = time.perf_counter() - start
+    unpacked = sum(len(m.data) for m in members if m.data)
+    print(
+        f"{name + '.zip':<14} {len(data) / 1024:>8.0f} KB: {len(members)} files, "
+        f"{sum(1 for m in members if m.data)} logs ({unpacked / 1024 / 1024:.1f} MB) "
+        f"in {elapsed * 1000:.0f} ms"
+    )
+    for member in members:
+        if member.problem:
+            print(f"{'':<16} {member.name}: {member.problem}")
+
+for name, data in (("bomb", bomb), ("oversized", oversized)):
+    start = time.perf_counter()
+    try:
+        list(unpack_logs(data))
+        raise AssertionError(f"{name}.zip was not rejected")
+    except ArchiveRejectedError as e:
+        elapsed = time.perf_counter() - start
+        print(f"{name + '.zip':<14} {len(data) / 1024:>8.0f} KB: rejected in {elapsed * 1000:.1f} ms, {e}")
+
+# Through the pipeline: every log is its own upload, the rest never leaves
+gmail = FakeGmail(messages=3, attachments=0, latency=0.01).start()
+gmail.files = {
+    "msg0000": {"logs.zip": logs},
+    "msg0001": {"mixed.zip": mixed, "direct.csv": make_log(1_000, seed=3)},
+    "msg0002": {"bomb.zip": bomb},
+}
+state_path = tempfile.mkdtemp(prefix="zip-check-")
+store = UploadStore(os.path.join(state_path, "uploads.sqlite3"))
+outbox = UploadOutbox(store, os.path.join(state_path, "outbox"))
+outbox.start()
+pipeline = MailPipeline(gmail.service_factory(), store, outbox, mark_read=True)
+messages = [{"id": message_id} for message_id in list_unread_messages(gmail.service())]
+summary = pipeline.run(messages).summary
+wait_sent(outbox)
+print(f"pipeline: {summary}, uploaded {sorted(backend.received)}")
+assert summary["processed"] == 3 and summary["queued"] == 8 and summary["rejected"] == 4
+assert sorted(backend.received) == sorted(
+    [f"trip{i}.csv" for i in range(5)] + ["morning.csv", "evening.csv", "direct.csv"]
+)
+
+# The same archive mailed again is skipped before it is unpacked
+backend.received.clear()
+gmail.forwards = {"msg0003": "msg0000"}
+gmail.files["msg0003"] = {"logs.zip": logs}
+gmail.deliver(1)
+summary = pipeline.run([{"id": "msg0003"}]).summary
+wait_sent(outbox)
+assert summary["queued"] == 0 and summary["skipped"] == 1 and not backend.received
+print(f"same archive mailed again: {summary}")
+
+gmail.stop()
+backend.stop()
@@ -0,0 +1,378 @@
+"""Local stand-ins for the Gmail API and the backend /email endpoint.
+
+Both run as threaded HTTP servers on 127.0.0.1 with a configurable latency
+per request, so the receiver can be run and timed without a mailbox or a
+backend. Import from the other scratch scripts.
+"""
+
+import base64
+import json
+import re
+import threading
+import time
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+
+class FakeServer:
+    """A ThreadingHTTPServer on a free port, served from a daemon thread."""
+
+    def __init__(self, handler):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.lock = threading.Lock()
+        self.max_body = None
+        self.connections = 0
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, content_type="application/json"):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_body(self):
+        """Read the body, keeping only its first `max_body` bytes."""
+        length = int(self.headers.get("Content-Length") or 0)
+        limit = self.server.fake.max_body
+        body = self.rfile.read(min(length, limit or length))
+        length -= len(body)
+        while length > 0:
+            length -= len(self.rfile.read(min(length, 1024 * 1024)))
+        return body
+
+    def handle_request(self, method):
+        fake = self.server.fake
+        fake.enter()
+        try:
+            time.sleep(fake.latency)
+            self.send_json(*fake.route(method, self.path, self.read_body()))
+        finally:
+            fake.leave()
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+
+class FakeGmail(FakeServer):
+    """Gmail API stand-in serving `messages` unread messages, each with
+    `attachments` CSV attachments of `size` bytes.
+
+    Message ids in `broken` fail their attachment downloads with a 404, ids
+    in `missing` their message fetch, and ids in `rate_limited` answer their
+    first fetch with a 429. Messages listed and history records are paged.
+    A message in `forwards` resends the attachments of another one, from the
+    same sender, a message in `files` has extra attachments of the given
+    names and data. batchModify fails with a 400 while `modify_fails` is set.
+    Batch requests are served on the Gmail batch path, their sub-requests
+    don't add latency. POST /token stands in for the OAuth token endpoint.
+    """
+
+    def __init__(
+        self,
+        messages=25,
+        attachments=3,
+        size=64 * 1024,
+        latency=0.05,
+        broken=(),
+        rate_limited=(),
+        missing=(),
+    ):
+        super().__init__(FakeHandler)
+        self.latency = latency
+        self.broken = set(broken)
+        self.size = size
+        self.unread = [f"msg{i:04d}" for i in range(messages)]
+        self.attachments = attachments
+        self.modified = []
+        self.refreshes = 0
+        self.rate_limited = set(rate_limited)
+        self.missing = set(missing)
+        self.next_message = messages
+        self.downloads = 0
+        self.modify_fails = False
+        # Message id -> message id whose attachments it forwards
+        self.forwards = {}
+        # Message id -> {filename: data} of extra attachments
+        self.files = {}
+        # (history id, message id) of every message added since the start
+        self.history_id = 1000
+        self.oldest_history_id = self.history_id
+        self.history = []
+
+    def message(self, message_id):
+        sender = self.forwards.get(message_id, message_id)
+        parts = [
+            {
+                "partId": str(i + 1),
+                "filename": f"{message_id}-{i}.csv",
+                "body": {"attachmentId": f"att{i}", "size": self.size},
+            }
+            for i in range(self.attachments)
+        ]
+        parts += [
+            {
+                "partId": str(self.attachments + i + 1),
+                "filename": filename,
+                "body": {"attachmentId": f"file{i}", "size": len(data)},
+            }
+            for i, (filename, data) in enumerate(self.files.get(message_id, {}).items())
+        ]
+        return {
+            "id": message_id,
+            "payload": {
+                "headers": [{"name": "From", "value": f"Driver <{sender}@example.com>"}],
+                "parts": parts,
+            },
+        }
+
+    def route(self, method, path, body):
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        path = url.path.removeprefix("/gmail/v1/users/me")
+
+        if method == "POST" and path in ("/batch", "/batch/gmail/v1"):
+            return self.batch(body)
+
+        if method == "GET" and path == "/messages":
+            limit = int(query.get("maxResults", ["100"])[0])
+            offset = int(query.get("pageToken", ["0"])[0])
+            with self.lock:
+                unread = self.unread[offset : offset + limit]
+                more = offset + limit < len(self.unread)
+            page = {"messages": [{"id": message_id} for message_id in unread]}
+            if more:
+                page["nextPageToken"] = str(offset + limit)
+            return 200, page
+
+        if method == "GET" and path == "/profile":
+            return 200, {"historyId": str(self.history_id)}
+
+        if method == "GET" and path == "/labels/UNREAD":
+            return 200, {"id": "UNREAD", "messagesUnread": len(self.unread)}
+
+        if method == "GET" and path == "/history":
+            start = int(query["startHistoryId"][0])
+            limit = int(query.get("maxResults", ["100"])[0])
+            offset = int(query.get("pageToken", ["0"])[0])
+            if start < self.oldest_history_id:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            with self.lock:
+                added = [record for record in self.history if record[0] > start]
+                history_id = self.history_id
+            records = [
+                {
+                    "id": str(record_id),
+                    "messagesAdded": [
+                        {"message": {"id": message_id, "labelIds": ["INBOX", "UNREAD"]}}
+                    ],
+                }
+                for record_id, message_id in added[offset : offset + limit]
+            ]
+            page = {"history": records, "historyId": str(history_id)}
+            if offset + limit < len(added):
+                page["nextPageToken"] = str(offset + limit)
+            return 200, page
+
+        if method == "POST" and path == "/token":
+            with self.lock:
+                self.refreshes += 1
+            return 200, {"access_token": f"token{self.refreshes}", "expires_in": 3600}
+
+        match = re.fullmatch(r"/messages/([^/]+)/attachments/([^/]+)", path)
+        if method == "GET" and match:
+            if match.group(1) in self.broken:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            with self.lock:
+                self.downloads += 1
+            return 200, {"size": self.size, "data": self.attachment(*match.groups())}
+
+        if method == "POST" and path == "/messages/batchModify":
+            if self.modify_fails:
+                return 400, {"error": {"code": 400, "message": "Bad Request"}}
+            ids = json.loads(body)["ids"]
+            with self.lock:
+                self.unread = [i for i in self.unread if i not in ids]
+                self.modified.extend(ids)
+            return 204, b""
+
+        match = re.fullmatch(r"/messages/([^/]+)/modify", path)
+        if method == "POST" and match:
+            with self.lock:
+                if match.group(1) in self.unread:
+                    self.unread.remove(match.group(1))
+                self.modified.append(match.group(1))
+            return 200, {"id": match.group(1)}
+
+        match = re.fullmatch(r"/messages/([^/]+)", path)
+        if method == "GET" and match:
+            if match.group(1) in self.missing:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            with self.lock:
+                if match.group(1) in self.rate_limited:
+                    self.rate_limited.remove(match.group(1))
+                    return 429, {"error": {"code": 429, "message": "Rate Limit Exceeded"}}
+            return 200, self.message(match.group(1))
+
+        return 404, {"error": {"code": 404, "message": f"No route for {path}"}}
+
+    def attachment(self, message_id, attachment_id):
+        """Return the base64 data of an attachment, unique to the message."""
+        if attachment_id.startswith("file"):
+            files = list(self.files[message_id].values())
+            return base64.urlsafe_b64encode(files[int(attachment_id[4:])]).decode()
+        message_id = self.forwards.get(message_id, message_id)
+        data = f"{message_id}/{attachment_id}".encode().ljust(self.size, b"x")
+        return base64.urlsafe_b64encode(data).decode()
+
+    def deliver(self, count):
+        """Add `count` new unread messages to the mailbox and its history."""
+        with self.lock:
+            for _ in range(count):
+                message_id = f"msg{self.next_message:04d}"
+                self.next_message += 1
+                self.history_id += 1
+                self.unread.append(message_id)
+                self.history.append((self.history_id, message_id))
+
+    def expire_history(self):
+        """Drop the history, as Gmail does after about a week."""
+        with self.lock:
+            self.oldest_history_id = self.history_id + 1
+            self.history = []
+
+    def batch(self, body):
+        """Serve a multipart/mixed batch of application/http requests."""
+        boundary = body.lstrip().split(b"\n", 1)[0].strip()[2:].decode()
+        batch = BytesParser().parsebytes(
+            f'Content-Type: multipart/mixed; boundary="{boundary}"\r\n\r\n'.encode()
+            + body
+        )
+        parts = []
+        for part in batch.get_payload():
+            request = part.get_payload()
+            request_line, rest = request.split("\n", 1)
+            method, path, _ = request_line.split(" ", 2)
+            sub_body = re.split(r"\r?\n\r?\n", rest, maxsplit=1)[1].encode()
+            status, response = self.route(method, path, sub_body)[:2]
+            payload = response.decode() if isinstance(response, bytes) else json.dumps(response)
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\n\r\n{payload}\r\n"
+            )
+        content = ("".join(parts) + f"--{boundary}--\r\n").encode()
+        return 200, content, f"multipart/mixed; boundary={boundary}"
+
+    def service(self):
+        """Build a Gmail service talking to this stand-in, batches included."""
+        document = json.loads(get_static_doc("gmail", "v1"))
+        document["rootUrl"] = f"{self.url}/"
+        return build_from_document(document, http=httplib2.Http())
+
+    def service_factory(self):
+        """Return a factory keeping one service per thread, like authenticate."""
+        local = threading.local()
+
+        def factory():
+            if not hasattr(local, "service"):
+                local.service = self.service()
+            return local.service
+
+        return factory
+
+
+class FakeBackend(FakeServer):
+    """Backend stand-in answering POST /email with 201, files named in
+    `rejected` with a 400 and the first `unavailable` requests with a 503."""
+
+    def __init__(self, latency=0.1, rejected=(), unavailable=0):
+        super().__init__(FakeHandler)
+        self.latency = latency
+        self.rejected = set(rejected)
+        self.unavailable = unavailable
+        self.received = []
+        # Uploads are discarded while read, only the multipart head is kept
+        self.max_body = 64 * 1024
+
+    def route(self, method, path, body):
+        if method != "POST" or urlparse(path).path != "/email":
+            return 404, {"message": "Not Found"}
+        with self.lock:
+            if self.unavailable:
+                self.unavailable -= 1
+                return 503, {"message": "Service Unavailable"}
+        filename = re.search(rb'filename="([^"]+)"', body).group(1).decode()
+        if filename in self.rejected:
+            return 400, {"message": f"Rejected {filename}"}
+        with self.lock:
+            self.received.append(filename)
+        return 201, {"message": "Created"}
+
+
+class FakeDiscovery(FakeServer):
+    """Discovery service stand-in serving the bundled Gmail discovery document."""
+
+    def __init__(self, latency=0.2):
+        super().__init__(FakeHandler)
+        self.latency = latency
+        self.document = json.loads(get_static_doc("gmail", "v1"))
+
+    def route(self, method, path, body):
+        return 200, self.document
+
+
+def wait_sent(outbox, timeout=60):
+    """Wait until the upload outbox has sent or dropped every file."""
+    deadline = time.monotonic() + timeout
+    while outbox.stats()["files"]:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Outbox still holds {outbox.stats()}")
+        time.sleep(0.01)
@@ -1,10 +1,22 @@
 import os.path
+import threading
+from datetime import datetime, timedelta, timezone
 
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from setup.config import CREDENTIAL_JSON_PATH, ENV, TOKEN_PATH
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from setup.config import (
+    CREDENTIAL_JSON_PATH,
+    ENV,
+    GMAIL_DISCOVERY_URL,
+    GMAIL_TIMEOUT_SECONDS,
+    TOKEN_REFRESH_MARGIN_SECONDS,
+    TOKEN_PATH,
+)
 from setup.logger_setup import setup_logger
 
 logger = setup_logger(__name__)
@@ -15,9 +27,14 @@ SCOPES = [
     "https://www.googleapis.com/auth/gmail.modify",
 ]
 
+_lock = threading.Lock()
+_credentials = None
+_discovery_document = None
+_local = threading.local()
 
-def authenticate():
-    """Authenticate user and return Gmail API service."""
+
+def load_credentials():
+    """Load the credentials from token.json, refreshing or logging in again."""
     creds = None
     # Token stores user's access and refresh tokens
     if os.path.exists(TOKEN_PATH):
@@ -43,14 +60,85 @@ def authenticate():
             )
             creds = flow.run_local_server(port=0)
 
-        # Save the credentials for future runs
-        if ENV != "production":
-            with open(TOKEN_PATH, "w") as token:
-                token.write(creds.to_json())
-                logger.info("Successfully saved new credentials to token.json")
+        save_credentials(creds)
+
+    return creds
+
+
+def save_credentials(creds):
+    # Save the credentials for future runs
+    if ENV != "production":
+        with open(TOKEN_PATH, "w") as token:
+            token.write(creds.to_json())
+            logger.info("Successfully saved new credentials to token.json")
+
+
+def get_credentials():
+    """Return the process-wide credentials, refreshed ahead of their expiry.
+
+    Refreshing before a run, rather than on a 401 in the middle of it, keeps
+    the worker threads sharing the credentials from refreshing all at once.
+    """
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            _credentials = load_credentials()
+        elif _credentials.refresh_token and (
+            not _credentials.valid
+            or _credentials.expiry
+            and _credentials.expiry - datetime.now(timezone.utc).replace(tzinfo=None)
+            < timedelta(seconds=TOKEN_REFRESH_MARGIN_SECONDS)
+        ):
+            logger.info("Refreshing credentials ahead of their expiry")
+            try:
+                _credentials.refresh(Request())
+                save_credentials(_credentials)
+            except Exception as e:
+                if not _credentials.valid:
+                    raise
+                logger.warning(f"Refresh failed, using the current token: {e}")
+        return _credentials
+
+
+def get_discovery_document():
+    """Return the Gmail discovery document, read once per process.
+
+    It is fetched from GMAIL_DISCOVERY_URL when set, falling back to the copy
+    bundled with google-api-python-client.
+    """
+    global _discovery_document
+    with _lock:
+        if _discovery_document is None:
+            if GMAIL_DISCOVERY_URL:
+                try:
+                    response, content = httplib2.Http(
+                        timeout=GMAIL_TIMEOUT_SECONDS
+                    ).request(GMAIL_DISCOVERY_URL)
+                    if response.status != 200:
+                        raise Exception(f"HTTP {response.status}")
+                    _discovery_document = content.decode("utf-8")
+                    logger.info(f"Fetched discovery document from {GMAIL_DISCOVERY_URL}")
+                except Exception as e:
+                    logger.warning(
+                        f"Could not fetch discovery document, using the bundled one: {e}"
+                    )
+            if _discovery_document is None:
+                _discovery_document = get_static_doc("gmail", "v1")
+        return _discovery_document
+
+
+def authenticate():
+    """Return the Gmail API service of the calling thread.
 
-    # Build Gmail API service
-    service = build("gmail", "v1", credentials=creds)
-    logger.info("Successfully built Gmail API service")
+    Service objects are not thread-safe, so every thread keeps its own, built
+    once with its own keep-alive HTTP transport. All of them share the
+    credentials.
+    """
+    creds = get_credentials()
+    if getattr(_local, "credentials", None) is not creds:
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=GMAIL_TIMEOUT_SECONDS))
+        _local.service = build_from_document(get_discovery_document(), http=http)
+        _local.credentials = creds
+        logger.info("Successfully built Gmail API service")
 
-    return service
+    return _local.service
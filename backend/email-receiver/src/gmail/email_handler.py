@@ -1,57 +1,180 @@
+import time
+
+from googleapiclient.errors import HttpError
+from setup.config import GMAIL_BATCH_RETRIES, GMAIL_BATCH_SIZE
 from setup.logger_setup import setup_logger
+from setup.metrics import stage_errors, timed
 
 logger = setup_logger(__name__)
 
+# messages.batchModify takes at most 1000 ids
+MODIFY_BATCH_SIZE = 1000
+BATCH_BACKOFF_SECONDS = 1
+# Sub-request statuses retried in a later batch
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class HistoryExpiredError(Exception):
+    """The mailbox history from a history id on is no longer available."""
+
+
+def is_retryable(error):
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRY_STATUSES
+    # Transport errors of the whole batch
+    return isinstance(error, OSError)
+
+
+def execute_batch(service, requests):
+    """Execute {key: request} as Gmail batch requests of GMAIL_BATCH_SIZE.
+
+    Return (responses, errors), both keyed like requests. A batch answers
+    every sub-request on its own, so one can be rate limited while the others
+    succeed: sub-requests failing with a retryable status are sent again in a
+    later batch with exponential backoff, other failures are returned.
+    """
+    responses, errors = {}, {}
+    pending = list(requests)
+    for attempt in range(GMAIL_BATCH_RETRIES + 1):
+        if attempt:
+            time.sleep(BATCH_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            logger.info(f"Retrying {len(pending)} request(s) of a batch")
+        failed = {}
 
-def mark_as_read(service, message_id):
-    """Mark a message as read by removing the UNREAD label."""
+        def callback(key, response, exception):
+            if exception is None:
+                responses[key] = response
+            else:
+                failed[key] = exception
+
+        for start in range(0, len(pending), GMAIL_BATCH_SIZE):
+            keys = pending[start : start + GMAIL_BATCH_SIZE]
+            batch = service.new_batch_http_request(callback=callback)
+            for key in keys:
+                batch.add(requests[key], request_id=key)
+            try:
+                batch.execute()
+            except Exception as e:
+                # The batch itself failed, none of its requests were answered
+                for key in keys:
+                    if key not in responses:
+                        failed[key] = e
+
+        pending = [key for key, error in failed.items() if is_retryable(error)]
+        errors.update(failed)
+        for key in responses:
+            errors.pop(key, None)
+        if not pending:
+            break
+
+    return responses, errors
+
+
+def mark_as_read(service, message_ids):
+    """Mark messages as read by removing their UNREAD label in bulk."""
     try:
-        request = (
-            service.users()
-            .messages()
-            .modify(userId="me", id=message_id, body={"removeLabelIds": ["UNREAD"]})
-        )
-        request.execute(num_retries=3)
-        logger.info(f"Message {message_id} marked as read")
+        for start in range(0, len(message_ids), MODIFY_BATCH_SIZE):
+            ids = message_ids[start : start + MODIFY_BATCH_SIZE]
+            request = (
+                service.users()
+                .messages()
+                .batchModify(
+                    userId="me", body={"ids": ids, "removeLabelIds": ["UNREAD"]}
+                )
+            )
+            with timed("mark_read"):
+                request.execute(num_retries=3)
+            logger.info(f"{len(ids)} message(s) marked as read")
+        return True
     except Exception as e:
-        logger.error(f"Error marking message as read: {e}", exc_info=True)
+        logger.error(f"Error marking messages as read: {e}", exc_info=True)
+        return False
 
 
-def check_unread_emails(service):
-    """Check for unread emails and process attachments."""
-    try:
-        request = (
+def list_unread_messages(service):
+    """Return the ids of all unread messages, following every page."""
+    message_ids = []
+    page_token = None
+    while True:
+        results = (
             service.users()
             .messages()
-            .list(userId="me", labelIds=["UNREAD"], maxResults=25)
+            .list(
+                userId="me", labelIds=["UNREAD"], maxResults=500, pageToken=page_token
+            )
+            .execute(num_retries=3)
         )
-        results = request.execute(num_retries=3)
+        message_ids.extend(message["id"] for message in results.get("messages", []))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            logger.info(f"Found {len(message_ids)} unread message(s)")
+            return message_ids
 
-        messages = results.get("messages", [])
 
-        if not messages:
-            logger.info("No unread messages.")
-            return []
-        else:
-            logger.info(f"Found {len(messages)} unread message(s)")
-            return messages
+def count_unread_messages(service):
+    """Return the number of unread messages in the mailbox."""
+    label = (
+        service.users().labels().get(userId="me", id="UNREAD").execute(num_retries=3)
+    )
+    return label["messagesUnread"]
 
-    except Exception as e:
-        logger.error(
-            f"An error occurred while checking unread emails: {e}", exc_info=True
-        )
-        return []
 
+def get_history_id(service):
+    """Return the current history id of the mailbox."""
+    profile = service.users().getProfile(userId="me").execute(num_retries=3)
+    return profile["historyId"]
 
-def get_message_data(service, message_id):
-    """Get full message data from Gmail."""
-    try:
-        return (
-            service.users()
-            .messages()
-            .get(userId="me", id=message_id, format="full")
-            .execute()
-        )
-    except Exception as e:
-        logger.error(f"Error getting message data: {e}", exc_info=True)
-        return None
+
+def list_added_unread(service, start_history_id):
+    """Return the ids of unread messages added since a history id, and the
+    history id they are current up to.
+
+    Raise HistoryExpiredError when Gmail no longer holds the history from
+    that id on.
+    """
+    message_ids = []
+    page_token = None
+    while True:
+        try:
+            results = (
+                service.users()
+                .history()
+                .list(
+                    userId="me",
+                    startHistoryId=start_history_id,
+                    historyTypes=["messageAdded"],
+                    maxResults=500,
+                    pageToken=page_token,
+                )
+                .execute(num_retries=3)
+            )
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise HistoryExpiredError(start_history_id) from e
+            raise
+        for record in results.get("history", []):
+            for added in record.get("messagesAdded", []):
+                message = added["message"]
+                if "UNREAD" in message.get("labelIds", []):
+                    message_ids.append(message["id"])
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return list(dict.fromkeys(message_ids)), results["historyId"]
+
+
+def get_messages_data(service, message_ids):
+    """Get full message data of many messages in batches.
+
+    Return (messages, errors), both keyed by message id.
+    """
+    requests = {
+        message_id: service.users()
+        .messages()
+        .get(userId="me", id=message_id, format="full")
+        for message_id in message_ids
+    }
+    with timed("fetch"):
+        messages, errors = execute_batch(service, requests)
+    if errors:
+        stage_errors.inc(len(errors), stage="fetch")
+    return messages, errors
@@ -0,0 +1,125 @@
+import json
+import os
+
+from gmail.email_handler import (
+    HistoryExpiredError,
+    get_history_id,
+    list_added_unread,
+    list_unread_messages,
+)
+from setup.config import STATE_PATH
+from setup.logger_setup import setup_logger
+
+logger = setup_logger(__name__)
+
+# Longest wait, in runs, before a failed message is retried. A message is
+# retried on the next run after its first failure, and waits twice as many
+# runs after every further one
+MAX_RETRY_BACKOFF_RUNS = 32
+
+
+class HistorySync:
+    """Find the messages to process from the mailbox history.
+
+    The first run lists every unread message and stores the history id of
+    the mailbox. Later runs only ask users.history.list for the messages
+    added since, so a run costs one call when no mail arrived. When Gmail no
+    longer holds that history, the unread messages are listed again.
+
+    Messages that failed are not in the history again, they are kept and
+    retried with a backoff in runs, up to MAX_RETRY_BACKOFF_RUNS, until they
+    succeed. new_count tells how many of the messages to process are new.
+    """
+
+    def __init__(self, path=f"{STATE_PATH}/sync_state.json"):
+        self.path = path
+        self.history_id = None
+        # Message id -> failed runs and the run it is due to be retried in
+        self.retry = {}
+        self.run = 0
+        self.new_count = 0
+        self._attempted = set()
+        self._next_history_id = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as state_file:
+                state = json.load(state_file)
+            self.history_id, self.retry, self.run = (
+                state["historyId"],
+                state["retry"],
+                state["run"],
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable sync state, resyncing: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as state_file:
+            json.dump(
+                {"historyId": self.history_id, "retry": self.retry, "run": self.run},
+                state_file,
+            )
+        os.replace(tmp_path, self.path)
+
+    def new_messages(self, service):
+        """Return the messages to process, as returned by messages.list."""
+        message_ids = None
+        if self.history_id is not None:
+            try:
+                message_ids, self._next_history_id = list_added_unread(
+                    service, self.history_id
+                )
+                logger.info(
+                    f"Found {len(message_ids)} new unread message(s) since "
+                    f"history id {self.history_id}"
+                )
+            except HistoryExpiredError:
+                logger.warning(
+                    f"History since {self.history_id} expired, listing unread messages"
+                )
+
+        if message_ids is None:
+            # Taken before listing, so mail arriving meanwhile is in the next
+            # history rather than lost
+            self._next_history_id = get_history_id(service)
+            message_ids = list_unread_messages(service)
+
+        # A full listing holds the failed messages too, they wait for their run
+        new_ids = [
+            message_id for message_id in message_ids if message_id not in self.retry
+        ]
+        due_ids = [
+            message_id
+            for message_id, entry in self.retry.items()
+            if entry["dueRun"] <= self.run
+        ]
+        self.new_count = len(set(new_ids))
+        message_ids = list(dict.fromkeys(due_ids + new_ids))
+        self._attempted = set(message_ids)
+        return [{"id": message_id} for message_id in message_ids]
+
+    def commit(self, failed_ids):
+        """Store the history id reached and the messages to retry."""
+        retry = {
+            message_id: entry
+            for message_id, entry in self.retry.items()
+            if message_id not in self._attempted
+        }
+        for message_id in failed_ids:
+            failures = self.retry.get(message_id, {"failures": 0})["failures"] + 1
+            wait = min(2 ** (failures - 1), MAX_RETRY_BACKOFF_RUNS)
+            retry[message_id] = {"failures": failures, "dueRun": self.run + wait}
+            if wait == MAX_RETRY_BACKOFF_RUNS:
+                logger.warning(
+                    f"Message {message_id} failed {failures} runs, retrying it "
+                    f"every {wait} runs"
+                )
+        self.retry = retry
+        self.run += 1
+        self.history_id = self._next_history_id
+        self._save()
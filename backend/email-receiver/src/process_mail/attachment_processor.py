@@ -1,82 +1,247 @@
 import base64
-
-import requests
-from setup.config import BACKEND_URL, EMAIL_ENDPOINT
+import io
+import json
+import os
+import zipfile
+import zlib
+from collections import namedtuple
+
+from gmail.email_handler import execute_batch
+from process_mail.upload_client import UploadClient
+from setup.config import (
+    ZIP_MAX_MEMBER_BYTES,
+    ZIP_MAX_MEMBERS,
+    ZIP_MAX_RATIO,
+    ZIP_MAX_TOTAL_BYTES,
+)
 from setup.logger_setup import setup_logger
+from setup.metrics import stage_bytes, stage_errors, timed
 
 logger = setup_logger(__name__)
 
+upload_client = UploadClient()
+
+Attachment = namedtuple("Attachment", ["filename", "attachment_id", "size", "part"])
+# A CSV in a ZIP attachment, data is None when the log is not uploaded and
+# problem tells why
+ArchiveMember = namedtuple("ArchiveMember", ["name", "filename", "data", "problem"])
+
+# Columns of the logs the data analyser reads, written by its
+# scratch/export_analysed_columns.py: the text columns every log has, and the
+# columns of which a log needs at least one
+with open(
+    os.path.join(os.path.dirname(__file__), "analysed_columns.json"), encoding="utf-8"
+) as columns_file:
+    analysed_columns = json.load(columns_file)
+TEXT_COLUMNS = set(analysed_columns["textColumns"])
+ANALYSED_COLUMNS = set(analysed_columns["analysedColumns"])
+
+# Decompressed bytes read at once from an archive member
+READ_SIZE = 64 * 1024
+
+
+class ArchiveRejectedError(Exception):
+    """A ZIP attachment that is not unpacked, e.g. a zip bomb."""
+
+
+class UploadRejectedError(Exception):
+    """An upload the backend refused, sending it again gets the same answer."""
+
 
 def get_attachment_data(service, message_id, attachment_id):
     """Get attachment data from Gmail message."""
     try:
-        attachment = (
-            service.users()
-            .messages()
-            .attachments()
-            .get(userId="me", messageId=message_id, id=attachment_id)
-            .execute()
-        )
+        with timed("download"):
+            attachment = (
+                service.users()
+                .messages()
+                .attachments()
+                .get(userId="me", messageId=message_id, id=attachment_id)
+                .execute()
+            )
 
         if attachment and "data" in attachment:
-            return base64.urlsafe_b64decode(attachment["data"])
+            return decode_attachment(attachment["data"])
         return None
     except Exception as e:
         logger.error(f"Error getting attachment: {e}", exc_info=True)
         return None
 
 
+def get_attachments_data(service, message_id, attachment_ids):
+    """Get the data of many attachments of a message in batches.
+
+    Return (attachments, errors), both keyed by attachment id.
+    """
+    requests = {
+        attachment_id: service.users()
+        .messages()
+        .attachments()
+        .get(userId="me", messageId=message_id, id=attachment_id)
+        for attachment_id in attachment_ids
+    }
+    with timed("download"):
+        responses, errors = execute_batch(service, requests)
+    if errors:
+        stage_errors.inc(len(errors), stage="download")
+    attachments = {}
+    for attachment_id, attachment in responses.items():
+        if attachment and "data" in attachment:
+            attachments[attachment_id] = decode_attachment(attachment["data"])
+        else:
+            errors[attachment_id] = Exception("Attachment has no data")
+    return attachments, errors
+
+
+def decode_attachment(data):
+    """Decode the base64 data of an attachment, counting its bytes."""
+    with timed("decode"):
+        file_data = base64.urlsafe_b64decode(data)
+    stage_bytes.inc(len(file_data), stage="download")
+    return file_data
+
+
 def send_file_to_endpoint(filename, file_data, email):
     """Send file to the local endpoint."""
-    files = {"file": (filename, file_data)}
-    data = {"email": email}
-
     logger.info(
         f"Sending POST request with {filename} from {email}",
     )
 
-    response = requests.post(f"{BACKEND_URL}/{EMAIL_ENDPOINT}", files=files, data=data)
+    with timed("upload"):
+        response = upload_client.upload(filename, file_data, email)
 
     if response.status_code == 201:
         logger.info(f"Successfully processed {filename} from {email}")
+        if isinstance(file_data, (bytes, bytearray, memoryview)):
+            stage_bytes.inc(len(file_data), stage="upload")
+        else:
+            stage_bytes.inc(os.fstat(file_data.fileno()).st_size, stage="upload")
         return True
-    else:
-        raise Exception(f"Failed to process {filename} from {email}: {response.text}")
 
-
-def process_attachments(msg_data, service):
-    """Process attachments from a message and send them to the local endpoint."""
+    stage_errors.inc(stage="upload")
+    if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+        raise UploadRejectedError(
+            f"Backend rejected {filename} from {email}: {response.text}"
+        )
+    raise Exception(f"Failed to process {filename} from {email}: {response.text}")
+
+
+def get_sender_email(msg_data):
+    """Return the email address of the sender of a message."""
+    headers = msg_data.get("payload", {}).get("headers", [])
+    sender = next((h["value"] for h in headers if h["name"] == "From"), None)
+
+    if not sender:
+        raise ValueError("Unknown sender - no From header found in email")
+
+    # Extract email from sender string (e.g., "John Doe <john@example.com>")
+    return sender.split("<")[-1].split(">")[0] if "<" in sender else sender
+
+
+def find_attachments(msg_data):
+    """Return the CSV and ZIP attachments of a message."""
+    attachments = []
+    for part in msg_data.get("payload", {}).get("parts", []):
+        body = part.get("body", {})
+        if part.get("filename") and body.get("attachmentId"):
+            filename = part["filename"].lower()
+            if filename.endswith((".csv", ".zip")):
+                attachments.append(
+                    Attachment(
+                        filename,
+                        body["attachmentId"],
+                        body.get("size", 0),
+                        # Attachment ids change between fetches, part ids don't
+                        f"{part.get('partId', '')}/{filename}",
+                    )
+                )
+    return attachments
+
+
+def check_log_header(header_line):
+    """Return why a CSV header line is not a log the analyser reads, or None."""
+    header = header_line.decode("latin1").rstrip("\r\n").split(";")
+    if len(header) < 2:
+        return "not a ';' separated CSV log"
+    missing = TEXT_COLUMNS - set(header)
+    if missing:
+        return f"no {'/'.join(sorted(missing))} column(s)"
+    if not ANALYSED_COLUMNS & set(header):
+        return "none of the analysed columns"
+    return None
+
+
+def _read_member(archive, info):
+    """Decompress one member, checking its header before reading the rest."""
+    with archive.open(info) as member:
+        chunks = [member.read(READ_SIZE)]
+        size = len(chunks[0])
+        header_end = chunks[0].find(b"\n")
+        problem = check_log_header(
+            chunks[0] if header_end < 0 else chunks[0][:header_end]
+        )
+        if problem:
+            return None, problem
+        while chunk := member.read(READ_SIZE):
+            size += len(chunk)
+            # The sizes in the archive were checked, this holds when they lie
+            if size > ZIP_MAX_MEMBER_BYTES:
+                raise ArchiveRejectedError(
+                    f"{info.filename} unpacks to more than {ZIP_MAX_MEMBER_BYTES} bytes"
+                )
+            chunks.append(chunk)
+    return b"".join(chunks), None
+
+
+def unpack_logs(zip_data):
+    """Yield an ArchiveMember for every CSV file in a ZIP attachment.
+
+    Members are decompressed in memory one at a time, and only once their
+    header is a log the analyser reads. An archive holding more or larger
+    members than the ZIP_MAX_* limits, or compressed beyond ZIP_MAX_RATIO,
+    raises ArchiveRejectedError before anything is decompressed.
+    """
     try:
-        # Get sender email from headers
-        headers = msg_data.get("payload", {}).get("headers", [])
-        sender = next((h["value"] for h in headers if h["name"] == "From"), None)
-
-        if not sender:
-            raise ValueError("Unknown sender - no From header found in email")
-
-        # Extract email from sender string (e.g., "John Doe <john@example.com>")
-        email = sender.split("<")[-1].split(">")[0] if "<" in sender else sender
-
-        # Process attachments
-        if "payload" in msg_data and "parts" in msg_data["payload"]:
-            for part in msg_data["payload"]["parts"]:
-                if (
-                    part.get("filename")
-                    and part.get("body")
-                    and part.get("body").get("attachmentId")
-                ):
-                    filename = part["filename"].lower()
-                    if filename.endswith((".csv", ".zip")):
-                        logger.info(f"Processing attachment: {filename}")
-
-                        # Get attachment data
-                        attachment_data = get_attachment_data(
-                            service, msg_data["id"], part["body"]["attachmentId"]
-                        )
-
-                        if attachment_data:
-                            send_file_to_endpoint(filename, attachment_data, email)
-
-    except Exception as e:
-        logger.error(f"Error processing attachments: {e}", exc_info=True)
-        raise
+        archive = zipfile.ZipFile(io.BytesIO(zip_data))
+    except zipfile.BadZipFile as e:
+        raise ArchiveRejectedError(f"not a ZIP archive: {e}")
+
+    with archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if len(members) > ZIP_MAX_MEMBERS:
+            raise ArchiveRejectedError(
+                f"{len(members)} files, more than {ZIP_MAX_MEMBERS}"
+            )
+        total_size = sum(info.file_size for info in members)
+        if total_size > ZIP_MAX_TOTAL_BYTES:
+            raise ArchiveRejectedError(
+                f"unpacks to {total_size} bytes, more than {ZIP_MAX_TOTAL_BYTES}"
+            )
+        for info in members:
+            if info.file_size > ZIP_MAX_MEMBER_BYTES:
+                raise ArchiveRejectedError(
+                    f"{info.filename} unpacks to {info.file_size} bytes, "
+                    f"more than {ZIP_MAX_MEMBER_BYTES}"
+                )
+            if info.file_size > ZIP_MAX_RATIO * max(info.compress_size, 1):
+                raise ArchiveRejectedError(
+                    f"{info.filename} is compressed more than {ZIP_MAX_RATIO} times"
+                )
+
+        for info in members:
+            filename = os.path.basename(info.filename)
+            if not filename.lower().endswith(".csv"):
+                yield ArchiveMember(info.filename, filename, None, "not a CSV file")
+                continue
+            try:
+                data, problem = _read_member(archive, info)
+            except (
+                zipfile.BadZipFile,
+                zlib.error,
+                EOFError,
+                RuntimeError,
+                NotImplementedError,
+            ) as e:
+                # Corrupt, encrypted or compressed with an unsupported method
+                data, problem = None, f"cannot be unpacked: {e}"
+            yield ArchiveMember(info.filename, filename, data, problem)
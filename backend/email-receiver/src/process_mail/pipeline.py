@@ -0,0 +1,371 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from gmail.email_handler import get_messages_data, mark_as_read
+from process_mail.attachment_processor import (
+    ArchiveRejectedError,
+    find_attachments,
+    get_attachment_data,
+    get_attachments_data,
+    get_sender_email,
+    unpack_logs,
+)
+from process_mail.upload_store import UPLOADED
+from setup.config import (
+    DOWNLOAD_WORKERS,
+    ENV,
+    FETCH_WORKERS,
+    GMAIL_BATCH_ATTACHMENT_BYTES,
+    GMAIL_BATCH_SIZE,
+)
+from setup.logger_setup import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class PipelineRun:
+    """Messages of one run left to finish and how the finished ones went."""
+
+    def __init__(self, messages):
+        self.remaining = messages
+        self.summary = {
+            "processed": 0,
+            "failed": 0,
+            "queued": 0,
+            "skipped": 0,
+            "rejected": 0,
+        }
+        self.processed = []
+        self.failed = []
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        if not messages:
+            self.done.set()
+
+
+class MessageJob:
+    """Progress of one message through the pipeline."""
+
+    def __init__(self, run, message_id):
+        self.run = run
+        self.message_id = message_id
+        self.email = None
+        self.pending = 0
+        self.queued = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.error = None
+        self.lock = threading.Lock()
+
+
+class BufferBudget:
+    """Counts downloaded attachments waiting to be queued for their upload.
+
+    A batch of attachments takes its slots at once, so downloads holding
+    part of what they need cannot starve each other.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, count=1):
+        with self.condition:
+            self.condition.wait_for(lambda: self.used + count <= self.capacity)
+            self.used += count
+
+    def release(self, count=1):
+        with self.condition:
+            self.used -= count
+            self.condition.notify_all()
+
+
+class MailPipeline:
+    """Process messages in stages: fetch messages, download attachments,
+    queue them in the upload outbox, mark the messages as read.
+
+    Every stage has its own worker pool. Messages are fetched in Gmail batch
+    requests, and so are the small attachments of a message, large ones are
+    downloaded on their own. Downloaded attachments waiting to be queued are
+    bounded, which caps memory. ZIP attachments are unpacked and every log
+    in them is queued as its own file. Attachments the store records as
+    queued or uploaded are skipped. The outbox uploads the files, so a slow
+    or unavailable backend does not hold back the mailbox. The processed
+    messages of a run are marked as read in bulk at its end. A failure only
+    affects its own message: it is left unread and retried on the next run.
+    """
+
+    def __init__(
+        self,
+        service_factory,
+        store,
+        outbox,
+        mark_read=ENV == "production",
+        fetch_workers=FETCH_WORKERS,
+        download_workers=DOWNLOAD_WORKERS,
+    ):
+        # Called from the worker threads, returns the service of the thread
+        self.service_factory = service_factory
+        self.store = store
+        self.outbox = outbox
+        self.mark_read = mark_read
+        # Pools outlive runs, so the workers keep their Gmail services
+        self._pools = {
+            stage: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=stage)
+            for stage, workers in (
+                ("fetch", fetch_workers),
+                ("download", download_workers),
+                # Hashing, unpacking and writing to disk keep up with downloads
+                ("queue", download_workers),
+            )
+        }
+        self._buffered = BufferBudget(2 * download_workers)
+
+    def run(self, messages):
+        """Process messages, return the PipelineRun with the processed and
+        failed message ids."""
+        run = PipelineRun(len(messages))
+        jobs = [MessageJob(run, msg["id"]) for msg in messages]
+        for start in range(0, len(jobs), GMAIL_BATCH_SIZE):
+            self._pools["fetch"].submit(
+                self._fetch, jobs[start : start + GMAIL_BATCH_SIZE]
+            )
+        run.done.wait()
+
+        if self.mark_read and run.processed:
+            if not mark_as_read(self.service_factory(), run.processed):
+                # Left unread, the messages are processed again on the next run
+                run.summary["processed"] -= len(run.processed)
+                run.summary["failed"] += len(run.processed)
+                run.failed.extend(run.processed)
+                run.processed = []
+
+        logger.info(
+            f"Processed {run.summary['processed']} message(s), "
+            f"{run.summary['failed']} failed, "
+            f"{run.summary['queued']} attachment(s) queued for upload, "
+            f"{run.summary['skipped']} skipped as uploaded before, "
+            f"{run.summary['rejected']} rejected"
+        )
+        return run
+
+    def _fetch(self, jobs):
+        for job in jobs:
+            logger.info(f"Processing message {job.message_id}")
+        try:
+            messages, errors = get_messages_data(
+                self.service_factory(), [job.message_id for job in jobs]
+            )
+        except Exception as e:
+            for job in jobs:
+                self._finish(job, e)
+            return
+
+        for job in jobs:
+            if job.message_id in messages:
+                self._start(job, messages[job.message_id])
+            else:
+                self._finish(
+                    job,
+                    errors.get(job.message_id)
+                    or Exception("Message data could not be fetched"),
+                )
+
+    def _start(self, job, msg_data):
+        try:
+            attachments = find_attachments(msg_data)
+            if attachments:
+                job.email = get_sender_email(msg_data)
+            uploaded = [
+                attachment
+                for attachment in attachments
+                if self.store.is_uploaded(job.message_id, attachment.part)
+            ]
+        except Exception as e:
+            self._finish(job, e)
+            return
+
+        if uploaded:
+            logger.info(
+                f"Skipping {len(uploaded)} attachment(s) of message "
+                f"{job.message_id} uploaded before"
+            )
+            job.skipped += len(uploaded)
+            attachments = [a for a in attachments if a not in uploaded]
+        if not attachments:
+            self._finish(job)
+            return
+        job.pending = len(attachments)
+
+        batch, batch_size = [], 0
+        for attachment in attachments:
+            if attachment.size > GMAIL_BATCH_ATTACHMENT_BYTES:
+                self._pools["download"].submit(self._download, job, attachment)
+                continue
+            if batch and (
+                batch_size + attachment.size > GMAIL_BATCH_ATTACHMENT_BYTES
+                or len(batch) == self._buffered.capacity
+            ):
+                self._pools["download"].submit(self._download_batch, job, batch)
+                batch, batch_size = [], 0
+            batch.append(attachment)
+            batch_size += attachment.size
+        if batch:
+            self._pools["download"].submit(self._download_batch, job, batch)
+
+    def _download(self, job, attachment):
+        if job.error:
+            # Another attachment failed, the message is retried as a whole
+            self._attachment_done(job)
+            return
+
+        logger.info(f"Processing attachment: {attachment.filename}")
+        self._buffered.acquire()
+        try:
+            file_data = get_attachment_data(
+                self.service_factory(), job.message_id, attachment.attachment_id
+            )
+            if file_data is None:
+                raise Exception(
+                    f"Attachment {attachment.filename} could not be downloaded"
+                )
+        except Exception as e:
+            self._buffered.release()
+            self._attachment_done(job, e)
+            return
+        self._pools["queue"].submit(self._queue, job, attachment, file_data)
+
+    def _download_batch(self, job, batch):
+        if job.error:
+            for _ in batch:
+                self._attachment_done(job)
+            return
+
+        for attachment in batch:
+            logger.info(f"Processing attachment: {attachment.filename}")
+        self._buffered.acquire(len(batch))
+        attachment_ids = [attachment.attachment_id for attachment in batch]
+        try:
+            downloaded, errors = get_attachments_data(
+                self.service_factory(), job.message_id, attachment_ids
+            )
+        except Exception as e:
+            downloaded, errors = {}, dict.fromkeys(attachment_ids, e)
+
+        for attachment in batch:
+            if attachment.attachment_id in downloaded:
+                self._pools["queue"].submit(
+                    self._queue, job, attachment, downloaded[attachment.attachment_id]
+                )
+            else:
+                self._buffered.release()
+                self._attachment_done(
+                    job,
+                    errors.get(attachment.attachment_id)
+                    or Exception(
+                        f"Attachment {attachment.filename} could not be downloaded"
+                    ),
+                )
+
+    def _queue(self, job, attachment, file_data):
+        error = None
+        try:
+            if not job.error:
+                if attachment.filename.endswith(".zip"):
+                    self._queue_archive(job, attachment, file_data)
+                else:
+                    self._queue_once(
+                        job, attachment.part, attachment.filename, file_data
+                    )
+        except Exception as e:
+            error = e
+        finally:
+            self._buffered.release()
+        self._attachment_done(job, error)
+
+    def _queue_archive(self, job, attachment, zip_data):
+        sha256 = hashlib.sha256(zip_data).hexdigest()
+        key = (job.message_id, attachment.part, job.email, sha256)
+        if self._skip_uploaded(job, key, attachment.filename):
+            return
+
+        rejected = 0
+        try:
+            for member in unpack_logs(zip_data):
+                if member.problem:
+                    logger.warning(
+                        f"Skipping {member.name} in {attachment.filename}: "
+                        f"{member.problem}"
+                    )
+                    rejected += 1
+                else:
+                    self._queue_once(
+                        job,
+                        f"{attachment.part}/{member.name}",
+                        member.filename,
+                        member.data,
+                    )
+        except ArchiveRejectedError as e:
+            logger.warning(f"Rejecting {attachment.filename} from {job.email}: {e}")
+            rejected += 1
+        # Its logs are recorded on their own, the archive is recorded as well
+        # so that it is not downloaded and unpacked again
+        self.store.set_status(*key, UPLOADED)
+        with job.lock:
+            job.rejected += rejected
+
+    def _queue_once(self, job, part, filename, file_data):
+        sha256 = hashlib.sha256(file_data).hexdigest()
+        key = (job.message_id, part, job.email, sha256)
+        if self._skip_uploaded(job, key, filename):
+            return
+
+        self.outbox.put(*key, filename, file_data)
+        with job.lock:
+            job.queued += 1
+
+    def _skip_uploaded(self, job, key, filename):
+        """Record a file as uploaded and return True when the sender sent the
+        same content before."""
+        if not self.store.is_content_uploaded(job.email, key[3]):
+            return False
+        logger.info(
+            f"Skipping {filename} from {job.email}, "
+            "the same file was uploaded before"
+        )
+        self.store.set_status(*key, UPLOADED)
+        with job.lock:
+            job.skipped += 1
+        return True
+
+    def _attachment_done(self, job, error=None):
+        with job.lock:
+            if error is not None and job.error is None:
+                job.error = error
+            job.pending -= 1
+            last = job.pending <= 0
+        if last:
+            self._finish(job, job.error)
+
+    def _finish(self, job, error=None):
+        if error is not None:
+            logger.error(
+                f"Error processing message {job.message_id}: {error}",
+                exc_info=error,
+            )
+        run = job.run
+        with run.lock:
+            if error is None:
+                run.summary["processed"] += 1
+                run.processed.append(job.message_id)
+            else:
+                run.summary["failed"] += 1
+                run.failed.append(job.message_id)
+            run.summary["queued"] += job.queued
+            run.summary["skipped"] += job.skipped
+            run.summary["rejected"] += job.rejected
+            run.remaining -= 1
+            if not run.remaining:
+                run.done.set()
@@ -1,27 +1,61 @@
+import threading
+
 from gmail.auth import authenticate
-from gmail.email_handler import check_unread_emails, get_message_data, mark_as_read
-from process_mail.attachment_processor import process_attachments
-from setup.config import ENV
+from gmail.email_handler import count_unread_messages
+from gmail.history_sync import HistorySync
+from process_mail.pipeline import MailPipeline
+from process_mail.upload_outbox import UploadOutbox
+from process_mail.upload_store import UploadStore
 from setup.logger_setup import setup_logger
+from setup.metrics import (
+    attachments_total,
+    messages_total,
+    outbox_bytes,
+    outbox_files,
+    timed,
+    unread_backlog,
+)
 
 # Set up logger with file output
 logger = setup_logger(__name__)
 
+# Runs don't overlap, each continues from the history the previous one reached
+run_lock = threading.Lock()
+pipeline = None
+history_sync = None
+
 
 def process_emails():
-    service = authenticate()
-    logger.info("Checking for unread emails...")
-    messages = check_unread_emails(service)
-
-    for msg in messages:
-        logger.info(f"Processing message {msg['id']}")
-        msg_data = get_message_data(service, msg["id"])
-        if msg_data:
-            try:
-                process_attachments(msg_data, service)
-                if ENV == "production":
-                    mark_as_read(service, msg["id"])
-            except Exception as e:
-                logger.error(
-                    f"Error processing message {msg['id']}: {e}", exc_info=True
-                )
+    global pipeline, history_sync
+    with run_lock:
+        if pipeline is None:
+            upload_store = UploadStore()
+            outbox = UploadOutbox(upload_store)
+            # Also sends what a previous process left in the outbox
+            outbox.start()
+            outbox_files.set_function(lambda: outbox.stats()["files"])
+            outbox_bytes.set_function(lambda: outbox.stats()["bytes"])
+            pipeline = MailPipeline(authenticate, upload_store, outbox)
+            history_sync = HistorySync()
+
+        with timed("run"):
+            service = authenticate()
+            logger.info("Checking for new emails...")
+            with timed("list"):
+                messages = history_sync.new_messages(service)
+
+            run = pipeline.run(messages)
+            history_sync.commit(run.failed)
+            # Retried messages are not new mail, the scheduler polls by this
+            run.summary["new"] = history_sync.new_count
+            pipeline.store.compact()
+
+        for result in ("processed", "failed"):
+            messages_total.inc(run.summary[result], result=result)
+        for result in ("queued", "skipped", "rejected"):
+            attachments_total.inc(run.summary[result], result=result)
+        try:
+            unread_backlog.set(count_unread_messages(service))
+        except Exception as e:
+            logger.warning(f"Could not count the unread messages: {e}")
+        return run.summary
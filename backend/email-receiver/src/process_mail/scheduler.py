@@ -0,0 +1,173 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from setup.config import MIN_INTERVAL_SECONDS, SCHEDULE_INTERVAL_SECONDS
+from setup.logger_setup import setup_logger
+from setup.metrics import scheduler_lag_seconds
+
+logger = setup_logger(__name__)
+
+# Finished jobs kept for the status endpoints
+JOB_HISTORY = 50
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    """One run of process_emails and the triggers it serves."""
+
+    def __init__(self, trigger, due):
+        self.id = uuid.uuid4().hex
+        self.trigger = trigger
+        self.triggers = 1
+        self.status = QUEUED
+        # time.monotonic() the job was due at
+        self.due = due
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.lag_seconds = None
+        self.finished_at = None
+        self.duration_seconds = None
+        self.summary = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "trigger": self.trigger,
+            "triggers": self.triggers,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at and self.started_at.isoformat(),
+            "finished_at": self.finished_at and self.finished_at.isoformat(),
+            "lag_seconds": self.lag_seconds,
+            "duration_seconds": self.duration_seconds,
+            "summary": self.summary,
+            "error": self.error,
+        }
+
+
+class RunScheduler:
+    """Run process_emails on the event loop's schedule, one run at a time.
+
+    Triggers enqueue a job and return at once. Triggers arriving while a job
+    is queued join it, so a burst of them costs one run. Runs start at least
+    min_interval apart. Without triggers the mailbox is polled, again
+    min_interval after a run that found new mail, and twice as long after
+    every other run, up to max_interval. Retried messages are not new mail.
+    """
+
+    def __init__(
+        self,
+        run,
+        min_interval=MIN_INTERVAL_SECONDS,
+        max_interval=SCHEDULE_INTERVAL_SECONDS,
+    ):
+        # Blocking, called in a worker thread and returns the run summary
+        self.run = run
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.jobs = OrderedDict()
+        self.queued = None
+        self.current = None
+        self.last = None
+        # time.monotonic() values, the first poll is at startup
+        self.next_poll = time.monotonic()
+        self.last_start = float("-inf")
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        # A run in progress finishes in its thread, its result is dropped
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def trigger(self, trigger="manual", due=None):
+        """Return the queued job, enqueueing one when there is none."""
+        if self.queued is not None:
+            self.queued.triggers += 1
+            return self.queued
+        job = Job(trigger, time.monotonic() if due is None else due)
+        self.queued = job
+        self.jobs[job.id] = job
+        while len(self.jobs) > JOB_HISTORY:
+            self.jobs.popitem(last=False)
+        self._wake.set()
+        return job
+
+    def status(self):
+        return {
+            "current": self.current and self.current.to_dict(),
+            "queued": self.queued and self.queued.to_dict(),
+            "last": self.last and self.last.to_dict(),
+            "poll_interval_seconds": self.interval,
+            "next_poll_in_seconds": round(
+                max(self.next_poll - time.monotonic(), 0), 1
+            ),
+        }
+
+    async def _loop(self):
+        while True:
+            if self.queued is None:
+                try:
+                    await asyncio.wait_for(
+                        self._wake.wait(), max(self.next_poll - time.monotonic(), 0)
+                    )
+                except TimeoutError:
+                    self.trigger("scheduled", self.next_poll)
+            self._wake.clear()
+
+            delay = self.last_start + self.min_interval - time.monotonic()
+            if delay > 0:
+                # Triggers meanwhile join the queued job
+                await asyncio.sleep(delay)
+            job, self.queued = self.queued, None
+            await self._execute(job)
+
+    async def _execute(self, job):
+        logger.info(f"Starting {job.trigger} job {job.id}")
+        now = time.monotonic()
+        # Waiting for min_interval to pass is the schedule, not lag
+        job.lag_seconds = round(
+            max(now - max(job.due, self.last_start + self.min_interval), 0), 3
+        )
+        scheduler_lag_seconds.observe(job.lag_seconds)
+        self.current = job
+        self.last_start = now
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        found = False
+        try:
+            job.summary = await asyncio.to_thread(self.run)
+            job.status = SUCCEEDED
+            found = job.summary["new"] > 0
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            job.status = FAILED
+            job.error = str(e)
+        job.finished_at = datetime.now()
+        job.duration_seconds = round(time.monotonic() - self.last_start, 3)
+        self.current = None
+        self.last = job
+
+        self.interval = (
+            self.min_interval if found else min(self.interval * 2, self.max_interval)
+        )
+        self.next_poll = time.monotonic() + self.interval
+        logger.info(
+            f"Job {job.id} {job.status} in {job.duration_seconds}s, "
+            f"next poll in {self.interval}s"
+        )
@@ -0,0 +1,159 @@
+import io
+import os
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+from setup.config import (
+    BACKEND_URL,
+    EMAIL_ENDPOINT,
+    UPLOAD_BACKOFF_SECONDS,
+    UPLOAD_CONNECT_TIMEOUT_SECONDS,
+    UPLOAD_READ_TIMEOUT_SECONDS,
+    UPLOAD_RETRIES,
+    UPLOAD_WORKERS,
+)
+from urllib3.fields import format_multipart_header_param
+from urllib3.util.retry import Retry
+
+# Statuses the backend answers without having processed the upload
+RETRY_STATUSES = frozenset({429, 503})
+
+
+class MultipartStream(io.RawIOBase):
+    """A multipart/form-data body of text fields and one file, read in blocks.
+
+    The file is not copied into the body: blocks are sliced from the file
+    bytes or read from a binary file object. The length is known up front, so
+    the body is sent with a Content-Length rather than chunked, and the
+    stream can be rewound for a retry.
+    """
+
+    def __init__(self, fields, name, filename, file_data):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+
+        head = b"".join(
+            f"--{self.boundary}\r\nContent-Disposition: form-data; "
+            f"{format_multipart_header_param('name', key)}\r\n\r\n{value}\r\n".encode()
+            for key, value in fields.items()
+        )
+        head += (
+            f"--{self.boundary}\r\nContent-Disposition: form-data; "
+            f"{format_multipart_header_param('name', name)}; "
+            f"{format_multipart_header_param('filename', filename)}\r\n"
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+        if isinstance(file_data, (bytes, bytearray, memoryview)):
+            file_data = memoryview(file_data)
+            file_size = len(file_data)
+        else:
+            file_size = os.fstat(file_data.fileno()).st_size
+        self._segments = [
+            (memoryview(head), len(head)),
+            (file_data, file_size),
+            (memoryview(tail), len(tail)),
+        ]
+        self._length = len(head) + file_size + len(tail)
+        self._position = 0
+
+    def __len__(self):
+        return self._length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._length
+        self._position = min(max(offset, 0), self._length)
+        return self._position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length - self._position
+        blocks = []
+        start = 0
+        for segment, length in self._segments:
+            end = start + length
+            if size and start <= self._position < end:
+                offset = self._position - start
+                count = min(size, length - offset)
+                if isinstance(segment, memoryview):
+                    block = segment[offset : offset + count].tobytes()
+                else:
+                    segment.seek(offset)
+                    block = segment.read(count)
+                blocks.append(block)
+                self._position += len(block)
+                size -= len(block)
+            start = end
+        return b"".join(blocks)
+
+    def readinto(self, buffer):
+        block = self.read(len(buffer))
+        buffer[: len(block)] = block
+        return len(block)
+
+
+class UploadClient:
+    """Send files to the backend /email endpoint over pooled keep-alive
+    connections.
+
+    An upload is a non-idempotent POST, so it is only retried, with
+    exponential backoff, when the backend cannot have processed it: the
+    connection could not be established, or it answered 429 or 503. Read
+    timeouts and other errors are not retried here, the outbox sends the
+    file again later.
+    """
+
+    def __init__(
+        self,
+        url=f"{BACKEND_URL}/{EMAIL_ENDPOINT}",
+        pool_size=UPLOAD_WORKERS,
+        retries=UPLOAD_RETRIES,
+        backoff=UPLOAD_BACKOFF_SECONDS,
+        connect_timeout=UPLOAD_CONNECT_TIMEOUT_SECONDS,
+        read_timeout=UPLOAD_READ_TIMEOUT_SECONDS,
+    ):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            other=0,
+            status=retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"POST"}),
+            backoff_factor=backoff,
+            backoff_jitter=backoff,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def upload(self, filename, file_data, email):
+        """POST a file as bytes or a binary file object, return the response."""
+        body = MultipartStream({"email": email}, "file", filename, file_data)
+        return self.session.post(
+            self.url,
+            data=body,
+            headers={"Content-Type": body.content_type},
+            timeout=self.timeout,
+        )
+
+    def close(self):
+        self.session.close()
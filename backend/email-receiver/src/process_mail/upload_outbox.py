@@ -0,0 +1,266 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from process_mail.attachment_processor import (
+    UploadRejectedError,
+    send_file_to_endpoint,
+)
+from process_mail.upload_store import QUEUED, UPLOADED
+from setup.config import (
+    OUTBOX_BACKOFF_SECONDS,
+    OUTBOX_MAX_BACKOFF_SECONDS,
+    OUTBOX_MAX_BYTES,
+    STATE_PATH,
+    UPLOAD_WORKERS,
+)
+from setup.logger_setup import setup_logger
+
+logger = setup_logger(__name__)
+
+DB_NAME = "outbox.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    file TEXT PRIMARY KEY,
+    message_id TEXT NOT NULL,
+    part TEXT NOT NULL,
+    email TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    next_attempt_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_next_attempt_at ON outbox (next_attempt_at);
+"""
+
+Entry = namedtuple(
+    "Entry",
+    [
+        "file",
+        "message_id",
+        "part",
+        "email",
+        "sha256",
+        "filename",
+        "size",
+        "attempts",
+        "next_attempt_at",
+    ],
+)
+
+
+class OutboxFullError(Exception):
+    """The outbox has no room left for a file under its quota."""
+
+
+class UploadOutbox:
+    """Files waiting for their upload to the backend, kept on disk.
+
+    The pipeline puts downloaded files here and is done with them, a sender
+    thread uploads them with up to `workers` uploads at a time. A failed
+    upload is retried with exponential backoff, from the file on disk, so a
+    backend outage never repeats a Gmail download nor holds up the mailbox.
+    Files the backend rejects are dropped. The files take at most max_bytes,
+    beyond that put raises OutboxFullError. The outbox survives restarts.
+
+    It is the only outbox of its store: at startup, queued store rows without
+    a file here are removed, so a put cut short is downloaded again.
+    """
+
+    def __init__(
+        self,
+        store,
+        path=f"{STATE_PATH}/outbox",
+        max_bytes=OUTBOX_MAX_BYTES,
+        workers=UPLOAD_WORKERS,
+        backoff=OUTBOX_BACKOFF_SECONDS,
+        max_backoff=OUTBOX_MAX_BACKOFF_SECONDS,
+    ):
+        self.store = store
+        self.path = path
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(path, DB_NAME), check_same_thread=False
+        )
+        # Guards the database, the byte count and the files being sent
+        self._condition = threading.Condition()
+        self._sending = set()
+        with self._condition, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            self.bytes = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM outbox"
+            ).fetchone()[0]
+        self._remove_orphans()
+        self._remove_lost()
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="outbox"
+        )
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sending, uploads in progress finish. The files stay on disk."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._pool.shutdown()
+
+    def put(self, message_id, part, email, sha256, filename, data):
+        """Store a file for its upload, record it as queued in the store."""
+        with self._condition:
+            if self.bytes + len(data) > self.max_bytes:
+                raise OutboxFullError(
+                    f"Outbox holds {self.bytes} bytes, no room for {filename} "
+                    f"under {self.max_bytes}"
+                )
+            self.bytes += len(data)
+
+        file = uuid.uuid4().hex
+        file_path = os.path.join(self.path, file)
+        tmp_path = f"{file_path}.tmp"
+        queued = False
+        try:
+            with open(tmp_path, "wb") as outbox_file:
+                outbox_file.write(data)
+                outbox_file.flush()
+                os.fsync(outbox_file.fileno())
+            os.replace(tmp_path, file_path)
+
+            # Queued before the sender can see it, so "uploaded" is the last word
+            self.store.set_status(message_id, part, email, sha256, QUEUED)
+            queued = True
+            with self._condition:
+                with self._db:
+                    self._db.execute(
+                        "INSERT INTO outbox VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0)",
+                        (file, message_id, part, email, sha256, filename, len(data)),
+                    )
+                self._condition.notify_all()
+        except Exception:
+            # Nothing of a failed put is left, the attachment is not skipped
+            with self._condition:
+                self.bytes -= len(data)
+            for leftover in (tmp_path, file_path):
+                try:
+                    os.remove(leftover)
+                except FileNotFoundError:
+                    pass
+            if queued:
+                self.store.remove(message_id, part)
+            raise
+
+    def stats(self):
+        """Return the number of files and bytes waiting in the outbox."""
+        with self._condition:
+            files = self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+            return {"files": files, "bytes": self.bytes}
+
+    def _remove_orphans(self):
+        """Remove files of a put interrupted before its row was written."""
+        with self._condition:
+            files = {
+                row[0] for row in self._db.execute("SELECT file FROM outbox")
+            }
+        for name in os.listdir(self.path):
+            if not name.startswith(DB_NAME) and name not in files:
+                os.remove(os.path.join(self.path, name))
+
+    def _remove_lost(self):
+        """Remove the store rows queued by a put interrupted before its row
+        was written, so their attachments are downloaded again."""
+        with self._condition:
+            entries = set(self._db.execute("SELECT message_id, part FROM outbox"))
+        lost = [key for key in self.store.queued() if key not in entries]
+        for message_id, part in lost:
+            self.store.remove(message_id, part)
+        if lost:
+            logger.warning(
+                f"Removed {len(lost)} queued upload(s) missing from the outbox"
+            )
+
+    def _drain(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                now = time.time()
+                # Ordered by due time, skipping files being sent
+                rows = self._db.execute(
+                    "SELECT * FROM outbox ORDER BY next_attempt_at LIMIT ?",
+                    (self.workers * 2,),
+                ).fetchall()
+                waiting = [
+                    Entry(*row) for row in rows if row[0] not in self._sending
+                ]
+                due = [entry for entry in waiting if entry.next_attempt_at <= now]
+                due = due[: self.workers - len(self._sending)]
+                if not due:
+                    timeout = None
+                    if waiting and len(self._sending) < self.workers:
+                        timeout = waiting[0].next_attempt_at - now
+                    self._condition.wait(timeout)
+                    continue
+                self._sending.update(entry.file for entry in due)
+            for entry in due:
+                self._pool.submit(self._send, entry)
+
+    def _send(self, entry):
+        file_path = os.path.join(self.path, entry.file)
+        try:
+            with open(file_path, "rb") as outbox_file:
+                send_file_to_endpoint(entry.filename, outbox_file, entry.email)
+        except (UploadRejectedError, FileNotFoundError) as e:
+            logger.error(f"Dropping {entry.filename} from {entry.email}: {e}")
+            self.store.remove(entry.message_id, entry.part)
+            self._remove(entry)
+        except Exception as e:
+            attempts = entry.attempts + 1
+            delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+            # Jitter, so files failed together are not retried together
+            delay *= random.uniform(0.5, 1)
+            logger.warning(
+                f"Upload of {entry.filename} from {entry.email} failed "
+                f"{attempts} time(s), retrying in {delay:.1f}s: {e}"
+            )
+            with self._condition, self._db:
+                self._db.execute(
+                    "UPDATE outbox SET attempts = ?, next_attempt_at = ? "
+                    "WHERE file = ?",
+                    (attempts, time.time() + delay, entry.file),
+                )
+        else:
+            self.store.set_status(
+                entry.message_id, entry.part, entry.email, entry.sha256, UPLOADED
+            )
+            self._remove(entry)
+        finally:
+            with self._condition:
+                self._sending.discard(entry.file)
+                self._condition.notify_all()
+
+    def _remove(self, entry):
+        with self._condition:
+            with self._db:
+                self._db.execute("DELETE FROM outbox WHERE file = ?", (entry.file,))
+            self.bytes -= entry.size
+        try:
+            os.remove(os.path.join(self.path, entry.file))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import threading
+import time
+
+from setup.config import (
+    STATE_PATH,
+    UPLOAD_STORE_COMPACT_INTERVAL_SECONDS,
+    UPLOAD_STORE_RETENTION_DAYS,
+)
+from setup.logger_setup import setup_logger
+
+logger = setup_logger(__name__)
+
+QUEUED = "queued"
+UPLOADED = "uploaded"
+# Queued files are on disk in the outbox, they count as uploaded
+DONE_STATUSES = (QUEUED, UPLOADED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    message_id TEXT NOT NULL,
+    part TEXT NOT NULL,
+    email TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (message_id, part)
+);
+CREATE INDEX IF NOT EXISTS uploads_content ON uploads (email, sha256);
+CREATE INDEX IF NOT EXISTS uploads_updated_at ON uploads (updated_at);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL NOT NULL);
+"""
+
+
+class UploadStore:
+    """SQLite record of the attachments sent to the backend.
+
+    Rows are keyed by message id and attachment part, with the sender and
+    the SHA-256 of the content. An attachment of a message is skipped before
+    its download once uploaded, and any content is skipped before its upload
+    once uploaded for the same sender, so a crash before marking messages as
+    read, or the same log mailed twice, does not reach the analyser again.
+
+    A "queued" row is a file in the upload outbox, it is skipped like an
+    uploaded one.
+    """
+
+    def __init__(self, path=f"{STATE_PATH}/uploads.sqlite3"):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared by the pipeline workers, every access holds the lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+
+    def is_uploaded(self, message_id, part):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM uploads WHERE message_id = ? AND part = ? "
+                "AND status IN (?, ?)",
+                (message_id, part, *DONE_STATUSES),
+            ).fetchone()
+        return row is not None
+
+    def is_content_uploaded(self, email, sha256):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM uploads WHERE email = ? AND sha256 = ? "
+                "AND status IN (?, ?)",
+                (email, sha256, *DONE_STATUSES),
+            ).fetchone()
+        return row is not None
+
+    def set_status(self, message_id, part, email, sha256, status):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?, ?)",
+                (message_id, part, email, sha256, status, time.time()),
+            )
+
+    def queued(self):
+        """Return the (message_id, part) of the queued rows."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT message_id, part FROM uploads WHERE status = ?", (QUEUED,)
+            ).fetchall()
+
+    def remove(self, message_id, part):
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM uploads WHERE message_id = ? AND part = ?",
+                (message_id, part),
+            )
+
+    def compact(self, retention_days=UPLOAD_STORE_RETENTION_DAYS, force=False):
+        """Drop rows older than the retention, at most once per interval.
+
+        Messages that old are no longer unread or in the mailbox history, so
+        they are not processed again. Return the number of rows dropped.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'compacted_at'"
+            ).fetchone()
+            if (
+                not force
+                and row is not None
+                and now - row[0] < UPLOAD_STORE_COMPACT_INTERVAL_SECONDS
+            ):
+                return 0
+
+            with self._db:
+                dropped = self._db.execute(
+                    "DELETE FROM uploads WHERE updated_at < ?",
+                    (now - retention_days * 86400,),
+                ).rowcount
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('compacted_at', ?)", (now,)
+                )
+            if dropped:
+                # Give the freed pages back to the file system
+                self._db.execute("VACUUM")
+                self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logger.info(f"Compacted upload store, dropped {dropped} row(s)")
+        return dropped
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -12,3 +12,30 @@ EMAIL_ENDPOINT = os.getenv("EMAIL_ENDPOINT", "email")
 MIN_INTERVAL_SECONDS = int(os.getenv("MIN_INTERVAL_SECONDS", "60"))
 SCHEDULE_INTERVAL_SECONDS = int(os.getenv("SCHEDULE_INTERVAL_SECONDS", "900"))
 TOKEN_PATH = os.getenv("TOKEN_PATH", "./token.json")
+STATE_PATH = os.getenv("STATE_PATH", "/tmp/email-receiver")
+GMAIL_DISCOVERY_URL = os.getenv("GMAIL_DISCOVERY_URL", "")
+GMAIL_TIMEOUT_SECONDS = int(os.getenv("GMAIL_TIMEOUT_SECONDS", "30"))
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))
+GMAIL_BATCH_RETRIES = int(os.getenv("GMAIL_BATCH_RETRIES", "3"))
+GMAIL_BATCH_ATTACHMENT_BYTES = int(
+    os.getenv("GMAIL_BATCH_ATTACHMENT_BYTES", str(2 * 1024 * 1024))
+)
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "4"))
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "3"))
+UPLOAD_BACKOFF_SECONDS = float(os.getenv("UPLOAD_BACKOFF_SECONDS", "0.5"))
+UPLOAD_CONNECT_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_CONNECT_TIMEOUT_SECONDS", "5"))
+UPLOAD_READ_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_READ_TIMEOUT_SECONDS", "120"))
+UPLOAD_STORE_RETENTION_DAYS = int(os.getenv("UPLOAD_STORE_RETENTION_DAYS", "30"))
+UPLOAD_STORE_COMPACT_INTERVAL_SECONDS = int(
+    os.getenv("UPLOAD_STORE_COMPACT_INTERVAL_SECONDS", "86400")
+)
+ZIP_MAX_MEMBERS = int(os.getenv("ZIP_MAX_MEMBERS", "100"))
+ZIP_MAX_MEMBER_BYTES = int(os.getenv("ZIP_MAX_MEMBER_BYTES", str(20 * 1024 * 1024)))
+ZIP_MAX_TOTAL_BYTES = int(os.getenv("ZIP_MAX_TOTAL_BYTES", str(200 * 1024 * 1024)))
+ZIP_MAX_RATIO = int(os.getenv("ZIP_MAX_RATIO", "200"))
+OUTBOX_MAX_BYTES = int(os.getenv("OUTBOX_MAX_BYTES", str(1024 * 1024 * 1024)))
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "5"))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "600"))
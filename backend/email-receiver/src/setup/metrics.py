@@ -0,0 +1,170 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from a batched Gmail call to a slow upload
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+metrics = []
+
+
+class Metric:
+    """A metric with samples per label values, rendered in the Prometheus
+    text format."""
+
+    kind = None
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self.lock = threading.Lock()
+        self.values = {}
+        metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=""):
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self):
+        with self.lock:
+            return [
+                f"{self.name}{self._labels(key)} {value}"
+                for key, value in sorted(self.values.items())
+            ]
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, description, labelnames=()):
+        super().__init__(name, description, labelnames)
+        self.function = None
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def set_function(self, function):
+        """Read the value from function() whenever the metrics are rendered."""
+        self.function = function
+
+    def samples(self):
+        if self.function is not None:
+            return [f"{self.name} {self.function()}"]
+        return super().samples()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            # Cumulative bucket counts, then the sum and count of all values
+            sample = self.values.setdefault(key, [0] * len(self.buckets) + [0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[i] += 1
+            sample[-2] += value
+            sample[-1] += 1
+
+    def samples(self):
+        lines = []
+        with self.lock:
+            for key, sample in sorted(self.values.items()):
+                bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+                counts = sample[:-2] + [sample[-1]]
+                for bound, count in zip(bounds, counts):
+                    labels = self._labels(key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{self._labels(key)} {sample[-2]}")
+                lines.append(f"{self.name}_count{self._labels(key)} {sample[-1]}")
+        return lines
+
+
+def render_metrics():
+    """Return every metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+stage_seconds = Histogram(
+    "email_receiver_stage_seconds",
+    "Latency of a processing stage call",
+    ("stage",),
+)
+stage_errors = Counter(
+    "email_receiver_stage_errors_total",
+    "Failed calls of a processing stage",
+    ("stage",),
+)
+stage_bytes = Counter(
+    "email_receiver_stage_bytes_total",
+    "Attachment bytes downloaded from Gmail and uploaded to the backend",
+    ("stage",),
+)
+messages_total = Counter(
+    "email_receiver_messages_total",
+    "Messages processed by runs, by result",
+    ("result",),
+)
+attachments_total = Counter(
+    "email_receiver_attachments_total",
+    "Attachments of processed messages, by what became of them",
+    ("result",),
+)
+scheduler_lag_seconds = Histogram(
+    "email_receiver_scheduler_lag_seconds",
+    "Delay between a run being due and its start",
+)
+unread_backlog = Gauge(
+    "email_receiver_unread_backlog",
+    "Unread messages left in the mailbox after the last run",
+)
+outbox_files = Gauge(
+    "email_receiver_outbox_files",
+    "Files waiting in the upload outbox",
+)
+outbox_bytes = Gauge(
+    "email_receiver_outbox_bytes",
+    "Bytes waiting in the upload outbox",
+)
+
+
+@contextmanager
+def timed(stage):
+    """Observe the latency of the block in stage_seconds, and count it in
+    stage_errors when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage)